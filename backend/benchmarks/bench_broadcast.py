@@ -0,0 +1,78 @@
+"""Broadcast cost under an event storm: one state_update per change vs BroadcastCoordinator.
+
+Usage (from backend/):
+    python benchmarks/bench_broadcast.py [--events-per-s 500] [--seconds 2] [--interval-ms 100]
+
+Each event changes one taxi, as an order, assignment or completion would. Reports frames
+encoded and the CPU time spent encoding them for 1000 taxis and 500 assignments.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from broadcast_coordinator import BroadcastCoordinator  # noqa: E402
+from models import Assignment, Location, Order, OrderStatus, Route, Taxi, TaxiStatus  # noqa: E402
+from state_encoder import StateEncoder  # noqa: E402
+
+
+def random_location() -> Location:
+    return Location(lat=51.11 + random.uniform(-0.1, 0.1), lng=71.41 + random.uniform(-0.1, 0.1))
+
+
+def random_route(points: int = 50) -> Route:
+    start = random_location()
+    return Route.from_path([[start.lat + i * 1e-4, start.lng + i * 1e-4] for i in range(points)], 300.0)
+
+
+async def run(args, coalesce: bool):
+    random.seed(42)
+    taxis = [Taxi(f"taxi_{i}", random_location(), TaxiStatus.FREE) for i in range(1000)]
+    orders = [Order(f"order_{j}", random_location(), random_location(), OrderStatus.ASSIGNED) for j in range(500)]
+    assignments = [Assignment(taxis[j].id, order.id, random_route(), random_route()) for j, order in enumerate(orders)]
+    versions = {taxi.id: 0 for taxi in taxis}
+    encoder = StateEncoder()
+    cpu = 0.0
+
+    async def broadcast():
+        nonlocal cpu
+        start = time.perf_counter()
+        encoder.begin_broadcast()
+        encoder.state_update('json', ((t, versions[t.id]) for t in taxis), ((o, 0) for o in orders), assignments)
+        cpu += time.perf_counter() - start
+
+    coordinator = BroadcastCoordinator(broadcast, args.interval_ms / 1000)
+    task = asyncio.create_task(coordinator.run()) if coalesce else None
+    events = int(args.events_per_s * args.seconds)
+    for i in range(events):
+        taxi = taxis[i % len(taxis)]
+        taxi.location = random_location()
+        versions[taxi.id] += 1
+        if coalesce:
+            coordinator.mark_dirty()
+        else:
+            await broadcast()
+        await asyncio.sleep(1 / args.events_per_s)
+    if task is not None:
+        await asyncio.sleep(args.interval_ms / 1000 * 2)
+        task.cancel()
+    print(f"{'coordinator' if coalesce else 'per change'}: {encoder.frames} frames for {events} events, "
+          f"{cpu * 1000:.0f} ms encoding" + (f", {coordinator.coalesced} coalesced" if coalesce else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events-per-s', type=float, default=500)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--interval-ms', type=float, default=100.0)
+    args = parser.parse_args()
+    asyncio.run(run(args, coalesce=False))
+    asyncio.run(run(args, coalesce=True))
+
+
+if __name__ == '__main__':
+    main()
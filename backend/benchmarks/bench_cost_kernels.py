@@ -0,0 +1,146 @@
+"""Vectorized vs nested-loop cost-matrix construction for the assignment strategies.
+
+Usage (from backend/):
+    python benchmarks/bench_cost_kernels.py [--sizes 1000 5000] [--loop-rows 200]
+
+The per-pair Python loops the strategies used before cost_kernels are kept here as the
+reference. At large sizes the loops are timed on the first --loop-rows taxis and scaled
+up; the vectorized matrices must match the reference on those rows.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import h3
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cost_kernels import (  # noqa: E402
+    demand_cost_matrix, demand_vectors, haversine_matrix_km, hybrid_cost_matrix, hybrid_demand_weights
+)
+from models import DemandHexagon  # noqa: E402
+
+CENTER_LAT = 51.111339
+CENTER_LNG = 71.415581
+H3_RESOLUTION = 7
+
+
+def get_distance(lat1, lng1, lat2, lng2):
+    R = 6371
+    dLat = math.radians(lat2 - lat1)
+    dLon = math.radians(lng2 - lng1)
+    a = (math.sin(dLat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dLon / 2) ** 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+def random_demand(rng) -> dict:
+    """Demand hexagons around the center with a mix of empty, balanced and unserved cells"""
+    center = h3.latlng_to_cell(CENTER_LAT, CENTER_LNG, H3_RESOLUTION)
+    hexagons = {}
+    for hex_id in h3.grid_disk(center, 6):
+        orders = int(rng.integers(0, 6))
+        taxis = int(rng.integers(0, 4))
+        ratio = orders / taxis if taxis > 0 else (float('inf') if orders > 0 else 0.0)
+        hexagons[hex_id] = DemandHexagon(hex_id, list(h3.cell_to_latlng(hex_id)), [], orders, taxis,
+                                         ratio, '#F0F0F0', 'None')
+    return hexagons
+
+
+def loop_proximity(taxis, orders):
+    cost = np.zeros((len(taxis), len(orders)))
+    for i, (tlat, tlng) in enumerate(taxis):
+        for j, (olat, olng) in enumerate(orders):
+            cost[i, j] = get_distance(tlat, tlng, olat, olng)
+    return cost
+
+
+def loop_hybrid(taxis, orders, demand_hexagons):
+    pickup_costs = loop_proximity(taxis, orders)
+    order_hexes = [h3.latlng_to_cell(lat, lng, H3_RESOLUTION) for lat, lng in orders]
+    cost = np.zeros((len(taxis), len(orders)))
+    for i in range(len(taxis)):
+        for j in range(len(orders)):
+            distance_cost = pickup_costs[i, j]
+            hex_id = order_hexes[j]
+            demand_ratio = (demand_hexagons[hex_id].demand_ratio
+                            if hex_id in demand_hexagons and demand_hexagons[hex_id].taxis_count > 0
+                            else float('inf') if demand_hexagons[hex_id].orders_count > 0 else 1.0)
+            demand_weight = min(1.0, 1.0 / (demand_ratio + 1e-6))
+            cost[i, j] = 0.6 * distance_cost + 0.4 * distance_cost * (1 - demand_weight)
+    return cost
+
+
+def loop_demand(taxis, orders, demand_hexagons):
+    cost = np.zeros((len(taxis), len(orders)))
+    for i in range(len(taxis)):
+        for j, (lat, lng) in enumerate(orders):
+            hex_id = h3.latlng_to_cell(lat, lng, H3_RESOLUTION)
+            if hex_id in demand_hexagons:
+                demand_ratio = demand_hexagons[hex_id].demand_ratio
+                if demand_ratio == float('inf'):
+                    cost[i, j] = 0.1
+                elif demand_ratio > 0:
+                    cost[i, j] = 1.0 / (demand_ratio + 1e-6)
+                else:
+                    cost[i, j] = 1.0
+            else:
+                cost[i, j] = 1.0
+    return cost
+
+
+def vectorized(taxis, orders, demand_hexagons):
+    t, o = np.asarray(taxis), np.asarray(orders)
+    pickup_costs = haversine_matrix_km(t[:, 0], t[:, 1], o[:, 0], o[:, 1])
+    cells = [h3.latlng_to_cell(lat, lng, H3_RESOLUTION) for lat, lng in orders]
+    ratio, orders_count, taxis_count, known = demand_vectors(cells, demand_hexagons)
+    return {
+        'proximity': pickup_costs,
+        'hybrid': hybrid_cost_matrix(pickup_costs, hybrid_demand_weights(ratio, orders_count, taxis_count, known)),
+        'demand': demand_cost_matrix(ratio, known, len(taxis)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--loop-rows', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    demand_hexagons = random_demand(rng)
+    references = {'proximity': loop_proximity,
+                  'hybrid': lambda t, o: loop_hybrid(t, o, demand_hexagons),
+                  'demand': lambda t, o: loop_demand(t, o, demand_hexagons)}
+
+    for n in args.sizes:
+        # Same placement as the simulator: taxis and pickups within ~0.035 deg of the center
+        taxis = (np.column_stack((CENTER_LAT + rng.uniform(-0.035, 0.035, n),
+                                  CENTER_LNG + rng.uniform(-0.035, 0.035, n)))).tolist()
+        orders = (np.column_stack((CENTER_LAT + rng.uniform(-0.035, 0.035, n),
+                                   CENTER_LNG + rng.uniform(-0.035, 0.035, n)))).tolist()
+
+        start = time.perf_counter()
+        fast = vectorized(taxis, orders, demand_hexagons)
+        fast_time = time.perf_counter() - start
+        print(f"{n}x{n}: vectorized (all three strategies) {fast_time * 1000:.1f} ms")
+
+        rows = min(n, args.loop_rows)
+        for name, reference in references.items():
+            start = time.perf_counter()
+            expected = reference(taxis[:rows], orders)
+            loop_time = (time.perf_counter() - start) * n / rows
+            max_error = float(np.max(np.abs(fast[name][:rows] - expected)))
+            scaled = "" if rows == n else f" (scaled from {rows} rows)"
+            print(f"  {name:<9} loop {loop_time:8.2f}s{scaled}, max |diff| {max_error:.2e}")
+            assert np.allclose(fast[name][:rows], expected, rtol=1e-12, atol=1e-12), name
+
+
+if __name__ == '__main__':
+    main()
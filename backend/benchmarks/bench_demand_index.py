@@ -0,0 +1,108 @@
+"""Incremental per-hexagon demand counters vs the full recompute they replace.
+
+Usage (from backend/):
+    python benchmarks/bench_demand_index.py [--taxis 5000] [--orders 2000] [--changes 50]
+
+The full recompute zeroes every hexagon and re-derives each pending order's and free taxi's
+cell. The incremental path applies a few order/taxi changes per tick and refreshes only the
+touched hexagons. Both must leave the same counts.
+"""
+import argparse
+import os
+import sys
+import time
+
+import h3
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from demand_index import DemandIndex  # noqa: E402
+from models import DemandHexagon, Location, Order, OrderStatus, Taxi, TaxiStatus  # noqa: E402
+
+CENTER_LAT = 51.111339
+CENTER_LNG = 71.415581
+RESOLUTION = 7
+
+
+def random_location(rng) -> Location:
+    return Location(lat=CENTER_LAT + rng.uniform(-0.1, 0.1), lng=CENTER_LNG + rng.uniform(-0.1, 0.1))
+
+
+def refresh(hex_data: DemandHexagon):
+    hex_data.demand_ratio = hex_data.orders_count / hex_data.taxis_count if hex_data.taxis_count else 0.0
+
+
+def full_recompute(hexagons, orders, taxis):
+    for hex_data in hexagons.values():
+        hex_data.orders_count = hex_data.taxis_count = 0
+    for order in orders.values():
+        if order.status == OrderStatus.PENDING:
+            hex_id = h3.latlng_to_cell(order.pickup.lat, order.pickup.lng, RESOLUTION)
+            if hex_id in hexagons:
+                hexagons[hex_id].orders_count += 1
+    for taxi in taxis.values():
+        if taxi.status == TaxiStatus.FREE:
+            hex_id = h3.latlng_to_cell(taxi.location.lat, taxi.location.lng, RESOLUTION)
+            if hex_id in hexagons:
+                hexagons[hex_id].taxis_count += 1
+    for hex_data in hexagons.values():
+        refresh(hex_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--taxis', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--changes', type=int, default=50, help='order/taxi status changes per tick')
+    parser.add_argument('--ticks', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    cells = {h3.latlng_to_cell(CENTER_LAT + a, CENTER_LNG + b, RESOLUTION)
+             for a in np.linspace(-0.1, 0.1, 40) for b in np.linspace(-0.1, 0.1, 40)}
+    hexagons = {c: DemandHexagon(c, [], [], 0, 0, 0.0, '', '') for c in cells}
+    reference = {c: DemandHexagon(c, [], [], 0, 0, 0.0, '', '') for c in cells}
+    taxis = {f"taxi_{i}": Taxi(f"taxi_{i}", random_location(rng), TaxiStatus.FREE) for i in range(args.taxis)}
+    orders = {f"order_{j}": Order(f"order_{j}", random_location(rng), random_location(rng), OrderStatus.PENDING)
+              for j in range(args.orders)}
+
+    index = DemandIndex(hexagons, RESOLUTION, refresh)
+    for taxi in taxis.values():
+        index.track_taxi(taxi)
+    for order in orders.values():
+        index.track_order(order)
+    index.flush()
+
+    full_time = incremental_time = 0.0
+    taxi_ids, order_ids = list(taxis), list(orders)
+    for _ in range(args.ticks):
+        start = time.perf_counter()
+        for _ in range(args.changes):
+            taxi = taxis[taxi_ids[rng.integers(len(taxi_ids))]]
+            if taxi.status == TaxiStatus.FREE:
+                taxi.status = TaxiStatus.BUSY
+            else:
+                taxi.status, taxi.location = TaxiStatus.FREE, random_location(rng)
+            index.track_taxi(taxi)
+            order = orders[order_ids[rng.integers(len(order_ids))]]
+            order.status = OrderStatus.ASSIGNED if order.status == OrderStatus.PENDING else OrderStatus.PENDING
+            index.track_order(order)
+        index.flush()
+        incremental_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        full_recompute(reference, orders, taxis)
+        full_time += time.perf_counter() - start
+
+        assert all((hexagons[c].orders_count, hexagons[c].taxis_count) ==
+                   (reference[c].orders_count, reference[c].taxis_count) for c in cells)
+
+    print(f"{len(cells)} hexagons, {args.taxis} taxis, {args.orders} orders, {args.changes} changes/tick: "
+          f"full {full_time * 1000 / args.ticks:.2f} ms/tick, incremental "
+          f"{incremental_time * 1000 / args.ticks:.3f} ms/tick ({full_time / incremental_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
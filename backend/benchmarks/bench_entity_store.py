@@ -0,0 +1,100 @@
+"""Columnar EntityStore vs dicts of dataclasses for fleet-scale status filtering.
+
+Usage (from backend/):
+    python benchmarks/bench_entity_store.py [--taxis 100000] [--orders 50000]
+
+Times filtering free taxis / pending orders (plus gathering their coordinates) by scanning
+the dicts the way the dispatcher used to, with EntityStore status masks and with its
+per-status id index (plus the O(1) pending count used by create_order). Also reports
+the memory held by the store arrays next to the dataclass objects.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import h3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_store import EntityStore  # noqa: E402
+from models import Location, Order, OrderStatus, Taxi, TaxiStatus  # noqa: E402
+
+CENTER_LAT = 51.111339
+CENTER_LNG = 71.415581
+
+
+def random_location() -> Location:
+    return Location(lat=CENTER_LAT + random.uniform(-0.1, 0.1), lng=CENTER_LNG + random.uniform(-0.1, 0.1))
+
+
+def timed(fn, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--taxis', type=int, default=100000)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    tracemalloc.start()
+    taxis = {f"taxi_{i}": Taxi(f"taxi_{i}", random_location(), random.choice(list(TaxiStatus)))
+             for i in range(args.taxis)}
+    orders = {f"order_{j}": Order(f"order_{j}", random_location(), random_location(), random.choice(list(OrderStatus)))
+              for j in range(args.orders)}
+    objects_mb = tracemalloc.get_traced_memory()[0] / 1e6
+
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    taxi_store = EntityStore(list(TaxiStatus), capacity=args.taxis)
+    order_store = EntityStore(list(OrderStatus), capacity=args.orders)
+    for taxi in taxis.values():
+        cell = h3.latlng_to_cell(taxi.location.lat, taxi.location.lng, 7)
+        taxi_store.upsert(taxi.id, taxi.location.lat, taxi.location.lng, taxi.status, cell)
+    for order in orders.values():
+        cell = h3.latlng_to_cell(order.pickup.lat, order.pickup.lng, 7)
+        order_store.upsert(order.id, order.pickup.lat, order.pickup.lng, order.status, cell)
+    store_mb = (tracemalloc.get_traced_memory()[0] - before) / 1e6
+    tracemalloc.stop()
+
+    def scan():
+        free = [t for t in taxis.values() if t.status == TaxiStatus.FREE]
+        pending = [o for o in orders.values() if o.status == OrderStatus.PENDING]
+        return [t.location.lat for t in free], [o.pickup.lat for o in pending]
+
+    def columnar():
+        free = taxi_store.rows_with_status(TaxiStatus.FREE)
+        pending = order_store.rows_with_status(OrderStatus.PENDING)
+        return taxi_store.coordinates(free), order_store.coordinates(pending)
+
+    def masked_ids():
+        return (taxi_store.ids_of(taxi_store.rows_with_status(TaxiStatus.FREE)),
+                order_store.ids_of(order_store.rows_with_status(OrderStatus.PENDING)))
+
+    def indexed_ids():
+        return taxi_store.ids_with_status(TaxiStatus.FREE), order_store.ids_with_status(OrderStatus.PENDING)
+
+    def count_scan():
+        return len([o for o in orders.values() if o.status == OrderStatus.PENDING])
+
+    assert len(scan()[0]) == len(columnar()[0][0]) == len(indexed_ids()[0])
+    assert sorted(masked_ids()[1]) == sorted(indexed_ids()[1])
+    assert count_scan() == order_store.count(OrderStatus.PENDING)
+    print(f"{args.taxis} taxis, {args.orders} orders: dict scan {timed(scan):.1f} ms, "
+          f"store filter {timed(columnar):.2f} ms")
+    print(f"Id lists: status mask {timed(masked_ids):.2f} ms, status index {timed(indexed_ids):.2f} ms")
+    print(f"Pending count: scan {timed(count_scan):.2f} ms, "
+          f"index {timed(lambda: order_store.count(OrderStatus.PENDING)) * 1000:.2f} us")
+    print(f"Memory: dataclass objects {objects_mb:.1f} MB, store arrays + index {store_mb:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
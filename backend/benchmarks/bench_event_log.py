@@ -0,0 +1,70 @@
+"""Event log write throughput and boot-time load cost with and without snapshots.
+
+Usage (from backend/):
+    python benchmarks/bench_event_log.py [--events 20000] [--batch 50] [--snapshot-every 1000]
+
+Appends order_created / order_assigned style events in batches the way event_log_processor
+does, once per synchronous mode, then times load() on a log that was never snapshotted
+against one snapshotted every --snapshot-every events.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_log import EventLog  # noqa: E402
+
+ROUTE = {'polyline': 'm{vxHeb{oL' * 20, 'duration': 312.5}
+
+
+def event(i: int):
+    if i % 2:
+        return 'order_created', {'pickup': {'lat': 51.1 + random.random() * 0.07, 'lng': 71.4 + random.random() * 0.07},
+                                 'dropoff': {'lat': 51.1 + random.random() * 0.07, 'lng': 71.4 + random.random() * 0.07}}
+    return 'order_assigned', {'taxi_id': f"taxi_{i % 100}", 'order_id': f"order_{i}", 'to_pickup_route': ROUTE,
+                              'to_dropoff_route': ROUTE, 'algorithm_used': 'hybrid', 'routes_ready': False}
+
+
+def fill(path: str, events: int, batch: int, synchronous: str, snapshot_every: int = 0) -> float:
+    log = EventLog(path, synchronous)
+    state = {'taxis': [[f"taxi_{i}", 51.1, 71.4, 'free'] for i in range(100)], 'orders': []}
+    start = time.perf_counter()
+    for i in range(events):
+        log.append(*event(i))
+        if (i + 1) % batch == 0:
+            snapshot = (log.seq, state) if snapshot_every and log.events_since_snapshot() >= snapshot_every else None
+            log.write(log.take(), snapshot)
+    log.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=50)
+    parser.add_argument('--snapshot-every', type=int, default=1000)
+    args = parser.parse_args()
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for synchronous in ("FULL", "NORMAL"):
+            elapsed = fill(os.path.join(tmp, f"{synchronous}.sqlite3"), args.events, args.batch, synchronous)
+            print(f"synchronous={synchronous}: {args.events / elapsed:,.0f} events/s, "
+                  f"{elapsed * 1000 * args.batch / args.events:.2f} ms per {args.batch}-event batch")
+
+        fill(os.path.join(tmp, "snap.sqlite3"), args.events, args.batch, "NORMAL", args.snapshot_every)
+        for name in ("FULL", "snap"):
+            log = EventLog(os.path.join(tmp, f"{name}.sqlite3"))
+            start = time.perf_counter()
+            _, events = log.load()
+            print(f"{'snapshot every ' + str(args.snapshot_every) if name == 'snap' else 'no snapshots'}: "
+                  f"load replays {len(events)} events in {(time.perf_counter() - start) * 1000:.1f} ms")
+            log.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Broadcast fan-out: awaiting each client in turn vs per-client ClientChannel queues.
+
+Usage (from backend/):
+    python benchmarks/bench_fanout.py [--clients 200] [--slow-ms 50] [--frames 20]
+
+Simulated sockets take 0.1 ms per send, except one that takes --slow-ms. Reports how long
+the producer is blocked per broadcast, and how many frames the fast clients received.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_channel import ClientChannel  # noqa: E402
+
+
+class FakeSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = 0
+
+    async def send_text(self, message: str):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(args, use_channels: bool):
+    sockets = [FakeSocket(0.0001) for _ in range(args.clients - 1)] + [FakeSocket(args.slow_ms / 1000)]
+    channels = [ClientChannel(s, lambda _: None) for s in sockets] if use_channels else []
+    for channel in channels:
+        channel.start()
+    frame = 'x' * 20000
+    blocked = 0.0
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        t = time.perf_counter()
+        if use_channels:
+            for channel in channels:
+                channel.send(frame, key='state_update')
+        else:
+            for s in sockets:
+                await s.send_text(frame)
+        blocked += time.perf_counter() - t
+        await asyncio.sleep(0.01)  # Producer's own work between broadcasts
+    elapsed = time.perf_counter() - start
+    for channel in channels:
+        channel.stop()
+    fast = sum(s.received for s in sockets[:-1]) / (len(sockets) - 1)
+    print(f"{'channels' if use_channels else 'sequential'}: {blocked * 1000 / args.frames:.2f} ms blocked per "
+          f"broadcast, {elapsed:.2f}s total, fast clients received {fast:.0f}/{args.frames} frames, "
+          f"slow client {sockets[-1].received}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--slow-ms', type=float, default=50.0)
+    parser.add_argument('--frames', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args, use_channels=False))
+    asyncio.run(run(args, use_channels=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Queries-per-second benchmark for the local road-graph routing engine.
+
+Usage (from backend/):
+    python benchmarks/bench_road_graph.py [path/to/astana.osm] [--queries 500]
+
+Without an OSM extract a synthetic Astana-sized street grid is generated.
+Every answer is checked against scipy's one-to-all Dijkstra on a sample.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Location  # noqa: E402
+from road_graph import LocalRoutingEngine, RoadGraph, load_road_graph  # noqa: E402
+
+CENTER_LAT = 51.111339
+CENTER_LNG = 71.415581
+
+
+def synthetic_grid(size: int = 200, spacing_deg: float = 0.001, seed: int = 7) -> RoadGraph:
+    """Square street grid with mixed speeds, one-way streets and missing blocks"""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.divmod(np.arange(size * size), size)
+    lat = CENTER_LAT + (rows - size / 2) * spacing_deg * 0.63  # keep cells roughly square
+    lng = CENTER_LNG + (cols - size / 2) * spacing_deg
+
+    ids = np.arange(size * size).reshape(size, size)
+    pairs = np.concatenate([
+        np.column_stack((ids[:, :-1].ravel(), ids[:, 1:].ravel())),
+        np.column_stack((ids[:-1, :].ravel(), ids[1:, :].ravel())),
+    ])
+    pairs = pairs[rng.random(len(pairs)) > 0.05]
+    speed_mps = rng.choice([30, 40, 60], size=len(pairs)) / 3.6
+    lengths = np.hypot((lat[pairs[:, 0]] - lat[pairs[:, 1]]) * 111320,
+                       (lng[pairs[:, 0]] - lng[pairs[:, 1]]) * 111320 * np.cos(np.radians(CENTER_LAT)))
+    seconds = lengths / speed_mps
+
+    oneway = rng.random(len(pairs)) < 0.15
+    src = np.concatenate([pairs[:, 0], pairs[~oneway, 1]])
+    dst = np.concatenate([pairs[:, 1], pairs[~oneway, 0]])
+    return RoadGraph(lat, lng, src, dst, np.concatenate([seconds, seconds[~oneway]]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('graph', nargs='?', help='OSM extract (.osm/.osm.gz/.osm.bz2) or compiled .npz')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--verify', type=int, default=20, help='queries checked against scipy Dijkstra')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    graph = load_road_graph(args.graph) if args.graph else synthetic_grid()
+    print(f"Graph: {graph.num_nodes} nodes, {graph.num_edges} edges, "
+          f"loaded in {time.perf_counter() - t0:.2f}s")
+
+    rng = random.Random(args.seed)
+    nodes = list(range(graph.num_nodes))
+    queries = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(args.queries)]
+
+    t0 = time.perf_counter()
+    results = [graph.shortest_path(s, t) for s, t in queries]
+    elapsed = time.perf_counter() - t0
+    print(f"Bidirectional A*: {args.queries} node-to-node queries in {elapsed:.2f}s "
+          f"-> {args.queries / elapsed:.1f} queries/s ({1000 * elapsed / args.queries:.2f} ms/query)")
+
+    engine = LocalRoutingEngine(graph)
+    locations = [(Location(float(graph.lat[s]) + 0.0003, float(graph.lng[s]) - 0.0003),
+                  Location(float(graph.lat[t]) - 0.0003, float(graph.lng[t]) + 0.0003))
+                 for s, t in queries]
+    t0 = time.perf_counter()
+    for start, end in locations:
+        engine.route(start, end)
+    elapsed = time.perf_counter() - t0
+    print(f"Engine.route (snap + search + path): {args.queries / elapsed:.1f} queries/s")
+
+    matrix = csr_matrix((graph.seconds.astype(np.float64), (graph.src, graph.dst)),
+                        shape=(graph.num_nodes, graph.num_nodes))
+    worst = 0.0
+    for (s, t), result in list(zip(queries, results))[:args.verify]:
+        reference = dijkstra(matrix, indices=s)[t]
+        worst = max(worst, abs(result[0] - reference))
+    print(f"Verified {min(args.verify, args.queries)} queries against scipy Dijkstra, "
+          f"max abs error {worst:.6f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Sharded dispatch across a process pool vs a single-core solve of the whole city.
+
+Usage (from backend/):
+    python benchmarks/bench_sharded_dispatch.py [--taxis 20000] [--orders 10000] [--workers 4]
+
+Both sides use the same per-problem solver (dense Hungarian, or k-nearest sparse matching above
+--sparse-min-pairs). Reports wall time, matched orders and the total pickup distance gap
+introduced by splitting at region borders. The pool is warmed up before timing.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cost_kernels import haversine_km  # noqa: E402
+from sharded_dispatch import ShardedDispatcher, solve_region  # noqa: E402
+
+CENTER_LAT = 51.111339
+CENTER_LNG = 71.415581
+
+
+def random_points(rng, n: int, spread: float = 0.1):
+    return CENTER_LAT + rng.uniform(-spread, spread, n) * 0.63, CENTER_LNG + rng.uniform(-spread, spread, n)
+
+
+async def run(args):
+    rng = np.random.default_rng(args.seed)
+    taxis, orders = random_points(rng, args.taxis), random_points(rng, args.orders)
+    dispatcher = ShardedDispatcher(args.parent_resolution, workers=args.workers, border_km=args.border_km,
+                                   sparse_min_pairs=args.sparse_min_pairs)
+    warm = random_points(rng, 50)
+    await dispatcher.match(*warm, *warm)
+
+    start = time.perf_counter()
+    rows, cols = solve_region(*taxis, *orders, None, 'proximity', args.sparse_min_pairs, 8, 5.0)
+    single_time = time.perf_counter() - start
+    single_km = haversine_km(taxis[0][rows], taxis[1][rows], orders[0][cols], orders[1][cols]).sum()
+    single_matched = len(cols)
+
+    start = time.perf_counter()
+    rows, cols = await dispatcher.match(*taxis, *orders)
+    sharded_time = time.perf_counter() - start
+    sharded_km = haversine_km(taxis[0][rows], taxis[1][rows], orders[0][cols], orders[1][cols]).sum()
+    assert len(set(rows.tolist())) == len(rows) and len(set(cols.tolist())) == len(cols)
+    dispatcher.close()
+
+    stats = dispatcher.stats()
+    print(f"Single  {args.taxis} taxis x {args.orders} orders: {single_matched} matched, {single_km:.1f} km in "
+          f"{single_time * 1000:.0f} ms")
+    print(f"Sharded {stats['regions']} regions, {args.workers} workers: {len(cols)} matched, {sharded_km:.1f} km in "
+          f"{sharded_time * 1000:.0f} ms (regions {stats['region_ms']:.0f} ms, reconcile "
+          f"{stats['residual_taxis']}x{stats['residual_orders']} {stats['reconcile_ms']:.0f} ms, "
+          f"gap {100 * (sharded_km / single_km - 1):+.2f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--taxis', type=int, default=20000)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--parent-resolution', type=int, default=6)
+    parser.add_argument('--border-km', type=float, default=0.5)
+    parser.add_argument('--sparse-min-pairs', type=int, default=250_000)
+    parser.add_argument('--seed', type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Sparse k-nearest dispatch vs the dense Hungarian solve.
+
+Usage (from backend/):
+    python benchmarks/bench_sparse_dispatch.py [--taxis 10000] [--orders 5000] [--k 8]
+
+Times candidate search + sparse matching on a citywide fleet, then compares total pickup
+distance and matched orders with linear_sum_assignment on a smaller instance.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cost_kernels import haversine_matrix_km  # noqa: E402
+from sparse_matching import nearest_candidates, solve_sparse_assignment  # noqa: E402
+
+CENTER_LAT = 51.111339
+CENTER_LNG = 71.415581
+
+
+def random_points(rng, n: int, spread: float = 0.1):
+    return CENTER_LAT + rng.uniform(-spread, spread, n) * 0.63, CENTER_LNG + rng.uniform(-spread, spread, n)
+
+
+def sparse_dispatch(taxis, orders, k: int, radius_km: float):
+    order_idx, taxi_idx, distances = nearest_candidates(taxis[0], taxis[1], orders[0], orders[1], k, radius_km)
+    matched_orders, matched_taxis = solve_sparse_assignment(order_idx, taxi_idx, distances,
+                                                            len(orders[0]), len(taxis[0]))
+    return matched_orders, matched_taxis, len(distances)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--taxis', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--k', type=int, default=8)
+    parser.add_argument('--radius-km', type=float, default=5.0)
+    parser.add_argument('--compare-scale', type=float, default=0.2,
+                        help='fraction of the fleet used for the dense comparison')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    taxis, orders = random_points(rng, args.taxis), random_points(rng, args.orders)
+    start = time.perf_counter()
+    matched, _, edges = sparse_dispatch(taxis, orders, args.k, args.radius_km)
+    elapsed = time.perf_counter() - start
+    print(f"Sparse {args.taxis} taxis x {args.orders} orders (k={args.k}): {edges} edges, "
+          f"{len(matched)} matched in {elapsed * 1000:.0f} ms")
+
+    n_taxis = int(args.taxis * args.compare_scale)
+    n_orders = int(args.orders * args.compare_scale)
+    taxis, orders = random_points(rng, n_taxis), random_points(rng, n_orders)
+
+    start = time.perf_counter()
+    matched_orders, matched_taxis, _ = sparse_dispatch(taxis, orders, args.k, args.radius_km)
+    sparse_time = time.perf_counter() - start
+    sparse_km = haversine_matrix_km(*taxis, *orders)[matched_taxis, matched_orders].sum()
+
+    start = time.perf_counter()
+    cost = haversine_matrix_km(*taxis, *orders)
+    rows, cols = linear_sum_assignment(cost)
+    dense_time = time.perf_counter() - start
+    dense_km = cost[rows, cols].sum()
+
+    print(f"Dense  {n_taxis} x {n_orders}: {len(rows)} matched, {dense_km:.1f} km total in {dense_time * 1000:.0f} ms")
+    print(f"Sparse {n_taxis} x {n_orders}: {len(matched_orders)} matched, {sparse_km:.1f} km total "
+          f"in {sparse_time * 1000:.0f} ms (gap {100 * (sparse_km / dense_km - 1):+.2f}%)")
+
+
+if __name__ == '__main__':
+    main()
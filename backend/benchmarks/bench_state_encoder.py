@@ -0,0 +1,95 @@
+"""state_update serialization: asdict + enum walk + json.dumps vs cached StateEncoder fragments.
+
+Usage (from backend/):
+    python benchmarks/bench_state_encoder.py [--taxis 1000] [--orders 500] [--route-points 50 500]
+
+Each frame follows one taxi / order change, as a broadcast after an assignment would. The
+legacy path re-serializes every entity; the encoder re-encodes only the changed ones, so its
+cost stays flat as routes get longer.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Assignment, Location, Order, OrderStatus, Route, Taxi, TaxiStatus  # noqa: E402
+from state_encoder import StateEncoder, msgpack  # noqa: E402
+
+
+def serialize_enum(obj):
+    if isinstance(obj, dict):
+        return {k: serialize_enum(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [serialize_enum(item) for item in obj]
+    elif hasattr(obj, 'value'):
+        return obj.value
+    return obj
+
+
+def random_location() -> Location:
+    return Location(lat=51.11 + random.uniform(-0.1, 0.1), lng=71.41 + random.uniform(-0.1, 0.1))
+
+
+def random_route(points: int) -> Route:
+    start = random_location()
+    path = [[start.lat + i * 1e-4 + random.uniform(0, 5e-5), start.lng + i * 1e-4] for i in range(points)]
+    return Route.from_path(path, 300.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--taxis', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--route-points', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--frames', type=int, default=50)
+    args = parser.parse_args()
+    random.seed(42)
+
+    for points in args.route_points:
+        taxis = [Taxi(f"taxi_{i}", random_location(), TaxiStatus.FREE) for i in range(args.taxis)]
+        orders = [Order(f"order_{j}", random_location(), random_location(), OrderStatus.ASSIGNED)
+                  for j in range(args.orders)]
+        assignments = [Assignment(taxis[j].id, order.id, random_route(points), random_route(points))
+                       for j, order in enumerate(orders)]
+        versions = {entity.id: 0 for entity in taxis + orders}
+
+        def touch(i: int):
+            taxi = taxis[i % len(taxis)]
+            taxi.location = random_location()
+            versions[taxi.id] += 1
+
+        def legacy():
+            return json.dumps({
+                "type": "state_update",
+                "taxis": [serialize_enum(asdict(taxi)) for taxi in taxis],
+                "orders": [serialize_enum(asdict(order)) for order in orders],
+                "assignments": [serialize_enum(asdict(assignment)) for assignment in assignments]
+            })
+
+        encoder = StateEncoder()
+
+        def encoded(fmt: str):
+            return encoder.state_update(fmt, ((t, versions[t.id]) for t in taxis),
+                                        ((o, versions[o.id]) for o in orders), assignments)
+
+        assert json.loads(encoded('json')) == json.loads(legacy())
+        results = {}
+        for name, fn in [('legacy', legacy), ('encoder json', lambda: encoded('json'))] + \
+                        ([('encoder msgpack', lambda: encoded('msgpack'))] if msgpack is not None else []):
+            fn()
+            start = time.perf_counter()
+            for i in range(args.frames):
+                touch(i)
+                frame = fn()
+            results[name] = ((time.perf_counter() - start) * 1000 / args.frames, len(frame))
+        print(f"{args.taxis} taxis, {args.orders} assignments, {points}-point routes: " +
+              ", ".join(f"{name} {ms:.2f} ms ({size / 1e3:.0f} kB)" for name, (ms, size) in results.items()))
+
+
+if __name__ == '__main__':
+    main()
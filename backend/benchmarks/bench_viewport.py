@@ -0,0 +1,106 @@
+"""Per-client state_update cost: the full fleet vs only what a district viewport shows.
+
+Usage (from backend/):
+    python benchmarks/bench_viewport.py [--taxis 10000] [--orders 5000] [--viewport-km 3]
+
+Clients watch random --viewport-km squares of a ~22 km city. The filtered frame holds the
+taxis and orders (by pickup) in the viewport's H3 cells, found through the EntityStore cell
+index, plus their assignments. Reports frame size and build time per client.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import h3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_store import EntityStore  # noqa: E402
+from models import Assignment, Location, Order, OrderStatus, Route, Taxi, TaxiStatus  # noqa: E402
+from state_encoder import StateEncoder  # noqa: E402
+from viewport import Viewport  # noqa: E402
+
+CENTER_LAT = 51.111339
+CENTER_LNG = 71.415581
+RESOLUTION = 7
+
+
+def random_location() -> Location:
+    return Location(lat=CENTER_LAT + random.uniform(-0.1, 0.1), lng=CENTER_LNG + random.uniform(-0.1, 0.1))
+
+
+def route_from(start: Location, points: int = 50) -> Route:
+    return Route.from_path([[start.lat + i * 1e-4, start.lng + i * 1e-4] for i in range(points)], 300.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--taxis', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--viewport-km', type=float, default=3.0)
+    parser.add_argument('--clients', type=int, default=50)
+    args = parser.parse_args()
+    random.seed(42)
+
+    taxis = {f"taxi_{i}": Taxi(f"taxi_{i}", random_location(), TaxiStatus.FREE) for i in range(args.taxis)}
+    orders = {f"order_{j}": Order(f"order_{j}", random_location(), random_location(), OrderStatus.PENDING)
+              for j in range(args.orders)}
+    taxi_store = EntityStore(list(TaxiStatus), capacity=args.taxis)
+    order_store = EntityStore(list(OrderStatus), capacity=args.orders)
+    assignments = {}
+    for taxi, order in zip(list(taxis.values())[:args.orders // 2], list(orders.values())[:args.orders // 2]):
+        taxi.status, order.status = TaxiStatus.BUSY, OrderStatus.ASSIGNED
+        assignments[order.id] = Assignment(taxi.id, order.id, route_from(taxi.location), route_from(order.pickup))
+    for taxi in taxis.values():
+        taxi_store.upsert(taxi.id, taxi.location.lat, taxi.location.lng, taxi.status,
+                          h3.latlng_to_cell(taxi.location.lat, taxi.location.lng, RESOLUTION))
+    for order in orders.values():
+        order_store.upsert(order.id, order.pickup.lat, order.pickup.lng, order.status,
+                           h3.latlng_to_cell(order.pickup.lat, order.pickup.lng, RESOLUTION))
+    taxi_assignments = {a.taxi_id: a for a in assignments.values()}
+
+    def frame(encoder, taxi_ids, order_ids, frame_assignments):
+        return encoder.state_update('json', ((taxis[i], taxi_store.version(i)) for i in taxi_ids),
+                                    ((orders[i], order_store.version(i)) for i in order_ids), frame_assignments)
+
+    def visible(viewport: Viewport):
+        taxi_ids = set(taxi_store.ids_in_cells(viewport.cells))
+        order_ids = set(order_store.ids_in_cells(viewport.cells))
+        visible_assignments = [a for a in map(assignments.get, order_ids) if a is not None]
+        visible_assignments += [a for a in map(taxi_assignments.get, taxi_ids)
+                                if a is not None and a.order_id not in order_ids]
+        for assignment in visible_assignments:
+            taxi_ids.add(assignment.taxi_id)
+            order_ids.add(assignment.order_id)
+        return taxi_ids, order_ids, visible_assignments
+
+    half_lat = args.viewport_km / 2 / 111.32
+    half_lng = half_lat / math.cos(math.radians(CENTER_LAT))
+    viewports = []
+    for _ in range(args.clients):
+        center = random_location()
+        viewports.append(Viewport.from_bbox((center.lat - half_lat, center.lng - half_lng,
+                                             center.lat + half_lat, center.lng + half_lng), RESOLUTION, 20000))
+
+    for name, build in [('full', lambda _: (taxis, orders, assignments.values())), ('viewport', visible)]:
+        encoder = StateEncoder()
+        for viewport in viewports:  # Warm the fragment cache, as after the first broadcast
+            frame(encoder, *build(viewport))
+        start = time.perf_counter()
+        sizes = [len(frame(encoder, *build(viewport))) for viewport in viewports]
+        elapsed = (time.perf_counter() - start) * 1000 / len(viewports)
+        print(f"{name}: {elapsed:.2f} ms, {sum(sizes) / len(sizes) / 1e3:.0f} kB per client")
+
+    taxi_ids, order_ids, _ = visible(viewports[0])
+    data = json.loads(frame(StateEncoder(), *visible(viewports[0])))
+    assert {t['id'] for t in data['taxis']} == taxi_ids and {o['id'] for o in data['orders']} == order_ids
+    print(f"{args.clients} viewports of {args.viewport_km:g} km, {sum(map(len, viewports)) / len(viewports):.0f} "
+          f"H3 cells each on average")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Headless accelerated-time simulation of the dispatch system with a run report.
+
+Usage (from backend/):
+    python benchmarks/simulate.py [--hours 24] [--seed 42] [--strategy all] [--taxis 10]
+                                  [--order-interval 3] [--max-pending 50] [--json report.json]
+
+Drives TaxiDispatchSystem on a virtual clock (see simulation.py) with seeded order
+generation, so a day of traffic runs in seconds to minutes and a given seed replays
+exactly. Routes are straight lines (no routing API or road graph), and there is no event
+log or on-disk route cache. Each strategy is run on the same seed, reporting orders
+assigned per wall second, the pickup wait distribution (order creation until the taxi
+reaches the pickup) and dispatch round / demand tick latency.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from simulation import STRATEGIES, run_simulation  # noqa: E402
+
+
+def print_report(report: dict):
+    waits, rounds, ticks = report['pickup_wait_s'], report['dispatch_round_ms'], report['demand_tick_ms']
+    print(f"[{report['strategy']}] {report['simulated_hours']:.1f}h simulated in {report['wall_seconds']:.1f}s "
+          f"({report['speedup']:,.0f}x real time)")
+    print(f"  orders: {report['orders_created']} created, {report['orders_rejected']} rejected (queue full), "
+          f"{report['orders_assigned']} assigned, {report['orders_completed']} completed, "
+          f"{report['orders_per_second']:,.0f} assigned per wall second")
+    print(f"  pickup wait (s): mean {waits['mean']:.0f}  p50 {waits['p50']:.0f}  p90 {waits['p90']:.0f}  "
+          f"p99 {waits['p99']:.0f}  max {waits['max']:.0f};  fleet utilization {report['fleet_utilization']:.0%}")
+    print(f"  dispatch round (ms): p50 {rounds['p50']:.2f}  p99 {rounds['p99']:.2f}  max {rounds['max']:.2f} "
+          f"over {rounds['count']} rounds;  demand tick (ms): p50 {ticks['p50']:.3f}  p99 {ticks['p99']:.3f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, default=24.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--strategy', choices=['all', *STRATEGIES], default='all')
+    parser.add_argument('--taxis', type=int, default=main.MAX_TAXIS)
+    parser.add_argument('--order-interval', type=float, default=3.0, help='Mean seconds between orders')
+    parser.add_argument('--max-pending', type=int, default=main.MAX_PENDING_ORDERS)
+    parser.add_argument('--speed-kmh', type=float, default=30.0)
+    parser.add_argument('--json', help='Also write the reports to this file')
+    parser.add_argument('--verbose', action='store_true', help='Keep the dispatch system logs')
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    main.MAX_TAXIS = args.taxis
+    main.MAX_PENDING_ORDERS = args.max_pending
+    main.USE_ROUTES_PLANNER = False
+    main.ROUTING_BACKEND = "ors"  # With the planner off: straight-line routes, whatever the local config
+    main.USE_TRAVEL_TIME_MATRIX = False
+
+    def system_factory(clock, rng):
+        return main.TaxiDispatchSystem(clock=clock, rng=rng, headless=True, route_cache_path=None)
+
+    reports = []
+    for strategy in (STRATEGIES if args.strategy == 'all' else [args.strategy]):
+        report = run_simulation(system_factory, args.hours * 3600, seed=args.seed, strategy=strategy,
+                                order_interval=args.order_interval, speed_kmh=args.speed_kmh)
+        print_report(report)
+        reports.append(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastCoordinator:
+    """Coalesces state changes into at most one broadcast per interval
+
+    Producers call mark_dirty() instead of broadcasting. run() flushes as soon as the state is
+    dirty if the previous flush is at least interval ago, otherwise when the interval ends, so
+    an idle system broadcasts without delay and a burst of changes costs one frame per interval.
+    Changes made while a flush is in progress mark the state dirty again for the next one.
+    """
+
+    def __init__(self, flush: Callable[[], Awaitable[None]], interval: float = 0.1):
+        self._flush = flush
+        self.interval = interval
+        self._dirty = False
+        self._wakeup = asyncio.Event()
+        self._last_flush = float('-inf')
+
+        self.requests = 0  # mark_dirty() calls
+        self.frames = 0  # Flushes actually run
+        self.coalesced = 0  # Requests folded into an already pending flush
+        self.flush_time = 0.0
+        self.max_flush_time = 0.0
+
+    def mark_dirty(self):
+        self.requests += 1
+        if self._dirty:
+            self.coalesced += 1
+            return
+        self._dirty = True
+        self._wakeup.set()
+
+    async def run(self):
+        while True:
+            if not self._dirty:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._last_flush + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._dirty = False
+            started = self._last_flush = time.monotonic()
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Broadcast failed: {e}")
+            elapsed = time.monotonic() - started
+            self.frames += 1
+            self.flush_time += elapsed
+            self.max_flush_time = max(self.max_flush_time, elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'interval_ms': self.interval * 1000,
+            'requests': self.requests,
+            'frames': self.frames,
+            'coalesced': self.coalesced,
+            'pending': self._dirty,
+            'avg_flush_ms': self.flush_time * 1000 / self.frames if self.frames else 0.0,
+            'max_flush_ms': self.max_flush_time * 1000
+        }
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[str, bytes]  # Text frames are str, binary frames bytes
+
+# Close code sent to clients that cannot keep up (1013: try again later)
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+
+class ClientChannel:
+    """Outbound frame queue of one WebSocket client, drained by its own sender task
+
+    send() never waits: it appends the shared frame and returns, so broadcasting costs the
+    producer one append per client whatever the clients' network speed. A frame sent with a
+    key replaces a queued frame with the same key (a newer state_update makes the queued one
+    stale), moving to the back of the queue. A client whose queue still overflows, or whose
+    send does not complete within send_timeout, is disconnected and reported to on_close.
+    """
+
+    def __init__(self, websocket: WebSocket, on_close: Callable[[WebSocket], None], wire_format: str = 'json',
+                 max_frames: int = 64, send_timeout: float = 5.0):
+        self.websocket = websocket
+        self.wire_format = wire_format
+        self.max_frames = max_frames
+        self.send_timeout = send_timeout
+        self._on_close = on_close
+        self._queue: Deque[Tuple[Optional[str], Frame]] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.close_reason: Optional[str] = None
+
+        self.sent = 0
+        self.coalesced = 0  # Queued frames replaced by a newer frame with the same key
+        self.bytes_sent = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._sender())
+
+    def send(self, frame: Frame, key: Optional[str] = None) -> bool:
+        """Queue a frame; returns False if the channel is closed or has just been closed for overflowing"""
+        if self.closed:
+            return False
+        if key is not None:
+            for i, (queued_key, _) in enumerate(self._queue):
+                if queued_key == key:
+                    del self._queue[i]
+                    self.coalesced += 1
+                    break
+        if len(self._queue) >= self.max_frames:
+            self.close(f"send queue full ({self.max_frames} frames)")
+            return False
+        self._queue.append((key, frame))
+        self._ready.set()
+        return True
+
+    async def _sender(self):
+        while not self.closed:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            _, frame = self._queue.popleft()
+            try:
+                if isinstance(frame, str):
+                    await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_bytes(frame), self.send_timeout)
+            except asyncio.TimeoutError:
+                self.close(f"send stalled for more than {self.send_timeout:g}s")
+                return
+            except Exception as e:
+                self.close(f"send failed: {e!r}")
+                return
+            self.sent += 1
+            self.bytes_sent += len(frame)
+
+    def close(self, reason: str):
+        """Stop sending, drop queued frames and disconnect the client"""
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        self._queue.clear()
+        self._ready.set()
+        logger.warning(f"Disconnecting client: {reason}")
+        self._on_close(self.websocket)
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        asyncio.get_running_loop().create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=SLOW_CLIENT_CLOSE_CODE), self.send_timeout)
+        except Exception:
+            pass  # Already closed by the client or the transport is gone
+
+    def stop(self):
+        """The client disconnected by itself"""
+        self.closed = True
+        self._queue.clear()
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'format': self.wire_format,
+            'queued': len(self._queue),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'bytes_sent': self.bytes_sent
+        }
@@ -0,0 +1,82 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from models import DemandHexagon
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Elementwise (broadcastable) great-circle distance in km, same formula as TaxiDispatchSystem.get_distance"""
+    d_lat = np.radians(lat2 - lat1)
+    d_lng = np.radians(lng2 - lng1)
+    a = (np.sin(d_lat / 2) ** 2 +
+         np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) *
+         np.sin(d_lng / 2) ** 2)
+    return EARTH_RADIUS_KM * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+
+
+def haversine_matrix_km(lat1: np.ndarray, lng1: np.ndarray,
+                        lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances (km) between two coordinate arrays"""
+    return haversine_km(np.asarray(lat1, dtype=np.float64)[:, None], np.asarray(lng1, dtype=np.float64)[:, None],
+                        np.asarray(lat2, dtype=np.float64)[None, :], np.asarray(lng2, dtype=np.float64)[None, :])
+
+
+def demand_vectors(order_cells: Sequence[str],
+                   demand_hexagons: Dict[str, DemandHexagon]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-order (demand_ratio, orders_count, taxis_count, known) arrays for the pickup hexagons"""
+    m = len(order_cells)
+    ratio = np.zeros(m)
+    orders = np.zeros(m)
+    taxis = np.zeros(m)
+    known = np.zeros(m, dtype=bool)
+    for j, hex_id in enumerate(order_cells):
+        hex_data = demand_hexagons.get(hex_id)
+        if hex_data is not None:
+            ratio[j] = hex_data.demand_ratio
+            orders[j] = hex_data.orders_count
+            taxis[j] = hex_data.taxis_count
+            known[j] = True
+    return ratio, orders, taxis, known
+
+
+def hybrid_demand_weights(ratio: np.ndarray, orders: np.ndarray,
+                          taxis: np.ndarray, known: np.ndarray) -> np.ndarray:
+    """Inverse-demand weight per order; higher demand in the pickup hexagon lowers the cost"""
+    effective_ratio = np.where(known & (taxis > 0), ratio,
+                               np.where(known & (orders > 0), np.inf, 1.0))
+    with np.errstate(divide='ignore'):
+        return np.minimum(1.0, 1.0 / (effective_ratio + 1e-6))
+
+
+def hybrid_cost_matrix(distance_costs: np.ndarray, demand_weights: np.ndarray,
+                       weight_distance: float = 0.6, weight_demand: float = 0.4) -> np.ndarray:
+    """Weighted sum of distance and demand-scaled distance; demand_weights align with the last axis"""
+    return (weight_distance * distance_costs +
+            weight_demand * distance_costs * (1 - demand_weights))
+
+
+def demand_costs(ratio: np.ndarray, known: np.ndarray) -> np.ndarray:
+    """Demand-only cost per order; the taxi does not matter"""
+    with np.errstate(divide='ignore'):
+        per_order = np.where(ratio == np.inf, 0.1,  # Very low cost for high unmet demand
+                             np.where(ratio > 0, 1.0 / (ratio + 1e-6), 1.0))
+    return np.where(known, per_order, 1.0)
+
+
+def demand_cost_matrix(ratio: np.ndarray, known: np.ndarray, num_taxis: int) -> np.ndarray:
+    """Demand-only costs: every taxi pays the same inverse-demand cost for a given order"""
+    per_order = demand_costs(ratio, known)
+    return np.broadcast_to(per_order, (num_taxis, len(per_order))).copy()
+
+
+def smoothed_demand(arrivals: np.ndarray, taxis: np.ndarray, min_orders: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+    """(demand_ratio, orders) with pending orders replaced by recent arrivals per pickup hexagon
+
+    Decayed arrival counts never quite reach zero, so trickles below min_orders count as none.
+    """
+    orders = np.where(arrivals >= min_orders, arrivals, 0.0)
+    ratio = np.where(taxis > 0, orders / np.maximum(taxis, 1), np.where(orders > 0, np.inf, 0.0))
+    return ratio, orders
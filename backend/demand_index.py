@@ -0,0 +1,179 @@
+import math
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import h3
+
+from models import DemandHexagon, Order, OrderStatus, Taxi, TaxiStatus
+
+# (lat_min, lng_min, lat_max, lng_max)
+BoundingBox = Tuple[float, float, float, float]
+
+# Lowest map zoom level at which each H3 resolution is shown (~1.2km res 7 cells at zoom 12)
+ZOOM_RESOLUTIONS = ((15, 9), (14, 8), (12, 7), (11, 6), (0, 5))
+
+
+def parse_bbox(values: Sequence) -> BoundingBox:
+    """BoundingBox from 4 finite numbers (or numeric strings); ValueError / TypeError otherwise"""
+    if isinstance(values, str) or len(values) != 4:
+        raise ValueError("bbox must be [lat_min, lng_min, lat_max, lng_max]")
+    bbox = tuple(float(v) for v in values)
+    if not all(math.isfinite(v) for v in bbox):
+        raise ValueError(f"bbox values must be finite: {bbox}")
+    return bbox
+
+
+@lru_cache(maxsize=65536)
+def _cell_geometry(cell: str) -> Tuple[List[float], List[List[float]]]:
+    center = h3.cell_to_latlng(cell)
+    return [center[0], center[1]], [[lat, lng] for lat, lng in h3.cell_to_boundary(cell)]
+
+
+class DemandPyramid:
+    """Order / free taxi counts at several H3 resolutions, every cell the sum of its children
+
+    Entities are counted at the finest resolution and rolled up through cell_to_parent, so a
+    view at any level reads pre-aggregated counters. Only cells with activity are stored.
+    """
+
+    def __init__(self, resolutions: Sequence[int], refresh: Callable[[DemandHexagon], None]):
+        self.resolutions = sorted(resolutions)
+        self.finest = self.resolutions[-1]
+        self.refresh = refresh
+        self.counts: Dict[int, Dict[str, List[int]]] = {r: {} for r in self.resolutions}  # [orders, taxis]
+        self.version = 0  # Bumped on every count change
+
+    @lru_cache(maxsize=65536)
+    def _lineage(self, cell: str) -> Tuple[Tuple[int, str], ...]:
+        return tuple((r, h3.cell_to_parent(cell, r)) for r in self.resolutions)
+
+    def add(self, cell: str, field: int, delta: int):
+        """Add delta to the orders (field 0) or taxis (field 1) count of a finest-level cell and its ancestors"""
+        for resolution, ancestor in self._lineage(cell):
+            level = self.counts[resolution]
+            counts = level.setdefault(ancestor, [0, 0])
+            counts[field] += delta
+            if counts[0] == 0 and counts[1] == 0:
+                del level[ancestor]
+        self.version += 1
+
+    def resolution_for_zoom(self, zoom: float) -> int:
+        # Zooms below 0 (or NaN) get the coarsest level
+        resolution = next((r for min_zoom, r in ZOOM_RESOLUTIONS if zoom >= min_zoom), ZOOM_RESOLUTIONS[-1][1])
+        return min(self.resolutions, key=lambda r: abs(r - resolution))
+
+    def view(self, resolution: int, bbox: Optional[BoundingBox] = None) -> List[DemandHexagon]:
+        """Active cells of one level whose center lies in bbox, with ratio, color and level filled in"""
+        hexagons = []
+        for cell, (orders, taxis) in self.counts[resolution].items():
+            center, boundary = _cell_geometry(cell)
+            if bbox is not None and not (bbox[0] <= center[0] <= bbox[2] and bbox[1] <= center[1] <= bbox[3]):
+                continue
+            hex_data = DemandHexagon(hex_id=cell, center=center, boundary=boundary, orders_count=orders,
+                                     taxis_count=taxis, demand_ratio=0.0, color='', demand_level='')
+            self.refresh(hex_data)
+            hexagons.append(hex_data)
+        return hexagons
+
+
+class DemandIndex:
+    """Per-hexagon pending order / free taxi counters maintained from entity changes
+
+    track_order and track_taxi are idempotent: they move an entity's count to match its
+    current status and cell, so callers report an entity after every status or location
+    change. Pickup cells are computed once per order and taxi cells once per location.
+    flush() runs refresh (ratio, color, level) only on the hexagons whose counts changed.
+    Entities outside the grid are not counted in it, but are in the optional pyramid.
+    """
+
+    def __init__(self, demand_hexagons: Dict[str, DemandHexagon], resolution: int,
+                 refresh: Callable[[DemandHexagon], None], pyramid: Optional[DemandPyramid] = None):
+        self.demand_hexagons = demand_hexagons
+        self.resolution = resolution
+        self.refresh = refresh
+        self.pyramid = pyramid
+
+        self._pickup_cells: Dict[str, Tuple[str, str]] = {}  # Order id -> (grid cell, pyramid cell)
+        self._taxi_cells: Dict[str, Tuple[float, float, Tuple[str, str]]] = {}  # Taxi id -> (lat, lng, cells)
+        self._counted_orders: Dict[str, Tuple[str, str]] = {}  # Pending order id -> counted cells
+        self._counted_taxis: Dict[str, Tuple[str, str]] = {}  # Free taxi id -> counted cells
+        self._dirty: Set[str] = set()
+
+        self.cell_lookups = 0
+        self.refreshed_hexagons = 0
+
+    def _locate(self, lat: float, lng: float) -> Tuple[str, str]:
+        cell = h3.latlng_to_cell(lat, lng, self.resolution)
+        self.cell_lookups += 1
+        if self.pyramid is None:
+            return cell, cell
+        return cell, h3.latlng_to_cell(lat, lng, self.pyramid.finest)
+
+    def _order_cells(self, order: Order) -> Tuple[str, str]:
+        cells = self._pickup_cells.get(order.id)
+        if cells is None:
+            cells = self._locate(order.pickup.lat, order.pickup.lng)
+            self._pickup_cells[order.id] = cells
+        return cells
+
+    def _current_taxi_cells(self, taxi: Taxi) -> Tuple[str, str]:
+        lat, lng = taxi.location.lat, taxi.location.lng
+        cached = self._taxi_cells.get(taxi.id)
+        if cached is not None and cached[0] == lat and cached[1] == lng:
+            return cached[2]
+        cells = self._locate(lat, lng)
+        self._taxi_cells[taxi.id] = (lat, lng, cells)
+        return cells
+
+    def pickup_cell(self, order: Order) -> str:
+        return self._order_cells(order)[0]
+
+    def taxi_cell(self, taxi: Taxi) -> str:
+        return self._current_taxi_cells(taxi)[0]
+
+    def _move(self, counted: Dict[str, Tuple[str, str]], entity_id: str, cells: Optional[Tuple[str, str]],
+              field: str):
+        """Move one entity's contribution to cells (None removes it)"""
+        previous = counted.get(entity_id)
+        if previous == cells:
+            return
+        pyramid_field = 0 if field == 'orders_count' else 1
+        if previous is not None:
+            grid_cell, fine_cell = previous
+            if grid_cell in self.demand_hexagons:
+                hex_data = self.demand_hexagons[grid_cell]
+                setattr(hex_data, field, getattr(hex_data, field) - 1)
+                self._dirty.add(grid_cell)
+            if self.pyramid is not None:
+                self.pyramid.add(fine_cell, pyramid_field, -1)
+            del counted[entity_id]
+        if cells is not None:
+            grid_cell, fine_cell = cells
+            if grid_cell in self.demand_hexagons:
+                hex_data = self.demand_hexagons[grid_cell]
+                setattr(hex_data, field, getattr(hex_data, field) + 1)
+                self._dirty.add(grid_cell)
+            if self.pyramid is not None:
+                self.pyramid.add(fine_cell, pyramid_field, 1)
+            counted[entity_id] = cells
+
+    def track_order(self, order: Order):
+        cells = self._order_cells(order) if order.status == OrderStatus.PENDING else None
+        self._move(self._counted_orders, order.id, cells, 'orders_count')
+
+    def forget_order(self, order_id: str):
+        """The order was deleted"""
+        self._move(self._counted_orders, order_id, None, 'orders_count')
+        self._pickup_cells.pop(order_id, None)
+
+    def track_taxi(self, taxi: Taxi):
+        cells = self._current_taxi_cells(taxi) if taxi.status == TaxiStatus.FREE else None
+        self._move(self._counted_taxis, taxi.id, cells, 'taxis_count')
+
+    def flush(self) -> Set[str]:
+        """Refresh the hexagons changed since the last flush and return their ids"""
+        changed, self._dirty = self._dirty, set()
+        for hex_id in changed:
+            self.refresh(self.demand_hexagons[hex_id])
+        self.refreshed_hexagons += len(changed)
+        return changed
@@ -0,0 +1,73 @@
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_WINDOWS = (60.0, 300.0, 900.0)  # Seconds: 1, 5 and 15 minute windows
+
+
+class RollingDemandStats:
+    """Per-hexagon order arrivals, fulfilments and wait times over several time windows
+
+    Each window is an exponentially decayed counter with that time constant: a counter holds
+    sum(exp(-age / window)) over past events, i.e. roughly the events of the last window.
+    Counters live in (hexagons x windows) arrays and decay lazily per row, so recording an
+    event is O(1) and reading all hexagons is one vectorized decay.
+    """
+
+    def __init__(self, cells: Sequence[str], windows: Sequence[float] = DEFAULT_WINDOWS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.index: Dict[str, int] = {cell: i for i, cell in enumerate(cells)}
+        self.windows = np.asarray(windows, dtype=np.float64)
+        self.clock = clock
+        shape = (len(self.index), len(self.windows))
+        self._arrivals = np.zeros(shape)
+        self._fulfilments = np.zeros(shape)
+        self._wait_sums = np.zeros(shape)  # Decayed sum of fulfilled orders' waits (seconds)
+        self._stamps = np.full(len(self.index), self.clock())  # Time each row was last decayed to
+
+    def _touch(self, row: int, now: float):
+        decay = np.exp(-(now - self._stamps[row]) / self.windows)
+        self._arrivals[row] *= decay
+        self._fulfilments[row] *= decay
+        self._wait_sums[row] *= decay
+        self._stamps[row] = now
+
+    def record_arrival(self, cell: str):
+        row = self.index.get(cell)
+        if row is None:
+            return
+        self._touch(row, self.clock())
+        self._arrivals[row] += 1.0
+
+    def record_fulfilment(self, cell: str, wait_seconds: float):
+        row = self.index.get(cell)
+        if row is None:
+            return
+        self._touch(row, self.clock())
+        self._fulfilments[row] += 1.0
+        self._wait_sums[row] += wait_seconds
+
+    def _decay(self, now: Optional[float]) -> np.ndarray:
+        now = self.clock() if now is None else now
+        return np.exp(-(now - self._stamps)[:, None] / self.windows)
+
+    def arrivals(self, now: Optional[float] = None) -> np.ndarray:
+        """(hexagons x windows) decayed arrival counts, ~orders that arrived within each window"""
+        return self._arrivals * self._decay(now)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Per-hexagon (hexagons x windows) arrival and fulfilment rates per minute and mean waits"""
+        decay = self._decay(now)
+        fulfilments = self._fulfilments * decay
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_wait = np.where(fulfilments > 1e-9, self._wait_sums * decay / fulfilments, 0.0)
+        return {
+            'arrivals_per_min': self._arrivals * decay * 60.0 / self.windows,
+            'fulfilments_per_min': fulfilments * 60.0 / self.windows,
+            'mean_wait_s': mean_wait
+        }
+
+    def rows(self, cells: Sequence[str]) -> np.ndarray:
+        """Row of each cell, -1 for cells outside the grid"""
+        return np.array([self.index.get(cell, -1) for cell in cells], dtype=np.int64)
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DispatchRound:
+    trigger: str  # 'backlog', 'sla' or 'window'
+    batch_size: int  # Pending orders when the round started
+    free_taxis: int
+    assigned: int
+    latency: float  # Seconds spent in the round
+    oldest_wait: float  # Age of the oldest pending order when the round started
+
+
+class DispatchScheduler:
+    """Event-driven trigger for assignment rounds replacing a fixed polling interval
+
+    A round starts as soon as the pending queue reaches backlog_threshold, when the oldest
+    order would otherwise miss sla_seconds (allowing for the measured round latency), or when
+    its batching window closes. The window shrinks from max_window towards min_window as the
+    queue fills, so light load batches for better matches and backlog dispatches at once.
+    With no pending orders or no free taxis the scheduler sleeps until notified. Times come
+    from clock, so a simulation can drive decide() / dispatch() on a virtual clock instead of run().
+    """
+
+    def __init__(self, run_round: Callable[[], Awaitable[int]], free_taxis: Callable[[], int],
+                 sla_seconds: float = 3.0, backlog_threshold: int = 10,
+                 min_window: float = 0.2, max_window: float = 2.0, history: int = 200,
+                 clock: Callable[[], float] = time.monotonic):
+        self._run_round = run_round
+        self._free_taxis = free_taxis
+        self.sla_seconds = sla_seconds
+        self.backlog_threshold = backlog_threshold
+        self.min_window = min_window
+        self.max_window = max_window
+        self.clock = clock
+
+        self._waiting: "OrderedDict[str, float]" = OrderedDict()  # Pending order id -> arrival time
+        self._wakeup = asyncio.Event()
+        self._latency_estimate = 0.0
+
+        self.rounds: Deque[DispatchRound] = deque(maxlen=history)
+        self.waits: Deque[float] = deque(maxlen=history)
+        self.triggers: Counter = Counter()
+        self.total_rounds = 0
+        self.dispatched = 0
+        self.sla_misses = 0
+
+    def order_arrived(self, order_id: str):
+        self._waiting[order_id] = self.clock()
+        self._wakeup.set()
+
+    def order_dispatched(self, order_id: str) -> Optional[float]:
+        """Record an assigned order; returns its wait in seconds if the scheduler saw it arrive"""
+        arrival = self._waiting.pop(order_id, None)
+        if arrival is None:
+            return None
+        wait = self.clock() - arrival
+        self.waits.append(wait)
+        self.dispatched += 1
+        if wait > self.sla_seconds:
+            self.sla_misses += 1
+        return wait
+
+    def capacity_changed(self):
+        """A taxi became free"""
+        self._wakeup.set()
+
+    def _oldest_wait(self, now: float) -> float:
+        return now - next(iter(self._waiting.values())) if self._waiting else 0.0
+
+    def _window(self) -> float:
+        fill = min(1.0, len(self._waiting) / self.backlog_threshold)
+        return self.max_window - (self.max_window - self.min_window) * fill
+
+    async def _sleep_until_notified(self, timeout: float = None):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def decide(self, now: float) -> Tuple[Optional[str], Optional[float]]:
+        """Trigger of a round due at now, else None and the seconds to wait (None: until notified)"""
+        if not self._waiting or self._free_taxis() == 0:
+            return None, None
+        oldest = self._oldest_wait(now)
+        sla_age = self.sla_seconds - self._latency_estimate
+        if len(self._waiting) >= self.backlog_threshold:
+            return 'backlog', 0.0
+        if oldest >= sla_age:
+            return 'sla', 0.0
+        if oldest >= self._window():
+            return 'window', 0.0
+        # Keep batching until the window or SLA deadline, or until more work arrives
+        return None, min(self._window(), sla_age) - oldest
+
+    async def run(self):
+        while True:
+            now = self.clock()
+            trigger, delay = self.decide(now)
+            if trigger is None:
+                await self._sleep_until_notified(delay)
+                continue
+
+            assigned = await self.dispatch(trigger, now)
+            if assigned == 0:
+                # Nothing matchable (e.g. no taxi in range); wait for new orders or taxis
+                await self._sleep_until_notified(self.max_window)
+
+    async def dispatch(self, trigger: str, started: float) -> int:
+        """Run one round started at clock time started; returns the number of assignments"""
+        oldest = self._oldest_wait(started)
+        batch_size = len(self._waiting)
+        free_taxis = self._free_taxis()
+        try:
+            assigned = await self._run_round()
+        except Exception as e:
+            logger.error(f"Dispatch round failed: {e}")
+            assigned = 0
+        latency = self.clock() - started
+
+        self._latency_estimate = latency if not self.total_rounds else 0.8 * self._latency_estimate + 0.2 * latency
+        self.rounds.append(DispatchRound(trigger, batch_size, free_taxis, assigned, latency, oldest))
+        self.triggers[trigger] += 1
+        self.total_rounds += 1
+        logger.info(f"Dispatch round ({trigger}): {assigned}/{batch_size} orders assigned to "
+                    f"{free_taxis} free taxis in {latency * 1000:.0f} ms, oldest wait {oldest:.2f}s")
+        return assigned
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = [r.latency for r in self.rounds]
+        return {
+            'rounds': self.total_rounds,
+            'pending': len(self._waiting),
+            'triggers': dict(self.triggers),
+            'avg_batch_size': float(np.mean([r.batch_size for r in self.rounds])) if self.rounds else 0.0,
+            'p50_latency_ms': float(np.percentile(latencies, 50)) * 1000 if latencies else 0.0,
+            'p95_latency_ms': float(np.percentile(latencies, 95)) * 1000 if latencies else 0.0,
+            'p50_wait_s': float(np.percentile(self.waits, 50)) if self.waits else 0.0,
+            'p95_wait_s': float(np.percentile(self.waits, 95)) if self.waits else 0.0,
+            'sla_seconds': self.sla_seconds,
+            'sla_misses': self.sla_misses,
+            'dispatched': self.dispatched,
+            'recent_rounds': [asdict(r) for r in list(self.rounds)[-10:]]
+        }
@@ -0,0 +1,130 @@
+from enum import Enum
+from typing import AbstractSet, Dict, List, Optional, Sequence, Tuple
+
+import h3
+import numpy as np
+
+ENTITY_DTYPE = np.dtype([
+    ('lat', np.float64),
+    ('lng', np.float64),
+    ('status', np.int8),  # Index of the status in the store's status enum, -1 for empty slots
+    ('cell', np.uint64),  # H3 cell at the demand grid resolution
+    ('version', np.uint32)  # Bumped on every change of the row
+])
+
+
+class EntityStore:
+    """Columnar taxi or order state: one structured NumPy row per entity with an id -> row index
+
+    Removed rows go on a free-list and are reused by later inserts, so the arrays stay dense
+    and only grow (by doubling) when every slot is taken. Status filters are a single
+    vectorized comparison returning row indexes, without touching per-entity objects.
+    Ids are also kept in one insertion-ordered dict per status, updated on every status
+    change, so counts are O(1) and each status reads as a FIFO of when entities entered it,
+    and in a set per H3 cell, so the entities inside a viewport are found without a scan.
+    """
+
+    def __init__(self, statuses: Sequence[Enum], capacity: int = 1024):
+        self.codes: Dict[Enum, int] = {status: code for code, status in enumerate(statuses)}
+        self.rows = np.zeros(capacity, dtype=ENTITY_DTYPE)
+        self.rows['status'] = -1
+        self._ids = np.empty(capacity, dtype=object)  # Row -> entity id
+        self.index: Dict[str, int] = {}  # Entity id -> row
+        self._free: List[int] = list(range(capacity - 1, -1, -1))  # Stack of empty rows, lowest on top
+        self._by_status: List[Dict[str, None]] = [{} for _ in self.codes]  # Code -> ids, oldest first
+        self._by_cell: Dict[int, set] = {}  # H3 cell -> ids
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _grow(self):
+        capacity = len(self.rows)
+        rows = np.zeros(capacity * 2, dtype=ENTITY_DTYPE)
+        rows['status'] = -1
+        rows[:capacity] = self.rows
+        ids = np.empty(capacity * 2, dtype=object)
+        ids[:capacity] = self._ids
+        self.rows, self._ids = rows, ids
+        self._free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def upsert(self, entity_id: str, lat: float, lng: float, status: Enum, cell: str) -> int:
+        """Insert or update an entity; returns its row"""
+        code = self.codes[status]
+        cell_int = h3.str_to_int(cell)
+        row = self.index.get(entity_id)
+        if row is None:
+            if not self._free:
+                self._grow()
+            row = self._free.pop()
+            self.index[entity_id] = row
+            self._ids[row] = entity_id
+            version = 0
+            self._by_status[code][entity_id] = None
+            self._by_cell.setdefault(cell_int, set()).add(entity_id)
+        else:
+            version = int(self.rows['version'][row]) + 1
+            previous = int(self.rows['status'][row])
+            if previous != code:
+                del self._by_status[previous][entity_id]
+                self._by_status[code][entity_id] = None
+            previous_cell = int(self.rows['cell'][row])
+            if previous_cell != cell_int:
+                self._discard_cell(previous_cell, entity_id)
+                self._by_cell.setdefault(cell_int, set()).add(entity_id)
+        self.rows[row] = (lat, lng, code, cell_int, version)
+        return row
+
+    def remove(self, entity_id: str):
+        row = self.index.pop(entity_id, None)
+        if row is None:
+            return
+        del self._by_status[int(self.rows['status'][row])][entity_id]
+        self._discard_cell(int(self.rows['cell'][row]), entity_id)
+        self.rows['status'][row] = -1
+        self._ids[row] = None
+        self._free.append(row)
+
+    def _discard_cell(self, cell: int, entity_id: str):
+        ids = self._by_cell[cell]
+        ids.discard(entity_id)
+        if not ids:
+            del self._by_cell[cell]
+
+    def ids_in_cells(self, cells: AbstractSet[int]) -> List[str]:
+        """Ids of the entities in any of the (integer) H3 cells"""
+        by_cell = self._by_cell
+        if len(cells) > len(by_cell):
+            return [entity_id for cell, ids in by_cell.items() if cell in cells for entity_id in ids]
+        return [entity_id for cell in cells if cell in by_cell for entity_id in by_cell[cell]]
+
+    def cell_of(self, entity_id: str) -> int:
+        return int(self.rows['cell'][self.index[entity_id]])
+
+    def rows_with_status(self, status: Enum) -> np.ndarray:
+        return np.flatnonzero(self.rows['status'] == self.codes[status])
+
+    def count(self, status: Enum) -> int:
+        return len(self._by_status[self.codes[status]])
+
+    def ids_with_status(self, status: Enum) -> List[str]:
+        """Ids in the order they entered the status"""
+        return list(self._by_status[self.codes[status]])
+
+    def oldest(self, status: Enum) -> Optional[str]:
+        """Id that has been in the status the longest, None if there is none"""
+        return next(iter(self._by_status[self.codes[status]]), None)
+
+    def ids_of(self, rows: np.ndarray) -> List[str]:
+        return self._ids[rows].tolist()
+
+    def coordinates(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.rows['lat'][rows], self.rows['lng'][rows]
+
+    def cells(self, rows: np.ndarray) -> np.ndarray:
+        return self.rows['cell'][rows]
+
+    def versions(self, rows: np.ndarray) -> np.ndarray:
+        return self.rows['version'][rows]
+
+    def version(self, entity_id: str) -> int:
+        return int(self.rows['version'][self.index[entity_id]])
@@ -0,0 +1,137 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (seq, event type, payload)
+Event = Tuple[int, str, dict]
+
+
+class EventLog:
+    """Append-only SQLite log of dispatch state transitions plus the latest compact snapshot
+
+    append() only buffers; write() commits a batch in one transaction, so the synchronous
+    mode decides when the disk is fsynced (FULL: every batch, NORMAL: WAL checkpoints only).
+    Writing a snapshot deletes the events it covers and older snapshots in the same
+    transaction, so recovery replays at most the events since the last snapshot.
+    """
+
+    def __init__(self, db_path: str, synchronous: str = "FULL"):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={synchronous}")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS events (
+                   seq INTEGER PRIMARY KEY,
+                   type TEXT NOT NULL,
+                   data TEXT NOT NULL,
+                   created_at REAL NOT NULL
+               )"""
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS snapshots (
+                   seq INTEGER PRIMARY KEY,
+                   state TEXT NOT NULL,
+                   created_at REAL NOT NULL
+               )"""
+        )
+        self._db.commit()
+        self._lock = threading.Lock()  # write() runs in a worker thread, close() on the event loop
+        self._buffer: List[Tuple[int, str, dict, float]] = []
+
+        row = self._db.execute("SELECT MAX(seq) FROM snapshots").fetchone()
+        self.snapshot_seq: int = row[0] if row[0] is not None else -1  # -1: no snapshot yet
+        row = self._db.execute("SELECT MAX(seq) FROM events").fetchone()
+        self.seq = max(self.snapshot_seq, row[0] if row[0] is not None else 0)  # Last appended event
+
+        self.events_written = 0
+        self.batches_written = 0
+        self.snapshots_written = 0
+        self.write_seconds = 0.0
+        self.recovered_events = 0
+        self.recovery_seconds = 0.0
+        logger.info(f"Event log opened at {db_path}: snapshot at {self.snapshot_seq}, last event {self.seq}")
+
+    def append(self, event_type: str, data: dict) -> int:
+        """Buffer an event until the next write(); data must not be mutated afterwards"""
+        self.seq += 1
+        self._buffer.append((self.seq, event_type, data, time.time()))
+        return self.seq
+
+    def take(self) -> List[Tuple[int, str, dict, float]]:
+        """Hand over the buffered events for writing"""
+        batch, self._buffer = self._buffer, []
+        return batch
+
+    def requeue(self, batch: List[Tuple[int, str, dict, float]]):
+        """Put a batch whose write failed back in front of the buffer; call from the thread that appends"""
+        self._buffer[:0] = batch
+
+    def write(self, batch: List[Tuple[int, str, dict, float]], snapshot: Optional[Tuple[int, dict]] = None) -> bool:
+        """Commit a batch and optionally a snapshot of the state after event snapshot[0]; False if it failed"""
+        start = time.perf_counter()
+        with self._lock:
+            try:
+                self._db.executemany(
+                    "INSERT INTO events (seq, type, data, created_at) VALUES (?, ?, ?, ?)",
+                    [(seq, event_type, json.dumps(data, separators=(',', ':')), created_at)
+                     for seq, event_type, data, created_at in batch]
+                )
+                if snapshot is not None:
+                    seq, state = snapshot
+                    self._db.execute("INSERT OR REPLACE INTO snapshots (seq, state, created_at) VALUES (?, ?, ?)",
+                                     (seq, json.dumps(state, separators=(',', ':')), time.time()))
+                    self._db.execute("DELETE FROM snapshots WHERE seq < ?", (seq,))
+                    self._db.execute("DELETE FROM events WHERE seq <= ?", (seq,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                self._db.rollback()
+                logger.error(f"Event log write of {len(batch)} events failed: {e}")
+                return False
+        if snapshot is not None:
+            self.snapshot_seq = snapshot[0]
+            self.snapshots_written += 1
+        self.events_written += len(batch)
+        self.batches_written += 1
+        self.write_seconds += time.perf_counter() - start
+        return True
+
+    def load(self) -> Tuple[Optional[dict], List[Event]]:
+        """Latest snapshot (None if there is none) and the events logged after it, in order"""
+        row = self._db.execute("SELECT seq, state FROM snapshots ORDER BY seq DESC LIMIT 1").fetchone()
+        snapshot_seq, state = (row[0], json.loads(row[1])) if row else (-1, None)
+        events = [(seq, event_type, json.loads(data)) for seq, event_type, data in self._db.execute(
+            "SELECT seq, type, data FROM events WHERE seq > ? ORDER BY seq", (snapshot_seq,)
+        )]
+        return state, events
+
+    def events_since_snapshot(self) -> int:
+        return self.seq - max(self.snapshot_seq, 0)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'seq': self.seq,
+            'snapshot_seq': self.snapshot_seq,
+            'buffered': len(self._buffer),
+            'events_written': self.events_written,
+            'batches_written': self.batches_written,
+            'snapshots_written': self.snapshots_written,
+            'avg_write_ms': self.write_seconds * 1000 / self.batches_written if self.batches_written else 0.0,
+            'recovered_events': self.recovered_events,
+            'recovery_ms': self.recovery_seconds * 1000
+        }
+
+    def close(self):
+        """Write what is still buffered and close the database"""
+        if self._db is None:
+            return
+        batch = self.take()
+        if batch:
+            self.write(batch)
+        with self._lock:
+            self._db.close()
+            self._db = None
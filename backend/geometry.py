@@ -0,0 +1,83 @@
+import math
+from typing import List, Sequence
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def simplify_path(points: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Douglas-Peucker simplification of an (N, 2) [lat, lng] array with a tolerance in meters"""
+    points = np.asarray(points, dtype=np.float64)
+    if tolerance_m <= 0 or len(points) < 3:
+        return points
+
+    # Local equirectangular projection is accurate to well below a meter at city scale
+    lat0 = math.radians(float(points[:, 0].mean()))
+    scale = math.pi / 180 * EARTH_RADIUS_M
+    xy = np.column_stack((points[:, 1] * math.cos(lat0), points[:, 0])) * scale
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last <= first + 1:
+            continue
+        segment = xy[last] - xy[first]
+        offsets = xy[first + 1:last] - xy[first]
+        length2 = float(segment @ segment)
+        if length2 == 0.0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            t = np.clip(offsets @ segment / length2, 0.0, 1.0)
+            residual = offsets - t[:, None] * segment
+            distances = np.hypot(residual[:, 0], residual[:, 1])
+        k = int(np.argmax(distances))
+        if distances[k] > tolerance_m:
+            split = first + 1 + k
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def encode_polyline(points: Sequence[Sequence[float]], precision: int = 5) -> str:
+    """Encode [lat, lng] points with Google's encoded polyline algorithm"""
+    if len(points) == 0:
+        return ""
+    ints = np.round(np.asarray(points, dtype=np.float64) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel().tolist()
+
+    chars = []
+    for value in deltas:
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[List[float]]:
+    """Decode a Google encoded polyline back into [lat, lng] points"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            result = shift = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append([lat / factor, lng / factor])
+    return points
@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import h3
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HEX_GRID_VERSION = 1  # Bump when the file layout or the fill rule changes
+
+# (lat_min, lng_min, lat_max, lng_max)
+Area = Tuple[float, float, float, float]
+
+
+class HexGrid:
+    """H3 cells covering a service area, with centers and boundaries in flat NumPy arrays
+
+    Boundary vertices of cell i are vertices[offsets[i]:offsets[i + 1]], so geometry costs
+    three arrays instead of nested Python lists per cell.
+    """
+
+    def __init__(self, resolution: int, cells: np.ndarray, centers: np.ndarray,
+                 vertices: np.ndarray, offsets: np.ndarray):
+        self.resolution = resolution
+        self.cells = cells  # uint64 H3 indexes
+        self.centers = centers  # (n, 2) [lat, lng]
+        self.vertices = vertices  # (total vertices, 2) [lat, lng]
+        self.offsets = offsets  # (n + 1,)
+        self.ids: List[str] = [h3.int_to_str(int(c)) for c in cells]
+        self.index: Dict[str, int] = {cell: i for i, cell in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def center(self, i: int) -> np.ndarray:
+        return self.centers[i]
+
+    def boundary(self, i: int) -> np.ndarray:
+        return self.vertices[self.offsets[i]:self.offsets[i + 1]]
+
+    @classmethod
+    def from_area(cls, area: Area, resolution: int) -> 'HexGrid':
+        """Every cell overlapping the area's rectangle, so the area is covered without holes"""
+        lat_min, lng_min, lat_max, lng_max = area
+        polygon = h3.LatLngPoly([(lat_min, lng_min), (lat_min, lng_max), (lat_max, lng_max), (lat_max, lng_min)])
+        ids = sorted(h3.polygon_to_cells_experimental(polygon, resolution, contain='overlap'))
+
+        centers = np.array([h3.cell_to_latlng(cell) for cell in ids], dtype=np.float64).reshape(-1, 2)
+        boundaries = [h3.cell_to_boundary(cell) for cell in ids]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in boundaries])
+        vertices = np.array([v for b in boundaries for v in b], dtype=np.float64).reshape(-1, 2)
+        cells = np.array([h3.str_to_int(cell) for cell in ids], dtype=np.uint64)
+        return cls(resolution, cells, centers, vertices, offsets)
+
+    @classmethod
+    def load(cls, path: str) -> 'HexGrid':
+        data = np.load(path)
+        if int(data['version']) != HEX_GRID_VERSION:
+            raise ValueError(f"hex grid file version {int(data['version'])} != {HEX_GRID_VERSION}")
+        return cls(int(data['resolution']), data['cells'], data['centers'], data['vertices'], data['offsets'])
+
+    def save(self, path: str):
+        tmp_path = path + '.tmp.npz'  # np.savez appends .npz to names without it
+        np.savez(tmp_path, version=HEX_GRID_VERSION, resolution=self.resolution, cells=self.cells,
+                 centers=self.centers, vertices=self.vertices, offsets=self.offsets)
+        os.replace(tmp_path, path)
+
+
+def hex_grid_path(cache_dir: str, area: Area, resolution: int) -> str:
+    key = hashlib.sha1(repr(tuple(round(v, 6) for v in area)).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"hexgrid_v{HEX_GRID_VERSION}_r{resolution}_{key}.grid.npz")
+
+
+def load_hex_grid(cache_dir: str, area: Area, resolution: int) -> HexGrid:
+    """Load the grid for area and resolution from cache_dir, building and caching it when missing"""
+    path = hex_grid_path(cache_dir, area, resolution)
+    if os.path.exists(path):
+        try:
+            grid = HexGrid.load(path)
+            logger.info(f"Loaded {len(grid)} H3 cells at resolution {resolution} from {path}")
+            return grid
+        except Exception as e:
+            logger.warning(f"Could not load hex grid {path}: {e}, rebuilding")
+
+    grid = HexGrid.from_area(area, resolution)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        grid.save(path)
+    except OSError as e:
+        logger.warning(f"Could not cache hex grid to {path}: {e}")
+    logger.info(f"Built {len(grid)} H3 cells at resolution {resolution}, cached to {path}")
+    return grid
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class KeyState:
+    key: str
+    tokens: float
+    last_refill: float
+    blocked_until: float = 0.0
+    consecutive_429: int = 0
+    total_requests: int = 0
+    total_429: int = 0
+    quota_remaining: Optional[int] = None
+    recent: Deque[float] = field(default_factory=deque)  # Request timestamps in the last minute
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class APIKeyScheduler:
+    """Token-bucket scheduler spreading requests over a pool of rate-limited API keys
+
+    Each key refills at requests_per_minute. acquire() hands out the key with the most
+    headroom and queues callers (FIFO) until a token is free instead of sleeping blindly.
+    report() feeds back 429s, Retry-After and X-Ratelimit-* headers so exhausted keys are
+    parked until they recover.
+    """
+
+    def __init__(self, keys: List[str], requests_per_minute: float = 40, burst: Optional[float] = None,
+                 name: str = "api"):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.refill_rate = requests_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, requests_per_minute / 4)
+        now = time.monotonic()
+        self._states: Dict[str, KeyState] = {
+            key: KeyState(key=key, tokens=self.capacity, last_refill=now) for key in keys
+        }
+        self._lock = asyncio.Lock()
+        self.queued_requests = 0
+        self.total_wait_seconds = 0.0
+
+    def _refill(self, state: KeyState, now: float):
+        state.tokens = min(self.capacity, state.tokens + (now - state.last_refill) * self.refill_rate)
+        state.last_refill = now
+        while state.recent and now - state.recent[0] > 60:
+            state.recent.popleft()
+
+    async def acquire(self) -> str:
+        """Wait for and reserve one request on the key with the most headroom"""
+        start = time.monotonic()
+        queued = False
+        async with self._lock:  # asyncio.Lock is FIFO, so waiting callers form a queue
+            while True:
+                now = time.monotonic()
+                best: Optional[KeyState] = None
+                wait = math.inf
+                for state in self._states.values():
+                    self._refill(state, now)
+                    ready_in = max(state.blocked_until - now,
+                                   (1 - state.tokens) / self.refill_rate if state.tokens < 1 else 0.0)
+                    if ready_in > 0:
+                        wait = min(wait, ready_in)
+                    elif best is None or (state.tokens, -len(state.recent)) > (best.tokens, -len(best.recent)):
+                        best = state
+
+                if best is not None:
+                    best.tokens -= 1
+                    best.total_requests += 1
+                    best.recent.append(now)
+                    self.total_wait_seconds += now - start
+                    return best.key
+
+                if not queued:
+                    queued = True
+                    self.queued_requests += 1
+                    logger.info(f"All {self.name} keys at their rate limit, queueing request for {wait:.1f}s")
+                await asyncio.sleep(wait)
+
+    def report(self, key: str, status_code: int, headers: Mapping[str, str]):
+        """Record the outcome of a request made with key"""
+        state = self._states.get(key)
+        if state is None:
+            return
+        now = time.monotonic()
+
+        remaining = _parse_float(headers.get("x-ratelimit-remaining"))
+        reset = _parse_float(headers.get("x-ratelimit-reset"))
+        if remaining is not None:
+            state.quota_remaining = int(remaining)
+            if remaining <= 0 and reset is not None:
+                # Reset is an epoch timestamp on ORS; tolerate a relative delay as well
+                delay = reset - time.time() if reset > 1e9 else reset
+                state.blocked_until = max(state.blocked_until, now + max(delay, 0.0))
+
+        if status_code == 429:
+            state.consecutive_429 += 1
+            state.total_429 += 1
+            state.tokens = 0.0
+            retry_after = _parse_float(headers.get("retry-after"))
+            if retry_after is None:
+                retry_after = min(60.0, 2.0 * 2 ** (state.consecutive_429 - 1))
+            state.blocked_until = max(state.blocked_until, now + retry_after)
+            logger.warning(f"{self.name} key ...{key[-6:]} rate limited, parked for {retry_after:.0f}s")
+        else:
+            state.consecutive_429 = 0
+
+    def utilization(self) -> List[Dict[str, float]]:
+        """Per-key usage over the last minute relative to the configured rate"""
+        now = time.monotonic()
+        report = []
+        for state in self._states.values():
+            self._refill(state, now)
+            report.append({
+                'key': f"...{state.key[-6:]}",
+                'requests_last_minute': len(state.recent),
+                'utilization': len(state.recent) / self.requests_per_minute,
+                'tokens': round(state.tokens, 2),
+                'blocked_for': round(max(0.0, state.blocked_until - now), 1),
+                'quota_remaining': state.quota_remaining,
+                'total_requests': state.total_requests,
+                'total_rate_limited': state.total_429
+            })
+        return report
+
+    def stats(self) -> Dict[str, object]:
+        keys = self.utilization()
+        return {
+            'keys': keys,
+            'pool_utilization': sum(k['requests_last_minute'] for k in keys) /
+                                (self.requests_per_minute * max(1, len(keys))),
+            'queued_requests': self.queued_requests,
+            'total_wait_seconds': round(self.total_wait_seconds, 2)
+        }
@@ -1,32 +1,72 @@
 import time
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
 import json
 import math
 import random
-from typing import Dict, List, Set, Optional
-import h3
-from dataclasses import dataclass, asdict
-from enum import Enum
+from typing import Callable, Dict, List, Set, Optional, Tuple
+from dataclasses import asdict
 from scipy.optimize import linear_sum_assignment
+import h3
 import numpy as np
-import requests
 import logging
 
+from models import (
+    TaxiStatus, OrderStatus, Location, Route, Taxi, Order, Assignment, DemandHexagon
+)
+from broadcast_coordinator import BroadcastCoordinator
+from client_channel import ClientChannel
+from cost_kernels import (
+    demand_cost_matrix, demand_costs, demand_vectors, haversine_matrix_km, hybrid_cost_matrix,
+    hybrid_demand_weights, smoothed_demand
+)
+from demand_index import BoundingBox, DemandIndex, DemandPyramid, parse_bbox
+from demand_stats import RollingDemandStats
+from entity_store import EntityStore
+from event_log import EventLog
+from dispatch_scheduler import DispatchScheduler
+from hex_grid import load_hex_grid
+from routing import ORSRoutingClient
+from sharded_dispatch import ShardedDispatcher
+from sparse_matching import nearest_candidates, solve_sparse_assignment
+from state_encoder import StateEncoder, negotiate_format
+from route_cache import RouteCache
+from road_graph import LocalRoutingEngine, load_road_graph
+from travel_time import TravelTimeMatrixProvider
+from viewport import Viewport
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    # Recover before any task runs: the processor needs the log, and new events must follow replayed ones
+    dispatch_system.route_cache.open()
+    if USE_EVENT_LOG:
+        dispatch_system.open_event_log(EVENT_LOG_PATH, EVENT_LOG_SYNC)
     order_task = asyncio.create_task(order_simulator())
     assignment_task = asyncio.create_task(assignment_processor())
     demand_task = asyncio.create_task(demand_processor())
+    event_log_task = asyncio.create_task(event_log_processor())
+    route_cache_task = asyncio.create_task(route_cache_writer())
+    route_workers = dispatch_system.start_route_workers()
+    broadcast_task = asyncio.create_task(dispatch_system.broadcasts.run())
     yield
     order_task.cancel()
+    broadcast_task.cancel()
     assignment_task.cancel()
     demand_task.cancel()
+    event_log_task.cancel()
+    route_cache_task.cancel()
+    for worker in route_workers:
+        worker.cancel()
+    await dispatch_system.routing_client.aclose()
+    dispatch_system.sharded_dispatcher.close()
+    dispatch_system.route_cache.close()
+    if dispatch_system.event_log is not None:
+        dispatch_system.event_log.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -54,69 +94,125 @@ MAX_TAXIS = 10
 MAX_PENDING_ORDERS = 50
 MAX_COMPLETED_ORDERS = 2
 H3_RESOLUTION = 7  # ~1.2km hex diameter for city-wide coverage
+HEX_GRID_RADIUS = 0.10  # Degrees around the center covered by the demand grid (~10km)
+HEX_GRID_CACHE_DIR = "data"  # Built grids are cached here as versioned .grid.npz files
+DEMAND_PYRAMID_RESOLUTIONS = (5, 6, 7, 8, 9)  # Levels of the zoomable demand view (~8.5km to ~174m cells)
+DEMAND_STATS_WINDOWS = (60, 300, 900)  # Rolling per-hexagon arrival/fulfilment/wait windows (seconds)
+USE_SMOOTHED_DEMAND = True  # Demand costs use recent arrivals per hexagon instead of the instantaneous pending count
+DEMAND_SMOOTHING_WINDOW = 300  # Which DEMAND_STATS_WINDOWS entry feeds the demand costs
+DEMAND_RATE_TOLERANCE = 0.01  # Orders/min a hexagon's sent rates may drift (decay) before it is resent
 
 USE_ROUTES_PLANNER = True
-
-class TaxiStatus(Enum):
-    FREE = "free"
-    BUSY = "busy"
-
-class OrderStatus(Enum):
-    PENDING = "pending"
-    ASSIGNED = "assigned"
-    COMPLETED = "completed"
-
-@dataclass
-class Location:
-    lat: float
-    lng: float
-
-@dataclass
-class Route:
-    path: List[List[float]]
-    duration: float
-
-@dataclass
-class Taxi:
-    id: str
-    location: Location
-    status: TaxiStatus
-
-@dataclass
-class Order:
-    id: str
-    pickup: Location
-    dropoff: Location
-    status: OrderStatus
-
-@dataclass
-class Assignment:
-    taxi_id: str
-    order_id: str
-    to_pickup_route: Route
-    to_dropoff_route: Route
-    algorithm_used: str = "hybrid"  # Track which algorithm created this assignment
-
-@dataclass
-class DemandHexagon:
-    hex_id: str
-    center: List[float]  # [lat, lng]
-    boundary: List[List[float]]  # [[lat, lng], ...]
-    orders_count: int
-    taxis_count: int
-    demand_ratio: float
-    color: str
-    demand_level: str
+ROUTING_BACKEND = "ors"  # "ors" for OpenRouteService, "local" for the offline road graph below
+ROAD_GRAPH_PATH = "data/astana.osm"  # OSM extract (.osm/.osm.gz/.osm.bz2) or compiled .graph.npz
+ROUTE_CONCURRENCY = 8  # Max in-flight routing requests across one assignment batch
+ROUTE_POOL_SIZE = 16  # Shared keep-alive HTTP connections to the routing API
+ROUTE_SIMPLIFY_TOLERANCE_M = 5.0  # Douglas-Peucker tolerance applied to route geometry (0 disables)
+ROUTE_WORKERS = 8  # Background tasks materializing routes for committed assignments
+ORS_REQUESTS_PER_MINUTE = 40  # Per-key ORS rate limit, tracked separately for directions and matrix
+ROUTE_CACHE_PATH = "route_cache.sqlite3"  # On-disk route cache tier, survives restarts
+ROUTE_CACHE_RESOLUTION = 9  # ~174m H3 cells used to quantize route endpoints
+ROUTE_CACHE_SIZE = 5000  # In-memory LRU tier capacity
+ROUTE_CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached route is refetched
+ROUTE_CACHE_FLUSH_INTERVAL = 1.0  # Seconds between batched commits of new routes to the disk tier
+USE_TRAVEL_TIME_MATRIX = True  # Rank taxi-order pairs by routed ETA instead of great-circle distance
+TRAVEL_TIME_MAX_ELEMENTS = 3500  # Max origin x destination cells requested per matrix call
+TRAVEL_TIME_BUDGET = 3.0  # Seconds to wait for the matrix before falling back to haversine
+TRAVEL_TIME_TTL = 15 * 60  # Seconds a cached cell-pair ETA stays valid
+
+# Sparse dispatch for large fleets
+SPARSE_DISPATCH_MIN_PAIRS = 250_000  # Above this many taxi x order pairs, match over nearest candidates only
+SPARSE_CANDIDATES = 8  # Nearest free taxis considered per order in sparse mode
+SPARSE_MAX_PICKUP_KM = 5.0  # Orders with no free taxi this close stay pending until a later round
+USE_SHARDED_DISPATCH = True  # Split very large rounds into H3 regions solved in parallel worker processes
+SHARDED_DISPATCH_MIN_PAIRS = 50_000_000  # Taxi x order pairs above which rounds are sharded (great-circle costs)
+SHARD_PARENT_RESOLUTION = 6  # Region size: H3 parent of the demand grid cells (~36 km^2)
+SHARD_BORDER_KM = 0.5  # Pairs with a taxi or order this close to another region are reconciled city-wide
+SHARD_WORKERS = None  # Worker processes, defaults to the CPU count
+DISPATCH_SLA_SECONDS = 3.0  # Target max wait from order creation to assignment
+DISPATCH_BACKLOG_THRESHOLD = 10  # Pending orders that trigger a round immediately
+DISPATCH_MIN_WINDOW = 0.2  # Batching window (seconds) under backlog
+DISPATCH_MAX_WINDOW = 2.0  # Batching window (seconds) under light load, for better matches
+USE_EVENT_LOG = True  # Log every state transition and rebuild the dispatch state from the log on boot
+EVENT_LOG_PATH = "dispatch_log.sqlite3"  # Event log + latest snapshot
+EVENT_LOG_SYNC = "FULL"  # SQLite synchronous mode: FULL fsyncs every batch, NORMAL only at WAL checkpoints
+EVENT_LOG_FLUSH_INTERVAL = 0.5  # Seconds between batched log writes, i.e. the most a crash can lose
+EVENT_LOG_SNAPSHOT_EVENTS = 1000  # Events between snapshots, bounding the replay on boot
+CLIENT_QUEUE_FRAMES = 64  # Outbound frames queued per client before it is disconnected as too slow
+CLIENT_SEND_TIMEOUT = 5.0  # Seconds one frame send may take before the client is disconnected as stalled
+BROADCAST_INTERVAL = 0.1  # Min seconds between state_update broadcasts; changes in between share one frame
+VIEWPORT_MAX_CELLS = 20000  # Grid cells a subscribed viewport may cover; larger viewports get the full stream
 
 class TaxiDispatchSystem:
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None,
+                 headless: bool = False, route_cache_path: Optional[str] = ROUTE_CACHE_PATH):
+        self.clock = clock  # Dispatch waits and demand rates; simulation.py passes a virtual clock
+        self.rng = rng if rng is not None else random.Random()  # Taxi placement and order generation
+        self.headless = headless  # Dispatch without connected clients (simulation runs)
         self.taxis: Dict[str, Taxi] = {}
         self.orders: Dict[str, Order] = {}
+        # Columnar mirrors of taxis/orders for status filtering and coordinates without object scans
+        self.taxi_store = EntityStore(list(TaxiStatus), capacity=max(MAX_TAXIS, 16))
+        self.order_store = EntityStore(list(OrderStatus), capacity=max(MAX_PENDING_ORDERS * 2, 16))
         self.assignments: Dict[str, Assignment] = {}
         self.connected_clients: Set[WebSocket] = set()
+        self.client_channels: Dict[WebSocket, ClientChannel] = {}  # Per-client outbound queues
+        self.slow_clients_dropped = 0
+        self.client_viewports: Dict[WebSocket, Viewport] = {}  # Clients only sent what is inside their viewport
+        self.state_encoder = StateEncoder()
+        self.broadcasts = BroadcastCoordinator(self.broadcast_state, BROADCAST_INTERVAL)
         self.order_counter = 0
         self.demand_hexagons: Dict[str, DemandHexagon] = {}
         self.all_hexagons: Set[str] = set()
+        self.demand_seq = 0  # Sequence number of the last demand_update broadcast
+        self._demand_changes: Set[str] = set()  # Hexagons changed since the last demand_update
+        # Zoomable demand view subscriptions: client -> (resolution, bbox, pyramid version last sent)
+        self.demand_views: Dict[WebSocket, Tuple[int, Optional[BoundingBox], int]] = {}
+        self.route_queue: asyncio.Queue = asyncio.Queue()  # Order ids awaiting real routes
+        self.routing_client = ORSRoutingClient(
+            ORS_API_KEYS,
+            max_concurrency=ROUTE_CONCURRENCY,
+            pool_size=ROUTE_POOL_SIZE,
+            requests_per_minute=ORS_REQUESTS_PER_MINUTE,
+            simplify_tolerance_m=ROUTE_SIMPLIFY_TOLERANCE_M
+        )
+        self.route_cache = RouteCache(
+            route_cache_path,  # Opened by the app lifespan; None keeps the cache in memory only
+            resolution=ROUTE_CACHE_RESOLUTION,
+            max_entries=ROUTE_CACHE_SIZE,
+            ttl_seconds=ROUTE_CACHE_TTL
+        )
+        self.local_router: Optional[LocalRoutingEngine] = None
+        if ROUTING_BACKEND == "local":
+            try:
+                self.local_router = LocalRoutingEngine(load_road_graph(ROAD_GRAPH_PATH),
+                                                       simplify_tolerance_m=ROUTE_SIMPLIFY_TOLERANCE_M)
+            except Exception as e:
+                logger.error(f"Could not load road graph from {ROAD_GRAPH_PATH}: {e}, using ORS routing")
+        self.travel_times = TravelTimeMatrixProvider(
+            self.local_router or (self.routing_client if USE_ROUTES_PLANNER else None),
+            resolution=ROUTE_CACHE_RESOLUTION,
+            ttl_seconds=TRAVEL_TIME_TTL,
+            max_elements=TRAVEL_TIME_MAX_ELEMENTS,
+            time_budget=TRAVEL_TIME_BUDGET
+        )
+        self.sharded_dispatcher = ShardedDispatcher(
+            SHARD_PARENT_RESOLUTION,
+            workers=SHARD_WORKERS,
+            border_km=SHARD_BORDER_KM,
+            sparse_min_pairs=SPARSE_DISPATCH_MIN_PAIRS,
+            k=SPARSE_CANDIDATES,
+            max_radius_km=SPARSE_MAX_PICKUP_KM
+        )
+        self.scheduler = DispatchScheduler(
+            self.run_assignment_round,
+            self._free_taxi_count,
+            sla_seconds=DISPATCH_SLA_SECONDS,
+            backlog_threshold=DISPATCH_BACKLOG_THRESHOLD,
+            min_window=DISPATCH_MIN_WINDOW,
+            max_window=DISPATCH_MAX_WINDOW,
+            clock=clock
+        )
         
         # Algorithm configuration
         self.algorithm_config = {
@@ -126,53 +222,194 @@ class TaxiDispatchSystem:
         
         self._initialize_taxis()
         self._initialize_hexagon_grid()
+        self.demand_stats = RollingDemandStats(self.hex_grid.ids, DEMAND_STATS_WINDOWS, clock=self.clock)
+        # Rates of each grid hexagon as of its last demand_update, to resend the ones that decayed
+        self._sent_rates = {name: np.zeros_like(values) for name, values in self.demand_stats.snapshot().items()}
+        self.demand_pyramid = DemandPyramid(DEMAND_PYRAMID_RESOLUTIONS, self._refresh_hexagon)
+        self.demand_index = DemandIndex(self.demand_hexagons, H3_RESOLUTION, self._refresh_hexagon,
+                                        self.demand_pyramid)
+        for taxi in self.taxis.values():
+            self._taxi_changed(taxi)
+        self.demand_index.flush()
+        self.event_log: Optional[EventLog] = None
+
+    def _taxi_changed(self, taxi: Taxi):
+        """Propagate a taxi's new status or location to the demand index and the taxi store"""
+        self.demand_index.track_taxi(taxi)
+        self.taxi_store.upsert(taxi.id, taxi.location.lat, taxi.location.lng, taxi.status,
+                               self.demand_index.taxi_cell(taxi))
+
+    def _order_changed(self, order: Order):
+        """Propagate a new order or status change to the demand index and the order store"""
+        self.demand_index.track_order(order)
+        self.order_store.upsert(order.id, order.pickup.lat, order.pickup.lng, order.status,
+                                self.demand_index.pickup_cell(order))
+
+    def _order_removed(self, order_id: str):
+        self.demand_index.forget_order(order_id)
+        self.order_store.remove(order_id)
+
+    def _dispatch_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Store rows of the free taxis and pending orders, one vectorized status comparison each"""
+        return (self.taxi_store.rows_with_status(TaxiStatus.FREE),
+                self.order_store.rows_with_status(OrderStatus.PENDING))
+
+    def _record(self, event_type: str, data: dict):
+        """Log a state transition and apply it; replay on boot applies the same events"""
+        if self.event_log is not None:
+            self.event_log.append(event_type, data)
+        return getattr(self, f"_apply_{event_type}")(data)
+
+    def _apply_order_created(self, data: dict) -> Order:
+        self.order_counter += 1
+        order = Order(id=f"order_{self.order_counter}", pickup=Location(**data['pickup']),
+                      dropoff=Location(**data['dropoff']), status=OrderStatus.PENDING)
+        self.orders[order.id] = order
+        self._order_changed(order)
+        return order
+
+    def _apply_order_assigned(self, data: dict) -> Assignment:
+        taxi, order = self.taxis[data['taxi_id']], self.orders[data['order_id']]
+        taxi.status = TaxiStatus.BUSY
+        order.status = OrderStatus.ASSIGNED
+        self._taxi_changed(taxi)
+        self._order_changed(order)
+        assignment = self._load_assignment(data)
+        self.assignments[order.id] = assignment
+        return assignment
+
+    def _apply_routes_ready(self, data: dict):
+        assignment = self.assignments.get(data['order_id'])
+        if assignment is not None:
+            assignment.to_pickup_route = Route(**data['to_pickup_route'])
+            assignment.to_dropoff_route = Route(**data['to_dropoff_route'])
+            assignment.routes_ready = True
+
+    def _apply_order_completed(self, data: dict):
+        assignment = self.assignments.pop(data['order_id'], None)
+        if assignment is None:
+            return
+        taxi = self.taxis.get(assignment.taxi_id)
+        if taxi is not None:
+            taxi.status = TaxiStatus.FREE
+            taxi.location = Location(**data['location'])
+            self._taxi_changed(taxi)
+        order = self.orders.get(data['order_id'])
+        if order is not None:
+            order.status = OrderStatus.COMPLETED
+            self._order_changed(order)
+
+    def _apply_order_evicted(self, data: dict):
+        del self.orders[data['order_id']]
+        self._order_removed(data['order_id'])
+
+    def _apply_config_changed(self, data: dict):
+        self.algorithm_config = dict(data)
+
+    def _load_assignment(self, data: dict) -> Assignment:
+        return Assignment(
+            taxi_id=data['taxi_id'],
+            order_id=data['order_id'],
+            to_pickup_route=Route(**data['to_pickup_route']),
+            to_dropoff_route=Route(**data['to_dropoff_route']),
+            algorithm_used=data['algorithm_used'],
+            routes_ready=data['routes_ready']
+        )
+
+    def snapshot_state(self) -> dict:
+        """Compact copy of the dispatch state, orders oldest first within each status"""
+        return {
+            'order_counter': self.order_counter,
+            'algorithm_config': dict(self.algorithm_config),
+            'taxis': [[taxi.id, taxi.location.lat, taxi.location.lng, taxi.status.value]
+                      for taxi in self.taxis.values()],
+            'orders': [[order.id, order.pickup.lat, order.pickup.lng, order.dropoff.lat, order.dropoff.lng,
+                        order.status.value]
+                       for status in OrderStatus
+                       for order in map(self.orders.get, self.order_store.ids_with_status(status))],
+            'assignments': [asdict(assignment) for assignment in self.assignments.values()]
+        }
+
+    def _restore(self, state: dict):
+        self.order_counter = state['order_counter']
+        self.algorithm_config = dict(state['algorithm_config'])
+        for taxi_id, lat, lng, status in state['taxis']:
+            taxi = self.taxis.setdefault(taxi_id, Taxi(id=taxi_id, location=Location(lat=lat, lng=lng),
+                                                       status=TaxiStatus(status)))
+            taxi.location = Location(lat=lat, lng=lng)
+            taxi.status = TaxiStatus(status)
+            self._taxi_changed(taxi)
+        for order_id, pickup_lat, pickup_lng, dropoff_lat, dropoff_lng, status in state['orders']:
+            order = Order(id=order_id, pickup=Location(lat=pickup_lat, lng=pickup_lng),
+                          dropoff=Location(lat=dropoff_lat, lng=dropoff_lng), status=OrderStatus(status))
+            self.orders[order_id] = order
+            self._order_changed(order)
+        for data in state['assignments']:
+            self.assignments[data['order_id']] = self._load_assignment(data)
+
+    def open_event_log(self, db_path: str, synchronous: str):
+        """Start logging transitions to db_path after rebuilding the state recorded there"""
+        self.event_log = EventLog(db_path, synchronous)
+        self._recover()
+        self.update_demand_hexagons()
+
+    def _recover(self):
+        """Rebuild the state from the latest snapshot and the events logged after it, then compact"""
+        start = time.perf_counter()
+        state, events = self.event_log.load()
+        if state is not None:
+            self._restore(state)
+        for _, event_type, data in events:
+            getattr(self, f"_apply_{event_type}")(data)
+        self.event_log.recovered_events = len(events)
+        self.event_log.recovery_seconds = time.perf_counter() - start
+
+        for order_id in self.order_store.ids_with_status(OrderStatus.PENDING):
+            self.scheduler.order_arrived(order_id)
+        for order_id, assignment in self.assignments.items():
+            if not assignment.routes_ready:
+                self.route_queue.put_nowait(order_id)
+        batch = self.event_log.take()
+        if not self.event_log.write(batch, (self.event_log.seq, self.snapshot_state())):
+            self.event_log.requeue(batch)
+        logger.info(f"Recovered {len(self.orders)} orders and {len(self.assignments)} assignments "
+                    f"from {'a snapshot and ' if state is not None else ''}{len(events)} events "
+                    f"in {self.event_log.recovery_seconds * 1000:.1f}ms")
+
+    async def flush_event_log(self):
+        """Write the buffered events off the event loop, with a snapshot every EVENT_LOG_SNAPSHOT_EVENTS"""
+        snapshot = None
+        if self.event_log.events_since_snapshot() >= EVENT_LOG_SNAPSHOT_EVENTS:
+            snapshot = (self.event_log.seq, self.snapshot_state())
+        batch = self.event_log.take()
+        if batch or snapshot is not None:
+            if not await asyncio.to_thread(self.event_log.write, batch, snapshot):
+                # Back on the loop, so no record() can interleave; retried ahead of newer events
+                self.event_log.requeue(batch)
 
     def _initialize_taxis(self):
         for i in range(MAX_TAXIS):
             taxi_id = f"taxi_{i+1}"
             location = Location(
-                lat=CENTER_LAT + random.uniform(-0.035, 0.035),
-                lng=CENTER_LNG + random.uniform(-0.035, 0.035)
+                lat=CENTER_LAT + self.rng.uniform(-0.035, 0.035),
+                lng=CENTER_LNG + self.rng.uniform(-0.035, 0.035)
             )
             self.taxis[taxi_id] = Taxi(id=taxi_id, location=location, status=TaxiStatus.FREE)
 
     def _initialize_hexagon_grid(self):
         """Create continuous H3 hexagon grid covering the operational area"""
-        # Define large area around Astana center  
-        area_radius = 0.10  # ~10km radius for extended city coverage
-        
-        # Create bounding box
-        lat_min = CENTER_LAT - area_radius
-        lat_max = CENTER_LAT + area_radius
-        lng_min = CENTER_LNG - area_radius  
-        lng_max = CENTER_LNG + area_radius
+        # Polygon fill of the service area, loaded from the on-disk cache after the first boot
+        area = (CENTER_LAT - HEX_GRID_RADIUS, CENTER_LNG - HEX_GRID_RADIUS,
+                CENTER_LAT + HEX_GRID_RADIUS, CENTER_LNG + HEX_GRID_RADIUS)
+        self.hex_grid = load_hex_grid(HEX_GRID_CACHE_DIR, area, H3_RESOLUTION)
+        self.all_hexagons = set(self.hex_grid.ids)
         
-        # Get all H3 hexagons covering this area
-        # Use a simpler approach - get hexagons from grid sampling
-        hexagons = set()
-        
-        # Sample grid points across the bounding box and get their hexagons
-        lat_steps = 20
-        lng_steps = 25
-        
-        for i in range(lat_steps):
-            for j in range(lng_steps):
-                lat = lat_min + (lat_max - lat_min) * i / (lat_steps - 1)
-                lng = lng_min + (lng_max - lng_min) * j / (lng_steps - 1)
-                hex_id = h3.latlng_to_cell(lat, lng, H3_RESOLUTION)
-                hexagons.add(hex_id)
-        self.all_hexagons = hexagons
-        
-        # Initialize all hexagons with zero demand
-        for hex_id in self.all_hexagons:
-            center = h3.cell_to_latlng(hex_id)
-            boundary = h3.cell_to_boundary(hex_id)
-            boundary_coords = [[lat, lng] for lat, lng in boundary]
-            
+        # Initialize all hexagons with zero demand; geometry stays a view into the grid arrays
+        for i, hex_id in enumerate(self.hex_grid.ids):
             self.demand_hexagons[hex_id] = DemandHexagon(
                 hex_id=hex_id,
-                center=[center[0], center[1]],
-                boundary=boundary_coords,
+                center=self.hex_grid.center(i),
+                boundary=self.hex_grid.boundary(i),
                 orders_count=0,
                 taxis_count=0,
                 demand_ratio=0.0,
@@ -193,51 +430,150 @@ class TaxiDispatchSystem:
         return R * c
 
     async def get_route(self, start: Location, end: Location) -> Route:
-        max_retries = 4
-        base_delay = 2
+        if self.local_router is not None:
+            route = await self.local_router.fetch_route(start, end)
+            if route is not None:
+                return route
+        elif USE_ROUTES_PLANNER:
+            cached = await self.route_cache.get(start, end)
+            if cached is not None:
+                return cached
+
+            route = await self.routing_client.fetch_route(start, end)
+            if route is not None:
+                self.route_cache.put(start, end, route)
+                return route
 
-        used_api_key = random.choice(ORS_API_KEYS)
-        
-        if USE_ROUTES_PLANNER:
-            for attempt in range(max_retries):
+        logger.error("All route construction attempts failed, using fallback")
+        return self._create_fallback_route(start, end)
+
+    async def _pickup_cost_matrix(self, taxi_rows: np.ndarray, order_rows: np.ndarray) -> np.ndarray:
+        """Taxi-to-pickup costs: batched routed ETAs (seconds), or great-circle km when disabled"""
+        coordinates = (*self.taxi_store.coordinates(taxi_rows), *self.order_store.coordinates(order_rows))
+        if USE_TRAVEL_TIME_MATRIX:
+            return await self.travel_times.matrix(*coordinates)
+        return haversine_matrix_km(*coordinates)
+
+    def _order_demand_vectors(self, order_rows: np.ndarray):
+        """Demand arrays of each order's pickup hexagon, looked up once per distinct pickup cell"""
+        cells, inverse = np.unique(self.order_store.cells(order_rows), return_inverse=True)
+        cell_ids = [h3.int_to_str(int(cell)) for cell in cells]
+        ratio, orders, taxis, known = demand_vectors(cell_ids, self.demand_hexagons)
+        if USE_SMOOTHED_DEMAND:
+            # Recent arrivals keep the demand signal from jumping as single orders come and go
+            window = DEMAND_STATS_WINDOWS.index(DEMAND_SMOOTHING_WINDOW)
+            rows = self.demand_stats.rows(cell_ids)
+            arrivals = np.where(rows >= 0, self.demand_stats.arrivals()[rows, window], 0.0)
+            ratio, orders = smoothed_demand(arrivals, taxis)
+        return ratio[inverse], orders[inverse], taxis[inverse], known[inverse]
+
+    def _use_sharded_dispatch(self, taxi_rows: np.ndarray, order_rows: np.ndarray) -> bool:
+        return USE_SHARDED_DISPATCH and len(taxi_rows) * len(order_rows) > SHARDED_DISPATCH_MIN_PAIRS
+
+    async def _match_sharded(self, taxi_rows: np.ndarray, order_rows: np.ndarray, strategy: str,
+                             order_values: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Match region by region in the worker pool, keeping the event loop free for clients"""
+        return await self.sharded_dispatcher.match(*self.taxi_store.coordinates(taxi_rows),
+                                                   *self.order_store.coordinates(order_rows),
+                                                   order_values, strategy)
+
+    def _use_sparse_dispatch(self, taxi_rows: np.ndarray, order_rows: np.ndarray) -> bool:
+        return len(taxi_rows) * len(order_rows) > SPARSE_DISPATCH_MIN_PAIRS
+
+    def _sparse_candidates(self, taxi_rows: np.ndarray, order_rows: np.ndarray):
+        """(order_idx, taxi_idx, distance_km) edges to the SPARSE_CANDIDATES nearest free taxis"""
+        return nearest_candidates(*self.taxi_store.coordinates(taxi_rows), *self.order_store.coordinates(order_rows),
+                                  k=SPARSE_CANDIDATES, max_radius_km=SPARSE_MAX_PICKUP_KM)
+
+    def _match_sparse(self, taxi_rows: np.ndarray, order_rows: np.ndarray, order_idx: np.ndarray,
+                      taxi_idx: np.ndarray, costs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Solve the pruned assignment; orders without a candidate in range wait for the next round"""
+        matched_orders, matched_taxis = solve_sparse_assignment(order_idx, taxi_idx, costs,
+                                                                len(order_rows), len(taxi_rows))
+        unreachable = len(order_rows) - len(np.unique(order_idx))
+        logger.info(f"Sparse dispatch: {len(costs)} candidate edges, {len(matched_orders)} matched, "
+                    f"{unreachable} orders with no free taxi within {SPARSE_MAX_PICKUP_KM} km")
+        return matched_taxis, matched_orders
+
+    def _build_assignments(self, taxi_ids: List[str], order_ids: List[str], taxi_idx: np.ndarray,
+                           order_idx: np.ndarray, algorithm: str) -> List[Assignment]:
+        """Commit a batch immediately with cached or straight-line routes, queueing real routing
+
+        taxi_idx / order_idx are matched positions in taxi_ids / order_ids, the ids of the rows
+        the round was solved over; objects are looked up only for the matched pairs.
+        """
+        # Cost computation may have awaited; drop pairs whose taxi or order changed meanwhile
+        pairs = []
+        for t, o in zip(taxi_idx, order_idx):
+            taxi, order = self.taxis.get(taxi_ids[t]), self.orders.get(order_ids[o])
+            if (taxi is not None and order is not None and taxi.status == TaxiStatus.FREE
+                    and order.status == OrderStatus.PENDING):
+                pairs.append((taxi, order))
+
+        new_assignments = []
+        for taxi, order in pairs:
+            to_pickup = self._cached_route(taxi.location, order.pickup)
+            to_dropoff = self._cached_route(order.pickup, order.dropoff)
+            routes_ready = to_pickup is not None and to_dropoff is not None
+
+            assignment = self._record('order_assigned', {
+                'taxi_id': taxi.id,
+                'order_id': order.id,
+                'to_pickup_route': asdict(to_pickup or self._create_fallback_route(taxi.location, order.pickup)),
+                'to_dropoff_route': asdict(to_dropoff or self._create_fallback_route(order.pickup, order.dropoff)),
+                'algorithm_used': algorithm,
+                'routes_ready': routes_ready
+            })
+            new_assignments.append(assignment)
+            wait = self.scheduler.order_dispatched(order.id)
+            if wait is not None:
+                self.demand_stats.record_fulfilment(self.demand_index.pickup_cell(order), wait)
+            if not routes_ready:
+                self.route_queue.put_nowait(order.id)
+
+        logger.info(f"Committed {len(new_assignments)} assignments, {self.route_queue.qsize()} awaiting routes")
+        return new_assignments
+
+    def _cached_route(self, start: Location, end: Location) -> Optional[Route]:
+        if self.local_router is None and USE_ROUTES_PLANNER:
+            return self.route_cache.lookup(start, end)  # Memory only; the route workers check the disk
+        return None
+
+    def start_route_workers(self) -> List[asyncio.Task]:
+        return [asyncio.create_task(self._route_worker()) for _ in range(ROUTE_WORKERS)]
+
+    async def _route_worker(self):
+        """Replace placeholder routes with real ones and push them to clients"""
+        while True:
+            order_id = await self.route_queue.get()
+            try:
+                assignment = self.assignments.get(order_id)
+                if assignment is None or assignment.routes_ready:
+                    continue  # Completed or cleaned up while queued
+
+                taxi = self.taxis[assignment.taxi_id]
+                order = self.orders[order_id]
                 try:
-                    url = "https://api.openrouteservice.org/v2/directions/driving-car/geojson"
-                    body = {"coordinates": [[start.lng, start.lat], [end.lng, end.lat]]}
-                    response = requests.post(
-                        url, 
-                        json=body, 
-                        params={"api_key": used_api_key},
-                        headers={"Content-Type": "application/json"},
-                        timeout=15  # Increased timeout
+                    to_pickup, to_dropoff = await asyncio.gather(
+                        self.get_route(taxi.location, order.pickup),
+                        self.get_route(order.pickup, order.dropoff)
                     )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if "features" in data and data["features"]:
-                            coords = data["features"][0]["geometry"]["coordinates"]
-                            path = [[lat, lng] for lng, lat in coords]
-                            duration = data["features"][0]["properties"]["summary"]["duration"]
-                            logger.info(f"Route constructed successfully on attempt {attempt + 1}")
-                            return Route(path=path, duration=duration)
-                    
-                    # Rate limiting or temporary error
-                    if response.status_code == 429:
-                        if attempt >= 3:
-                            used_api_key = random.choice(ORS_API_KEYS)
-                            logger.warning(f"Using different API key: {used_api_key}")
-
-                        delay = base_delay * (2 ** attempt)
-                        logger.warning(f"Rate limited, waiting {delay}s before retry {attempt + 1}")
-                        await asyncio.sleep(delay)
-                        continue
-                        
                 except Exception as e:
-                    delay = base_delay * (2 ** attempt)
-                    logger.warning(f"ORS API attempt {attempt + 1} failed: {e}, retrying in {delay}s")
-                    await asyncio.sleep(delay)
-        
-        logger.error("All route construction attempts failed, using fallback")
-        return self._create_fallback_route(start, end)
+                    # Clients only animate, and so complete, assignments whose routes are ready
+                    logger.error(f"Routing for {order_id} failed, using fallback routes: {e}")
+                    to_pickup = self._create_fallback_route(taxi.location, order.pickup)
+                    to_dropoff = self._create_fallback_route(order.pickup, order.dropoff)
+
+                # The assignment may have been completed while its routes were being fetched
+                if self.assignments.get(order_id) is not assignment:
+                    continue
+                self._record('routes_ready', {'order_id': order_id, 'to_pickup_route': asdict(to_pickup),
+                                              'to_dropoff_route': asdict(to_dropoff)})
+                await self.broadcast_route_ready(assignment)
+            except Exception as e:
+                logger.error(f"Route materialization for {order_id} failed: {e}")
+            finally:
+                self.route_queue.task_done()
 
     def _create_fallback_route(self, start: Location, end: Location, steps: int = 20) -> Route:
         path = []
@@ -246,42 +582,38 @@ class TaxiDispatchSystem:
             lat = start.lat + (end.lat - start.lat) * frac
             lng = start.lng + (end.lng - start.lng) * frac
             path.append([lat, lng])
-        return Route(path=path, duration=60)
+        return Route.from_path(path, 60, ROUTE_SIMPLIFY_TOLERANCE_M)
 
     def create_order(self) -> Optional[Order]:
         # Check if we've reached the pending orders limit
-        pending_count = len([o for o in self.orders.values() if o.status == OrderStatus.PENDING])
-        if pending_count >= MAX_PENDING_ORDERS:
+        if self.order_store.count(OrderStatus.PENDING) >= MAX_PENDING_ORDERS:
             logger.warning(f"Maximum pending orders ({MAX_PENDING_ORDERS}) reached, skipping order creation")
             return None
         
-        self.order_counter += 1
-        order_id = f"order_{self.order_counter}"
-        
         # Generate pickup location randomly within ~3.5km radius of city center
         # 0.07 degrees is approximately 7km total range (3.5km in each direction)
         pickup = Location(
-            lat=CENTER_LAT + (random.random() - 0.5) * 0.07,  # Random offset from center latitude
-            lng=CENTER_LNG + (random.random() - 0.5) * 0.07   # Random offset from center longitude
+            lat=CENTER_LAT + (self.rng.random() - 0.5) * 0.07,  # Random offset from center latitude
+            lng=CENTER_LNG + (self.rng.random() - 0.5) * 0.07   # Random offset from center longitude
         )
         
         # Generate dropoff location as an offset from pickup location
         # This creates a trip with random direction and distance (up to ~3.5km from pickup)
         dropoff = Location(
-            lat=pickup.lat + (random.random() - 0.5) * 0.07,  # Random offset from pickup latitude
-            lng=pickup.lng + (random.random() - 0.5) * 0.07   # Random offset from pickup longitude
+            lat=pickup.lat + (self.rng.random() - 0.5) * 0.07,  # Random offset from pickup latitude
+            lng=pickup.lng + (self.rng.random() - 0.5) * 0.07   # Random offset from pickup longitude
         )
-        order = Order(id=order_id, pickup=pickup, dropoff=dropoff, status=OrderStatus.PENDING)
-        self.orders[order_id] = order
+        order = self._record('order_created', {'pickup': asdict(pickup), 'dropoff': asdict(dropoff)})
+        self.demand_stats.record_arrival(self.demand_index.pickup_cell(order))
+        self.scheduler.order_arrived(order.id)
         
         self._cleanup_old_orders()
         return order
 
     def _cleanup_old_orders(self):
-        completed_orders = [o for o in self.orders.values() if o.status == OrderStatus.COMPLETED]
-        if len(completed_orders) > MAX_COMPLETED_ORDERS:
-            oldest_order = min(completed_orders, key=lambda o: o.id)
-            del self.orders[oldest_order.id]
+        # Evict in completion order; comparing ids would put order_10 before order_9
+        while self.order_store.count(OrderStatus.COMPLETED) > MAX_COMPLETED_ORDERS:
+            self._record('order_evicted', {'order_id': self.order_store.oldest(OrderStatus.COMPLETED)})
 
 
     async def assign_taxis_hybrid(self) -> List[Assignment]:
@@ -292,74 +624,40 @@ class TaxiDispatchSystem:
         self.update_demand_hexagons()
 
         # Filter pending orders and free taxis
-        pending_orders = [o for o in self.orders.values() if o.status == OrderStatus.PENDING]
-        free_taxis = [t for t in self.taxis.values() if t.status == TaxiStatus.FREE]
+        taxi_rows, order_rows = self._dispatch_rows()
 
-        if not pending_orders or not free_taxis:
+        if not len(order_rows) or not len(taxi_rows):
             return []
+        # Ids as of now: rows of orders removed while costs are awaited may be reused
+        taxi_ids, order_ids = self.taxi_store.ids_of(taxi_rows), self.order_store.ids_of(order_rows)
 
-        num_taxis = len(free_taxis)
-        num_orders = len(pending_orders)
-        cost_matrix = np.zeros((num_taxis, num_orders))
-
-        # Map orders to hex IDs
-        order_hexes = {order.id: h3.latlng_to_cell(order.pickup.lat, order.pickup.lng, H3_RESOLUTION) 
-                        for order in pending_orders}
+        num_orders = len(order_rows)
 
         # Define weights for cost components
         WEIGHT_DISTANCE = 0.6  # 60% weight on distance
         WEIGHT_DEMAND = 0.4   # 40% weight on demand ratio (inverse)
 
-        # Calculate demand-weighted cost matrix
-        for i, taxi in enumerate(free_taxis):
-            for j, order in enumerate(pending_orders):
-                # Base distance cost
-                distance_cost = self.get_distance(taxi.location, order.pickup)
-                
-                # Get demand ratio for the order's hexagon
-                hex_id = order_hexes[order.id]
-                demand_ratio = (self.demand_hexagons[hex_id].demand_ratio 
-                                if hex_id in self.demand_hexagons and self.demand_hexagons[hex_id].taxis_count > 0 
-                                else float('inf') if self.demand_hexagons[hex_id].orders_count > 0 else 1.0)
-                
-                # Inverse demand weighting (higher demand lowers cost)
-                demand_weight = min(1.0, 1.0 / (demand_ratio + 1e-6))
-                
-                # Combined cost: weighted sum of distance and demand influence
-                combined_cost = (WEIGHT_DISTANCE * distance_cost + 
-                                WEIGHT_DEMAND * distance_cost * (1 - demand_weight))
-                
-                cost_matrix[i][j] = combined_cost
-
-        # Perform assignment using Hungarian algorithm
-        row_ind, col_ind = linear_sum_assignment(cost_matrix)
-
-        # Create assignments and routes
-        new_assignments = []
-        for row, col in zip(row_ind, col_ind):
-            if col < num_orders:
-                taxi = free_taxis[row]
-                order = pending_orders[col]
-                
-                taxi.status = TaxiStatus.BUSY
-                order.status = OrderStatus.ASSIGNED
-                
-                logger.info(f"Constructing routes for taxi {taxi.id} to order {order.id}...")
-                
-                # Wait for proper route construction with retries
-                to_pickup = await self.get_route(taxi.location, order.pickup)
-                to_dropoff = await self.get_route(order.pickup, order.dropoff)
-                
-                assignment = Assignment(
-                    taxi_id=taxi.id,
-                    order_id=order.id,
-                    to_pickup_route=to_pickup,
-                    to_dropoff_route=to_dropoff,
-                    algorithm_used="hybrid"
-                )
-                
-                self.assignments[order.id] = assignment
-                new_assignments.append(assignment)
+        # Inverse demand weighting of each order's hexagon (higher demand lowers cost)
+        ratio, orders_count, taxis_count, known = self._order_demand_vectors(order_rows)
+        demand_weights = hybrid_demand_weights(ratio, orders_count, taxis_count, known)
+
+        if self._use_sharded_dispatch(taxi_rows, order_rows):
+            taxi_idx, order_idx = await self._match_sharded(taxi_rows, order_rows, 'hybrid', demand_weights)
+        elif self._use_sparse_dispatch(taxi_rows, order_rows):
+            order_idx, taxi_idx, distances = self._sparse_candidates(taxi_rows, order_rows)
+            costs = hybrid_cost_matrix(distances, demand_weights[order_idx], WEIGHT_DISTANCE, WEIGHT_DEMAND)
+            taxi_idx, order_idx = self._match_sparse(taxi_rows, order_rows, order_idx, taxi_idx, costs)
+        else:
+            pickup_costs = await self._pickup_cost_matrix(taxi_rows, order_rows)
+            cost_matrix = hybrid_cost_matrix(pickup_costs, demand_weights, WEIGHT_DISTANCE, WEIGHT_DEMAND)
+
+            # Perform assignment using Hungarian algorithm
+            taxi_idx, order_idx = linear_sum_assignment(cost_matrix)
+            keep = order_idx < num_orders
+            taxi_idx, order_idx = taxi_idx[keep], order_idx[keep]
+
+        # Create assignments and construct their routes as one concurrent batch
+        new_assignments = self._build_assignments(taxi_ids, order_ids, taxi_idx, order_idx, "hybrid")
 
         total_time = time.time() - start_time
         logger.info(f"  └─ TOTAL hybrid assignment: {total_time:.3f}s")
@@ -387,45 +685,28 @@ class TaxiDispatchSystem:
         start_time = time.time()
         
         # Filter pending orders and free taxis
-        pending_orders = [o for o in self.orders.values() if o.status == OrderStatus.PENDING]
-        free_taxis = [t for t in self.taxis.values() if t.status == TaxiStatus.FREE]
+        taxi_rows, order_rows = self._dispatch_rows()
         
-        if not pending_orders or not free_taxis:
+        if not len(order_rows) or not len(taxi_rows):
             return []
+        # Ids as of now: rows of orders removed while costs are awaited may be reused
+        taxi_ids, order_ids = self.taxi_store.ids_of(taxi_rows), self.order_store.ids_of(order_rows)
+
+        if self._use_sharded_dispatch(taxi_rows, order_rows):
+            taxi_idx, order_idx = await self._match_sharded(taxi_rows, order_rows, 'proximity')
+        elif self._use_sparse_dispatch(taxi_rows, order_rows):
+            order_idx, taxi_idx, distances = self._sparse_candidates(taxi_rows, order_rows)
+            taxi_idx, order_idx = self._match_sparse(taxi_rows, order_rows, order_idx, taxi_idx, distances)
+        else:
+            # Simple distance-based cost matrix (travel time to pickup)
+            cost_matrix = await self._pickup_cost_matrix(taxi_rows, order_rows)
 
-        # Simple distance-based cost matrix
-        cost_matrix = np.zeros((len(free_taxis), len(pending_orders)))
-        for i, taxi in enumerate(free_taxis):
-            for j, order in enumerate(pending_orders):
-                cost_matrix[i, j] = self.get_distance(taxi.location, order.pickup)
+            taxi_idx, order_idx = linear_sum_assignment(cost_matrix)
+            keep = order_idx < len(order_rows)
+            taxi_idx, order_idx = taxi_idx[keep], order_idx[keep]
 
-        row_ind, col_ind = linear_sum_assignment(cost_matrix)
-        
-        new_assignments = []
-        for row, col in zip(row_ind, col_ind):
-            if col < len(pending_orders):
-                taxi = free_taxis[row]
-                order = pending_orders[col]
-                
-                taxi.status = TaxiStatus.BUSY
-                order.status = OrderStatus.ASSIGNED
-                
-                logger.info(f"Constructing routes for taxi {taxi.id} to order {order.id}...")
-                
-                # Wait for proper route construction with retries
-                to_pickup = await self.get_route(taxi.location, order.pickup)
-                to_dropoff = await self.get_route(order.pickup, order.dropoff)
-                
-                assignment = Assignment(
-                    taxi_id=taxi.id,
-                    order_id=order.id,
-                    to_pickup_route=to_pickup,
-                    to_dropoff_route=to_dropoff,
-                    algorithm_used="proximity"
-                )
-                
-                self.assignments[order.id] = assignment
-                new_assignments.append(assignment)
+        # Create assignments and construct their routes as one concurrent batch
+        new_assignments = self._build_assignments(taxi_ids, order_ids, taxi_idx, order_idx, "proximity")
 
         total_time = time.time() - start_time
         logger.info(f"  └─ TOTAL proximity-only assignment: {total_time:.3f}s")
@@ -439,55 +720,30 @@ class TaxiDispatchSystem:
         self.update_demand_hexagons()
 
         # Filter pending orders and free taxis
-        pending_orders = [o for o in self.orders.values() if o.status == OrderStatus.PENDING]
-        free_taxis = [t for t in self.taxis.values() if t.status == TaxiStatus.FREE]
+        taxi_rows, order_rows = self._dispatch_rows()
         
-        if not pending_orders or not free_taxis:
+        if not len(order_rows) or not len(taxi_rows):
             return []
+        # Ids as of now: rows of orders removed while costs are awaited may be reused
+        taxi_ids, order_ids = self.taxi_store.ids_of(taxi_rows), self.order_store.ids_of(order_rows)
 
         # Demand-based cost matrix
-        cost_matrix = np.zeros((len(free_taxis), len(pending_orders)))
-        for i, taxi in enumerate(free_taxis):
-            for j, order in enumerate(pending_orders):
-                # Get demand ratio for the order's hexagon
-                hex_id = h3.latlng_to_cell(order.pickup.lat, order.pickup.lng, H3_RESOLUTION)
-                if hex_id in self.demand_hexagons:
-                    demand_ratio = self.demand_hexagons[hex_id].demand_ratio
-                    if demand_ratio == float('inf'):
-                        cost_matrix[i, j] = 0.1  # Very low cost for high unmet demand
-                    elif demand_ratio > 0:
-                        cost_matrix[i, j] = 1.0 / (demand_ratio + 1e-6)  # Inverse demand cost
-                    else:
-                        cost_matrix[i, j] = 1.0  # Normal cost for no demand
-                else:
-                    cost_matrix[i, j] = 1.0  # Default cost
-
-        row_ind, col_ind = linear_sum_assignment(cost_matrix)
-        
-        new_assignments = []
-        for row, col in zip(row_ind, col_ind):
-            if col < len(pending_orders):
-                taxi = free_taxis[row]
-                order = pending_orders[col]
-                
-                taxi.status = TaxiStatus.BUSY
-                order.status = OrderStatus.ASSIGNED
-                
-                logger.info(f"Constructing routes for taxi {taxi.id} to order {order.id}...")
-                
-                to_pickup = await self.get_route(taxi.location, order.pickup)
-                to_dropoff = await self.get_route(order.pickup, order.dropoff)
-                
-                assignment = Assignment(
-                    taxi_id=taxi.id,
-                    order_id=order.id,
-                    to_pickup_route=to_pickup,
-                    to_dropoff_route=to_dropoff,
-                    algorithm_used="demand"
-                )
-                
-                self.assignments[order.id] = assignment
-                new_assignments.append(assignment)
+        ratio, _, _, known = self._order_demand_vectors(order_rows)
+        if self._use_sharded_dispatch(taxi_rows, order_rows):
+            taxi_idx, order_idx = await self._match_sharded(taxi_rows, order_rows, 'demand', demand_costs(ratio, known))
+        elif self._use_sparse_dispatch(taxi_rows, order_rows):
+            order_idx, taxi_idx, _ = self._sparse_candidates(taxi_rows, order_rows)
+            costs = demand_costs(ratio, known)[order_idx]
+            taxi_idx, order_idx = self._match_sparse(taxi_rows, order_rows, order_idx, taxi_idx, costs)
+        else:
+            cost_matrix = demand_cost_matrix(ratio, known, len(taxi_rows))
+
+            taxi_idx, order_idx = linear_sum_assignment(cost_matrix)
+            keep = order_idx < len(order_rows)
+            taxi_idx, order_idx = taxi_idx[keep], order_idx[keep]
+
+        # Create assignments and construct their routes as one concurrent batch
+        new_assignments = self._build_assignments(taxi_ids, order_ids, taxi_idx, order_idx, "demand")
 
         total_time = time.time() - start_time
         logger.info(f"  └─ TOTAL demand-only assignment: {total_time:.3f}s")
@@ -495,94 +751,168 @@ class TaxiDispatchSystem:
 
     def complete_assignment(self, order_id: str):
         if order_id in self.assignments:
-            assignment = self.assignments[order_id]
-            
-            if assignment.taxi_id in self.taxis:
-                taxi = self.taxis[assignment.taxi_id]
-                taxi.status = TaxiStatus.FREE
-                
-                last_point = assignment.to_dropoff_route.path[-1]
-                taxi.location = Location(lat=last_point[0], lng=last_point[1])
-            
-            if order_id in self.orders:
-                self.orders[order_id].status = OrderStatus.COMPLETED
-            
-            del self.assignments[order_id]
+            last_point = self.assignments[order_id].to_dropoff_route.path[-1]
+            self._record('order_completed', {'order_id': order_id,
+                                             'location': {'lat': last_point[0], 'lng': last_point[1]}})
+            self.scheduler.capacity_changed()
+
+    def _free_taxi_count(self) -> int:
+        return self.taxi_store.count(TaxiStatus.FREE)
+
+    async def run_assignment_round(self) -> int:
+        """One dispatch round triggered by the scheduler; returns the number of new assignments"""
+        if not self.connected_clients and not self.headless:
+            return 0
+        assignments = await self.assign_taxis_optimally()
+        if assignments:
+            logger.info(f"Created {len(assignments)} assignments")
+            self.broadcasts.mark_dirty()
+        return len(assignments)
 
     async def broadcast_state(self):
         if not self.connected_clients:
             return
-        
-        def serialize_enum(obj):
-            if isinstance(obj, dict):
-                return {k: serialize_enum(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [serialize_enum(item) for item in obj]
-            elif hasattr(obj, 'value'):  # Enum
-                return obj.value
-            else:
-                return obj
-            
-        state = {
-            "type": "state_update",
-            "taxis": [serialize_enum(asdict(taxi)) for taxi in self.taxis.values()],
-            "orders": [serialize_enum(asdict(order)) for order in self.orders.values()],
-            "assignments": [serialize_enum(asdict(assignment)) for assignment in self.assignments.values()]
+
+        # One frame per format and viewport in use, shared by the clients with the same ones;
+        # unchanged entities reuse their encoding across all of them
+        self.state_encoder.begin_broadcast()
+        frames = {}
+        taxi_assignments = None
+        for websocket, channel in list(self.client_channels.items()):
+            viewport = self.client_viewports.get(websocket)
+            frame_key = (channel.wire_format, viewport.cell_ids if viewport is not None else None)
+            frame = frames.get(frame_key)
+            if frame is None:
+                if viewport is not None and taxi_assignments is None:
+                    taxi_assignments = {a.taxi_id: a for a in self.assignments.values()}
+                frame = frames[frame_key] = self._state_frame(channel.wire_format, viewport, taxi_assignments)
+            channel.send(frame, key='state_update')
+
+    def send_state(self, websocket: WebSocket):
+        """Fresh state_update for one client, after it connects or changes its viewport"""
+        channel = self.client_channels.get(websocket)
+        if channel is None:
+            return
+        viewport = self.client_viewports.get(websocket)
+        taxi_assignments = {a.taxi_id: a for a in self.assignments.values()} if viewport is not None else None
+        channel.send(self._state_frame(channel.wire_format, viewport, taxi_assignments), key='state_update')
+
+    def _state_frame(self, fmt: str, viewport: Optional[Viewport],
+                     taxi_assignments: Optional[Dict[str, Assignment]]):
+        if viewport is None:
+            taxis, orders, assignments = self.taxis.values(), self.orders.values(), self.assignments.values()
+        else:
+            taxis, orders, assignments = self._visible_entities(viewport, taxi_assignments)
+        frame = self.state_encoder.state_update(
+            fmt,
+            ((taxi, self.taxi_store.version(taxi.id)) for taxi in taxis),
+            ((order, self.order_store.version(order.id)) for order in orders),
+            assignments
+        )
+        return frame.decode() if fmt == 'json' else frame
+
+    def _visible_entities(self, viewport: Viewport, taxi_assignments: Dict[str, Assignment]):
+        """Taxis and orders (by pickup) inside the viewport, their assignments, and the other side of those"""
+        taxi_ids = set(self.taxi_store.ids_in_cells(viewport.cells))
+        order_ids = set(self.order_store.ids_in_cells(viewport.cells))
+        assignments = [a for a in map(self.assignments.get, order_ids) if a is not None]
+        assignments += [a for a in map(taxi_assignments.get, taxi_ids) if a is not None and a.order_id not in order_ids]
+        # A route crossing the viewport border is sent whole, with both its taxi and its order
+        for assignment in assignments:
+            taxi_ids.add(assignment.taxi_id)
+            order_ids.add(assignment.order_id)
+        return ([self.taxis[taxi_id] for taxi_id in taxi_ids if taxi_id in self.taxis],
+                [self.orders[order_id] for order_id in order_ids if order_id in self.orders],
+                assignments)
+
+    def _sees(self, viewport: Optional[Viewport], assignment: Assignment) -> bool:
+        if viewport is None:
+            return True
+        return ((assignment.taxi_id in self.taxi_store.index and
+                 self.taxi_store.cell_of(assignment.taxi_id) in viewport.cells) or
+                (assignment.order_id in self.order_store.index and
+                 self.order_store.cell_of(assignment.order_id) in viewport.cells))
+
+    def subscribe_viewport(self, websocket: WebSocket, bbox: Optional[BoundingBox] = None,
+                           cells: Optional[List[str]] = None):
+        """Limit one client's state, route and demand messages to a bounding box or a set of H3 cells"""
+        if cells is not None:
+            viewport = Viewport.from_cells(cells, H3_RESOLUTION, VIEWPORT_MAX_CELLS)
+        elif bbox is not None:
+            viewport = Viewport.from_bbox(bbox, H3_RESOLUTION, VIEWPORT_MAX_CELLS)
+        else:
+            raise ValueError("subscribe needs a bbox or cells")
+        if viewport is None:
+            logger.info(f"Viewport over {VIEWPORT_MAX_CELLS} cells, sending the full stream")
+            self.client_viewports.pop(websocket, None)
+        else:
+            self.client_viewports[websocket] = viewport
+        self.send_state(websocket)
+        self.send_to(websocket, json.dumps(self.demand_snapshot(viewport)), key='demand_snapshot')
+
+    def unsubscribe_viewport(self, websocket: WebSocket):
+        if self.client_viewports.pop(websocket, None) is not None:
+            self.send_state(websocket)
+            self.send_to(websocket, json.dumps(self.demand_snapshot()), key='demand_snapshot')
+
+    async def broadcast_route_ready(self, assignment: Assignment):
+        """Push the materialized routes of one assignment"""
+        if not self.connected_clients:
+            return
+
+        message = {
+            "type": "route_ready",
+            "order_id": assignment.order_id,
+            "taxi_id": assignment.taxi_id,
+            "to_pickup_route": asdict(assignment.to_pickup_route),
+            "to_dropoff_route": asdict(assignment.to_dropoff_route)
         }
+        frame = json.dumps(message)
+        for websocket, channel in list(self.client_channels.items()):
+            if self._sees(self.client_viewports.get(websocket), assignment):
+                channel.send(frame)
+
+    def send_to(self, websocket: WebSocket, message: str, key: Optional[str] = None):
+        channel = self.client_channels.get(websocket)
+        if channel is not None:
+            channel.send(message, key)
+
+    def _drop_slow_client(self, websocket: WebSocket):
+        """Called by a ClientChannel that gave up on its client"""
+        self.connected_clients.discard(websocket)
+        self.demand_views.pop(websocket, None)
+        self.client_viewports.pop(websocket, None)
+        self.client_channels.pop(websocket, None)
+        self.slow_clients_dropped += 1
+
+    def update_demand_hexagons(self) -> Set[str]:
+        """Bring ratios, colors and levels up to date for the hexagons whose counts changed"""
+        # Counts are maintained by demand_index as orders and taxis change
+        changed = self.demand_index.flush()
+        self._demand_changes |= changed
+        return changed
+
+    def _refresh_hexagon(self, hex_data: DemandHexagon):
+        """Calculate demand ratio and color for one hexagon from its counts"""
+        orders = hex_data.orders_count
+        taxis = hex_data.taxis_count
         
-        message = json.dumps(state)
-        disconnected = set()
-        
-        for client in self.connected_clients:
-            try:
-                await client.send_text(message)
-            except:
-                disconnected.add(client)
-        
-        self.connected_clients -= disconnected
-
-    def update_demand_hexagons(self):
-        """Calculate real-time demand for all hexagons"""
-        # Reset all hexagon counts
-        for hex_data in self.demand_hexagons.values():
-            hex_data.orders_count = 0
-            hex_data.taxis_count = 0
-        
-        # Count pending orders per hexagon
-        for order in self.orders.values():
-            if order.status == OrderStatus.PENDING:
-                hex_id = h3.latlng_to_cell(order.pickup.lat, order.pickup.lng, H3_RESOLUTION)
-                if hex_id in self.demand_hexagons:
-                    self.demand_hexagons[hex_id].orders_count += 1
-        
-        # Count free taxis per hexagon
-        for taxi in self.taxis.values():
-            if taxi.status == TaxiStatus.FREE:
-                hex_id = h3.latlng_to_cell(taxi.location.lat, taxi.location.lng, H3_RESOLUTION)
-                if hex_id in self.demand_hexagons:
-                    self.demand_hexagons[hex_id].taxis_count += 1
-        
-        # Calculate demand ratio and colors for each hexagon
-        for hex_data in self.demand_hexagons.values():
-            orders = hex_data.orders_count
-            taxis = hex_data.taxis_count
-            
-            if orders == 0 and taxis == 0:
-                hex_data.demand_ratio = 0.0
-                hex_data.color = '#F0F0F0'  # Light gray - no activity
-                hex_data.demand_level = 'None'
-            elif orders == 0:
-                hex_data.demand_ratio = 0.0
-                hex_data.color = '#90EE90'  # Light green - only taxis
-                hex_data.demand_level = 'Supply Only'
-            elif taxis == 0:
-                hex_data.demand_ratio = float('inf')
-                hex_data.color = '#FF4500'  # Red-orange - unmet demand
-                hex_data.demand_level = 'High Unmet Demand'
-            else:
-                hex_data.demand_ratio = orders / taxis
-                hex_data.color = self._get_demand_color(hex_data.demand_ratio)
-                hex_data.demand_level = self._get_demand_level(hex_data.demand_ratio)
+        if orders == 0 and taxis == 0:
+            hex_data.demand_ratio = 0.0
+            hex_data.color = '#F0F0F0'  # Light gray - no activity
+            hex_data.demand_level = 'None'
+        elif orders == 0:
+            hex_data.demand_ratio = 0.0
+            hex_data.color = '#90EE90'  # Light green - only taxis
+            hex_data.demand_level = 'Supply Only'
+        elif taxis == 0:
+            hex_data.demand_ratio = float('inf')
+            hex_data.color = '#FF4500'  # Red-orange - unmet demand
+            hex_data.demand_level = 'High Unmet Demand'
+        else:
+            hex_data.demand_ratio = orders / taxis
+            hex_data.color = self._get_demand_color(hex_data.demand_ratio)
+            hex_data.demand_level = self._get_demand_level(hex_data.demand_ratio)
 
     def _get_demand_color(self, ratio: float) -> str:
         """Get color based on demand ratio (orders/taxis)"""
@@ -610,52 +940,122 @@ class TaxiDispatchSystem:
         else:
             return 'Very High Demand'
 
-    async def broadcast_demand_update(self):
-        """Send demand hexagon updates via separate WebSocket message"""
-        if not self.connected_clients:
-            return
-        
+    def _hexagon_geometry(self, hex_data: DemandHexagon) -> dict:
+        return {'center': np.asarray(hex_data.center).tolist(), 'boundary': np.asarray(hex_data.boundary).tolist()}
+
+    def _hexagon_rates(self, hex_id: str, rates: Dict[str, np.ndarray]) -> dict:
+        """Rolling per-window stats of a grid hexagon, one value per DEMAND_STATS_WINDOWS entry"""
+        row = self.demand_stats.index.get(hex_id)
+        if row is None:
+            return {}
+        return {name: np.round(values[row], 3).tolist() for name, values in rates.items()}
+
+    def _hexagon_state(self, hex_data: DemandHexagon) -> dict:
+        """Mutable demand fields of a hexagon, without its static geometry"""
+        return {
+            'hex_id': hex_data.hex_id,
+            'orders_count': hex_data.orders_count,
+            'taxis_count': hex_data.taxis_count,
+            'demand_ratio': hex_data.demand_ratio if hex_data.demand_ratio != float('inf') else -1,
+            'color': hex_data.color,
+            'demand_level': hex_data.demand_level
+        }
+
+    def demand_snapshot(self, viewport: Optional[Viewport] = None) -> dict:
+        """Every hexagon (in the viewport) with its geometry, sent once per connection and on client resync requests"""
         self.update_demand_hexagons()
-        
-        # Prepare demand data for frontend - send ALL hexagons
-        hexagons_data = []
-        for hex_data in self.demand_hexagons.values():
-            hexagons_data.append({
-                'hex_id': hex_data.hex_id,
-                'center': hex_data.center,
-                'boundary': hex_data.boundary,
-                'orders_count': hex_data.orders_count,
-                'taxis_count': hex_data.taxis_count,
-                'demand_ratio': hex_data.demand_ratio if hex_data.demand_ratio != float('inf') else -1,
-                'color': hex_data.color,
-                'demand_level': hex_data.demand_level
-            })
-        
-        demand_message = {
-            'type': 'demand_update',
+        rates = self.demand_stats.snapshot()
+        hexagons_data = [{**self._hexagon_state(hex_data), **self._hexagon_rates(hex_id, rates),
+                          **self._hexagon_geometry(hex_data)}
+                         for hex_id, hex_data in self.demand_hexagons.items()
+                         if viewport is None or hex_id in viewport]
+        return {
+            'type': 'demand_snapshot',
+            'seq': self.demand_seq,
+            'rate_windows': DEMAND_STATS_WINDOWS,
             'hexagons': hexagons_data,
             'total_hexagons': len(self.all_hexagons),
-            'active_hexagons': len(hexagons_data),
             'h3_resolution': H3_RESOLUTION
         }
+
+    def demand_view(self, resolution: int, bbox: Optional[BoundingBox] = None) -> dict:
+        """Active cells of one pyramid level inside bbox, read from the pre-aggregated counters"""
+        hexagons = self.demand_pyramid.view(resolution, bbox)
+        return {
+            'type': 'demand_view',
+            'resolution': resolution,
+            'bbox': bbox,
+            'hexagons': [{**self._hexagon_state(h), **self._hexagon_geometry(h)} for h in hexagons]
+        }
+
+    def subscribe_demand_view(self, websocket: WebSocket, zoom: float, bbox: Optional[BoundingBox]):
+        """Stream the view for a map zoom level and bounding box to one client until it changes or leaves"""
+        resolution = self.demand_pyramid.resolution_for_zoom(zoom)
+        self.demand_views[websocket] = (resolution, bbox, self.demand_pyramid.version)
+        self.send_to(websocket, json.dumps(self.demand_view(resolution, bbox)), key='demand_view')
+
+    def _push_demand_views(self):
+        """Resend subscribed views once the pyramid has changed since they were last sent"""
+        version = self.demand_pyramid.version
+        for client, (resolution, bbox, sent_version) in list(self.demand_views.items()):
+            if sent_version == version:
+                continue
+            self.demand_views[client] = (resolution, bbox, version)
+            self.send_to(client, json.dumps(self.demand_view(resolution, bbox)), key='demand_view')
+
+    async def broadcast_demand_update(self):
+        """Send the hexagons changed since the previous demand_update, tagged with a sequence number"""
+        if not self.connected_clients:
+            return
         
-        message = json.dumps(demand_message)
-        disconnected = set()
-        
-        for client in self.connected_clients:
-            try:
-                await client.send_text(message)
-            except:
-                disconnected.add(client)
+        self.update_demand_hexagons()
+        self._push_demand_views()
+        rates = self.demand_stats.snapshot()
+        self._demand_changes |= self._drifted_hexagons(rates)
+        if not self._demand_changes:
+            return
+        changed, self._demand_changes = self._demand_changes, set()
+        self.demand_seq += 1
         
-        self.connected_clients -= disconnected
+        # Deltas carry absolute values, so replaying one after a snapshot is harmless
+        hexagons = [(hex_id, {**self._hexagon_state(self.demand_hexagons[hex_id]),
+                              **self._hexagon_rates(hex_id, rates)})
+                    for hex_id in changed]
+        rows = self.demand_stats.rows(list(changed))
+        rows = rows[rows >= 0]
+        for name, values in rates.items():
+            self._sent_rates[name][rows] = values[rows]
+
+        # Viewport clients get only their hexagons, but every seq (possibly empty) so they can detect gaps
+        frames = {}
+        for websocket, channel in list(self.client_channels.items()):
+            viewport = self.client_viewports.get(websocket)
+            frame_key = viewport.cell_ids if viewport is not None else None
+            if frame_key not in frames:
+                frames[frame_key] = json.dumps({
+                    'type': 'demand_update',
+                    'seq': self.demand_seq,
+                    'rate_windows': DEMAND_STATS_WINDOWS,
+                    'hexagons': [data for hex_id, data in hexagons if viewport is None or hex_id in viewport],
+                    'total_hexagons': len(self.all_hexagons),
+                    'h3_resolution': H3_RESOLUTION
+                })
+            channel.send(frames[frame_key])
+
+    def _drifted_hexagons(self, rates: Dict[str, np.ndarray]) -> Set[str]:
+        """Grid hexagons whose per-minute rates moved past DEMAND_RATE_TOLERANCE since they were last sent
+
+        Rates decay every tick while counts may stay the same, so count changes alone would leave
+        clients showing the rates of a hexagon's last count change.
+        """
+        drifted = np.zeros(len(self.hex_grid.ids), dtype=bool)
+        for name in ('arrivals_per_min', 'fulfilments_per_min'):
+            drifted |= (np.abs(rates[name] - self._sent_rates[name]) > DEMAND_RATE_TOLERANCE).any(axis=1)
+        return {self.hex_grid.ids[row] for row in np.flatnonzero(drifted)}
 
     def update_algorithm_config(self, proximity: bool, supply_demand: bool):
         """Update algorithm configuration"""
-        self.algorithm_config = {
-            'use_proximity': proximity,
-            'use_supply_demand': supply_demand
-        }
+        self._record('config_changed', {'use_proximity': proximity, 'use_supply_demand': supply_demand})
         algorithm_name = self.get_current_algorithm_name()
         logger.info(f"Algorithm configuration updated: {algorithm_name}")
 
@@ -671,32 +1071,26 @@ class TaxiDispatchSystem:
         else:
             return "Distance-Based (Default)"
 
-    def add_client(self, websocket: WebSocket):
+    def add_client(self, websocket: WebSocket, wire_format: str = 'json'):
+        channel = ClientChannel(websocket, self._drop_slow_client, wire_format,
+                                max_frames=CLIENT_QUEUE_FRAMES, send_timeout=CLIENT_SEND_TIMEOUT)
+        channel.start()
+        self.client_channels[websocket] = channel
         self.connected_clients.add(websocket)
         logger.info(f"Client connected. Total clients: {len(self.connected_clients)}")
 
     def remove_client(self, websocket: WebSocket):
         self.connected_clients.discard(websocket)
+        self.demand_views.pop(websocket, None)
+        self.client_viewports.pop(websocket, None)
+        channel = self.client_channels.pop(websocket, None)
+        if channel is not None:
+            channel.stop()
         logger.info(f"Client disconnected. Total clients: {len(self.connected_clients)}")
-        
-        # If no clients remain, clean up simulation state to save resources
+
+        # Order generation and dispatch pause without clients; pending orders and assignments are kept
         if not self.connected_clients:
             logger.info("No clients connected - entering idle mode")
-            self._cleanup_simulation_state()
-
-    def _cleanup_simulation_state(self):
-        """Clean up simulation state when no clients are connected"""
-        # Keep existing completed orders but clear pending orders and assignments
-        pending_orders = [o_id for o_id, order in self.orders.items() if order.status == OrderStatus.PENDING]
-        for order_id in pending_orders:
-            del self.orders[order_id]
-            
-        # Clear all assignments and set all taxis to free
-        self.assignments.clear()
-        for taxi in self.taxis.values():
-            taxi.status = TaxiStatus.FREE
-            
-        logger.info(f"Cleaned up {len(pending_orders)} pending orders and all assignments")
 
 dispatch_system = TaxiDispatchSystem()
 
@@ -707,26 +1101,14 @@ async def order_simulator():
             order = dispatch_system.create_order()
             if order:
                 logger.info(f"Created order: {order.id}")
-                await dispatch_system.broadcast_state()
+                dispatch_system.broadcasts.mark_dirty()
         else:
             logger.debug("No connected clients, skipping order generation")
         await asyncio.sleep(3)
 
 async def assignment_processor():
-    while True:
-        # Only process assignments if there are connected clients
-        if dispatch_system.connected_clients:
-            logger.info(f"Assigning taxis optimally...")
-            time_start = time.time()
-            assignments = await dispatch_system.assign_taxis_optimally()
-            time_end = time.time()
-            logger.info(f"Time taken to assign taxis: {time_end - time_start} seconds")
-            if assignments:
-                logger.info(f"Created {len(assignments)} assignments")
-                await dispatch_system.broadcast_state()
-        else:
-            logger.debug("No connected clients, skipping taxi assignment")
-        await asyncio.sleep(5)
+    # Rounds are triggered by order arrivals, freed taxis and the SLA instead of a fixed interval
+    await dispatch_system.scheduler.run()
 
 async def demand_processor():
     """Process demand hexagon updates separately from main simulation"""
@@ -738,15 +1120,38 @@ async def demand_processor():
             logger.debug("No connected clients, skipping demand update")
         await asyncio.sleep(2)  # Update demand every 2 seconds
 
+async def event_log_processor():
+    """Batch event log writes so transitions never wait on the disk"""
+    if dispatch_system.event_log is None:
+        return
+    while True:
+        await asyncio.sleep(EVENT_LOG_FLUSH_INTERVAL)
+        try:
+            await dispatch_system.flush_event_log()
+        except Exception as e:
+            logger.error(f"Event log flush failed: {e}")
+
+async def route_cache_writer():
+    """Commit newly fetched routes to the disk tier in batches, off the event loop"""
+    while True:
+        await asyncio.sleep(ROUTE_CACHE_FLUSH_INTERVAL)
+        try:
+            await dispatch_system.route_cache.flush()
+        except Exception as e:
+            logger.error(f"Route cache flush failed: {e}")
+
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    dispatch_system.add_client(websocket)
+    # ?format=msgpack switches state_update frames to binary MessagePack; everything else stays JSON text
+    dispatch_system.add_client(websocket, negotiate_format(websocket.query_params.get("format", "json")))
     
-    await dispatch_system.broadcast_state()
+    # Only the new client needs the current state now; the others have it
+    dispatch_system.send_state(websocket)
     
     try:
+        dispatch_system.send_to(websocket, json.dumps(dispatch_system.demand_snapshot()), key='demand_snapshot')
         while True:
             data = await websocket.receive_text()
             message = json.loads(data)
@@ -755,15 +1160,82 @@ async def websocket_endpoint(websocket: WebSocket):
                 order_id = message.get("order_id")
                 if order_id:
                     dispatch_system.complete_assignment(order_id)
-                    await dispatch_system.broadcast_state()
+                    dispatch_system.broadcasts.mark_dirty()
             elif message.get("type") == "algorithm_config":
                 proximity = message.get("proximity", True)
                 supply_demand = message.get("supply_demand", False)
                 dispatch_system.update_algorithm_config(proximity, supply_demand)
+            elif message.get("type") == "demand_subscribe":
+                bbox = message.get("bbox")
+                try:
+                    dispatch_system.subscribe_demand_view(websocket, float(message.get("zoom", 12)),
+                                                          parse_bbox(bbox) if bbox else None)
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Ignoring invalid demand_subscribe message: {e}")
+            elif message.get("type") == "demand_unsubscribe":
+                dispatch_system.demand_views.pop(websocket, None)
+            elif message.get("type") == "demand_resync":
+                # The client missed a demand_update sequence number
+                viewport = dispatch_system.client_viewports.get(websocket)
+                dispatch_system.send_to(websocket, json.dumps(dispatch_system.demand_snapshot(viewport)),
+                                        key='demand_snapshot')
+            elif message.get("type") == "subscribe":
+                bbox, cells = message.get("bbox"), message.get("cells")
+                try:
+                    dispatch_system.subscribe_viewport(websocket, parse_bbox(bbox) if bbox else None, cells)
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Ignoring invalid subscribe message: {e}")
+            elif message.get("type") == "unsubscribe":
+                dispatch_system.unsubscribe_viewport(websocket)
                     
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also reached when the client's channel closed the socket for being too slow
         dispatch_system.remove_client(websocket)
 
 @app.get("/")
 async def root():
-    return {"message": "Taxi Dispatch System API"}
\ No newline at end of file
+    return {"message": "Taxi Dispatch System API"}
+
+@app.get("/clients/stats")
+async def client_stats():
+    return {
+        "connected": len(dispatch_system.connected_clients),
+        "slow_clients_dropped": dispatch_system.slow_clients_dropped,
+        "queue_frames": CLIENT_QUEUE_FRAMES,
+        "send_timeout": CLIENT_SEND_TIMEOUT,
+        "broadcasts": dispatch_system.broadcasts.stats(),
+        "clients": [channel.stats() for channel in dispatch_system.client_channels.values()]
+    }
+
+@app.get("/route-cache/stats")
+async def route_cache_stats():
+    return {
+        "routes": dispatch_system.route_cache.stats(),
+        "travel_times": dispatch_system.travel_times.stats()
+    }
+
+@app.get("/demand/view")
+async def demand_view(zoom: float = 12, resolution: Optional[int] = None, bbox: Optional[str] = None):
+    """Demand cells for a map view; bbox is "lat_min,lng_min,lat_max,lng_max", resolution overrides zoom"""
+    if resolution not in DEMAND_PYRAMID_RESOLUTIONS:
+        resolution = dispatch_system.demand_pyramid.resolution_for_zoom(zoom)
+    try:
+        bounds = parse_bbox(bbox.split(",")) if bbox else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be lat_min,lng_min,lat_max,lng_max")
+    return dispatch_system.demand_view(resolution, bounds)
+
+@app.get("/dispatch/stats")
+async def dispatch_stats():
+    return {
+        **dispatch_system.scheduler.stats(),
+        "sharded": dispatch_system.sharded_dispatcher.stats(),
+        "state_encoder": dispatch_system.state_encoder.stats(),
+        "event_log": dispatch_system.event_log.stats() if dispatch_system.event_log is not None else None
+    }
+
+@app.get("/routing/keys")
+async def routing_key_stats():
+    return dispatch_system.routing_client.key_stats()
\ No newline at end of file
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Sequence
+
+from geometry import decode_polyline, encode_polyline, simplify_path
+
+
+class TaxiStatus(Enum):
+    FREE = "free"
+    BUSY = "busy"
+
+class OrderStatus(Enum):
+    PENDING = "pending"
+    ASSIGNED = "assigned"
+    COMPLETED = "completed"
+
+@dataclass(slots=True)
+class Location:
+    lat: float
+    lng: float
+
+@dataclass(slots=True)
+class Route:
+    polyline: str  # Simplified [lat, lng] geometry as a Google encoded polyline (1e-5 deg precision)
+    duration: float
+
+    @classmethod
+    def from_path(cls, path: Sequence[Sequence[float]], duration: float, tolerance_m: float = 0.0) -> 'Route':
+        return cls(polyline=encode_polyline(simplify_path(path, tolerance_m)), duration=float(duration))
+
+    @property
+    def path(self) -> List[List[float]]:
+        return decode_polyline(self.polyline)
+
+@dataclass(slots=True)
+class Taxi:
+    id: str
+    location: Location
+    status: TaxiStatus
+
+@dataclass(slots=True)
+class Order:
+    id: str
+    pickup: Location
+    dropoff: Location
+    status: OrderStatus
+
+@dataclass(slots=True)
+class Assignment:
+    taxi_id: str
+    order_id: str
+    to_pickup_route: Route
+    to_dropoff_route: Route
+    algorithm_used: str = "hybrid"  # Track which algorithm created this assignment
+    routes_ready: bool = True  # False while the routes are still straight-line placeholders
+
+@dataclass(slots=True)
+class DemandHexagon:
+    hex_id: str
+    center: Sequence[float]  # [lat, lng]; a row of HexGrid.centers for grid cells
+    boundary: Sequence[Sequence[float]]  # [[lat, lng], ...]; a slice of HexGrid.vertices for grid cells
+    orders_count: int
+    taxis_count: int
+    demand_ratio: float
+    color: str
+    demand_level: str
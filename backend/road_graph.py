@@ -0,0 +1,414 @@
+import asyncio
+import bz2
+import gzip
+import heapq
+import logging
+import math
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+
+from models import Location, Route
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000.0
+
+# Free-flow speeds (km/h) for drivable OSM highway classes
+HIGHWAY_SPEEDS_KMH = {
+    'motorway': 90, 'motorway_link': 50,
+    'trunk': 70, 'trunk_link': 40,
+    'primary': 60, 'primary_link': 35,
+    'secondary': 50, 'secondary_link': 30,
+    'tertiary': 40, 'tertiary_link': 25,
+    'unclassified': 30, 'residential': 30,
+    'living_street': 10, 'service': 15,
+}
+SNAP_SPEED_MPS = 30 / 3.6  # Speed assumed for the off-network legs to and from the graph
+
+
+def _haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def _open_osm(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _way_speed_kmh(tags: Dict[str, str]) -> Optional[float]:
+    highway = tags.get('highway')
+    if highway not in HIGHWAY_SPEEDS_KMH:
+        return None
+    maxspeed = tags.get('maxspeed', '')
+    digits = ''.join(ch for ch in maxspeed.split(';')[0] if ch.isdigit())
+    if digits and 5 <= int(digits) <= 130:
+        return float(digits)
+    return float(HIGHWAY_SPEEDS_KMH[highway])
+
+
+class RoadGraph:
+    """Directed road network in CSR arrays with travel times (seconds) as edge weights"""
+
+    def __init__(self, lat: np.ndarray, lng: np.ndarray,
+                 src: np.ndarray, dst: np.ndarray, seconds: np.ndarray, num_landmarks: int = 8):
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        src = np.asarray(src, dtype=np.int32)
+        dst = np.asarray(dst, dtype=np.int32)
+        seconds = np.asarray(seconds, dtype=np.float32)
+
+        # Shortest paths between two nodes of a strongly connected component never leave it,
+        # so keeping only the largest one is exact and makes every query routable
+        n = len(lat)
+        graph = csr_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+        _, labels = connected_components(graph, directed=True, connection='strong')
+        keep = labels == np.bincount(labels).argmax() if n else np.zeros(0, dtype=bool)
+        remap = np.cumsum(keep) - 1
+        edge_keep = keep[src] & keep[dst]
+
+        self.lat = lat[keep]
+        self.lng = lng[keep]
+        self.src = remap[src[edge_keep]].astype(np.int32)
+        self.dst = remap[dst[edge_keep]].astype(np.int32)
+        self.seconds = seconds[edge_keep]
+        self.num_nodes = len(self.lat)
+        self.num_edges = len(self.src)
+        if n != self.num_nodes:
+            logger.info(f"Dropped {n - self.num_nodes} nodes outside the largest strongly connected component")
+
+        self.fwd_ptr, self.fwd_adj, self.fwd_w = self._build_csr(self.src, self.dst, self.seconds)
+        self.bwd_ptr, self.bwd_adj, self.bwd_w = self._build_csr(self.dst, self.src, self.seconds)
+
+        # Fastest speed on the network bounds every edge from below for the A* potentials
+        lengths = self._edge_lengths_m()
+        speeds = lengths / np.maximum(self.seconds.astype(np.float64), 1e-6)
+        self.max_speed_mps = float(speeds.max()) if self.num_edges else 1.0
+
+        # Plain lists are much faster than numpy scalars inside the search loop
+        self._fwd = (self.fwd_ptr.tolist(), self.fwd_adj.tolist(), self.fwd_w.tolist())
+        self._bwd = (self.bwd_ptr.tolist(), self.bwd_adj.tolist(), self.bwd_w.tolist())
+        self._lat_rad = np.radians(self.lat).tolist()
+        self._lng_rad = np.radians(self.lng).tolist()
+        self._cos_lat = np.cos(np.radians(self.lat)).tolist()
+        self._csr = csr_matrix((self.seconds.astype(np.float64), (self.src, self.dst)),
+                               shape=(self.num_nodes, self.num_nodes))
+        self._select_landmarks(num_landmarks)
+
+        self._lat0_cos = math.cos(math.radians(float(self.lat.mean()))) if self.num_nodes else 1.0
+        self._tree = cKDTree(np.column_stack((self.lng * self._lat0_cos, self.lat)))
+
+    def _select_landmarks(self, count: int):
+        """Pick landmarks by farthest-point selection and store ALT distance tables"""
+        self.landmarks: List[int] = []
+        self._lm_from: List[List[float]] = []
+        self._lm_to: List[List[float]] = []
+        if not self.num_nodes or count <= 0:
+            return
+
+        matrix = self._csr
+        reverse = matrix.T.tocsr()
+        closest = dijkstra(matrix, indices=0)
+        for _ in range(min(count, self.num_nodes)):
+            landmark = int(np.argmax(closest))
+            from_landmark = dijkstra(matrix, indices=landmark)
+            to_landmark = dijkstra(reverse, indices=landmark)
+            self.landmarks.append(landmark)
+            self._lm_from.append(from_landmark.tolist())
+            self._lm_to.append(to_landmark.tolist())
+            closest = np.minimum(closest, from_landmark)
+
+    def _build_csr(self, src: np.ndarray, dst: np.ndarray,
+                   weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        order = np.argsort(src, kind='stable')
+        ptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=self.num_nodes), out=ptr[1:])
+        return ptr, dst[order].astype(np.int32), weights[order].astype(np.float32)
+
+    def _edge_lengths_m(self) -> np.ndarray:
+        lat1, lat2 = np.radians(self.lat[self.src]), np.radians(self.lat[self.dst])
+        dlat = lat2 - lat1
+        dlng = np.radians(self.lng[self.dst] - self.lng[self.src])
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+    @classmethod
+    def from_osm(cls, path: str) -> 'RoadGraph':
+        """Parse drivable ways from an OSM XML extract (.osm, .osm.gz or .osm.bz2)"""
+        coords: Dict[int, Tuple[float, float]] = {}
+        ways: List[Tuple[List[int], float, int]] = []
+
+        with _open_osm(path) as f:
+            for _, elem in ET.iterparse(f, events=('end',)):
+                if elem.tag == 'node':
+                    coords[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+                    elem.clear()
+                elif elem.tag == 'way':
+                    tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+                    speed = _way_speed_kmh(tags)
+                    if speed is not None and tags.get('access') not in ('no', 'private'):
+                        refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                        oneway = tags.get('oneway', '')
+                        if oneway in ('yes', 'true', '1') or tags.get('junction') == 'roundabout' \
+                                or (tags.get('highway') == 'motorway' and oneway != 'no'):
+                            direction = 1
+                        elif oneway == '-1':
+                            direction = -1
+                        else:
+                            direction = 0
+                        ways.append((refs, speed, direction))
+                    elem.clear()
+                elif elem.tag == 'relation':
+                    elem.clear()
+
+        index: Dict[int, int] = {}
+        lat: List[float] = []
+        lng: List[float] = []
+        src: List[int] = []
+        dst: List[int] = []
+        seconds: List[float] = []
+
+        def node_index(osm_id: int) -> int:
+            if osm_id not in index:
+                index[osm_id] = len(lat)
+                lat.append(coords[osm_id][0])
+                lng.append(coords[osm_id][1])
+            return index[osm_id]
+
+        for refs, speed_kmh, direction in ways:
+            refs = [r for r in refs if r in coords]
+            speed_mps = speed_kmh / 3.6
+            for a, b in zip(refs, refs[1:]):
+                u, v = node_index(a), node_index(b)
+                t = _haversine_m(lat[u], lng[u], lat[v], lng[v]) / speed_mps
+                if direction >= 0:
+                    src.append(u); dst.append(v); seconds.append(t)
+                if direction <= 0:
+                    src.append(v); dst.append(u); seconds.append(t)
+
+        logger.info(f"Parsed {len(lat)} road nodes and {len(src)} directed edges from {path}")
+        return cls(np.array(lat), np.array(lng), np.array(src), np.array(dst), np.array(seconds))
+
+    @classmethod
+    def load(cls, path: str) -> 'RoadGraph':
+        data = np.load(path)
+        return cls(data['lat'], data['lng'], data['src'], data['dst'], data['seconds'])
+
+    def save(self, path: str):
+        np.savez_compressed(path, lat=self.lat, lng=self.lng, src=self.src,
+                            dst=self.dst, seconds=self.seconds)
+
+    def nearest_node(self, lat: float, lng: float) -> Tuple[int, float]:
+        """Closest routable node and its distance in meters"""
+        _, i = self._tree.query((lng * self._lat0_cos, lat))
+        node = int(i)
+        return node, _haversine_m(lat, lng, float(self.lat[node]), float(self.lng[node]))
+
+    def nearest_nodes(self, lats: np.ndarray, lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized nearest_node: node indices and snap distances in meters"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        _, idx = self._tree.query(np.column_stack((lngs * self._lat0_cos, lats)))
+        nodes = np.asarray(idx, dtype=np.int64)
+        lat1, lat2 = np.radians(lats), np.radians(self.lat[nodes])
+        a = (np.sin((lat2 - lat1) / 2) ** 2 +
+             np.cos(lat1) * np.cos(lat2) * np.sin(np.radians(self.lng[nodes] - lngs) / 2) ** 2)
+        return nodes, 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+    def travel_times(self, sources: np.ndarray, targets: np.ndarray, chunk: int = 16) -> np.ndarray:
+        """Sources x targets travel-time matrix (seconds) from many-source Dijkstra in C"""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        result = np.empty((len(sources), len(targets)), dtype=np.float64)
+        unique_sources, inverse = np.unique(sources, return_inverse=True)
+        rows = np.empty((len(unique_sources), len(targets)), dtype=np.float64)
+        # Chunking bounds the sources x nodes scratch matrix on large graphs
+        for k in range(0, len(unique_sources), chunk):
+            block = dijkstra(self._csr, indices=unique_sources[k:k + chunk])
+            rows[k:k + chunk] = np.atleast_2d(block)[:, targets]
+        result[:] = rows[inverse]
+        return result
+
+    def _straight_line_bound(self, u: int, v: int) -> float:
+        """Straight-line travel time at the network's top speed"""
+        lat_u, lat_v = self._lat_rad[u], self._lat_rad[v]
+        a = (math.sin((lat_v - lat_u) / 2) ** 2 +
+             self._cos_lat[u] * self._cos_lat[v] * math.sin((self._lng_rad[v] - self._lng_rad[u]) / 2) ** 2)
+        return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a))) / self.max_speed_mps
+
+    def _active_landmarks(self, s: int, t: int, count: int) -> List[Tuple[List[float], List[float]]]:
+        """Landmarks giving the tightest s->t bound; a few of them beat all of them per node"""
+        scored = sorted(
+            zip(self._lm_from, self._lm_to),
+            key=lambda lm: max(lm[0][t] - lm[0][s], lm[1][s] - lm[1][t]),
+            reverse=True
+        )
+        return scored[:count]
+
+    def shortest_path(self, s: int, t: int, active_landmarks: int = 3) -> Optional[Tuple[float, List[int]]]:
+        """Bidirectional ALT (A*, landmarks, triangle inequality) with symmetric average potentials
+
+        Returns (seconds, node path), or None when t is unreachable from s.
+        """
+        if s == t:
+            return 0.0, [s]
+
+        potentials: Dict[int, float] = {}
+        landmarks = [(lm_from, lm_to, lm_from[s], lm_to[s], lm_from[t], lm_to[t])
+                     for lm_from, lm_to in self._active_landmarks(s, t, active_landmarks)]
+
+        def p_f(v: int) -> float:
+            # Forward potential (bound to t minus bound from s) / 2; the backward search uses
+            # its negation, which keeps both searches consistent
+            p = potentials.get(v)
+            if p is None:
+                if landmarks:
+                    to_t = from_s = 0.0
+                    # Triangle inequality: d(u,v) >= d(L,v) - d(L,u) and d(u,v) >= d(u,L) - d(v,L)
+                    for lm_from, lm_to, from_l_s, to_l_s, from_l_t, to_l_t in landmarks:
+                        from_l_v, to_l_v = lm_from[v], lm_to[v]
+                        bound = from_l_t - from_l_v
+                        if bound > to_t:
+                            to_t = bound
+                        bound = to_l_v - to_l_t
+                        if bound > to_t:
+                            to_t = bound
+                        bound = from_l_v - from_l_s
+                        if bound > from_s:
+                            from_s = bound
+                        bound = to_l_s - to_l_v
+                        if bound > from_s:
+                            from_s = bound
+                else:
+                    to_t = self._straight_line_bound(v, t)
+                    from_s = self._straight_line_bound(s, v)
+                p = (to_t - from_s) / 2
+                potentials[v] = p
+            return p
+
+        dist = ({s: 0.0}, {t: 0.0})
+        parent = ({s: -1}, {t: -1})
+        settled = (set(), set())
+        heaps = ([(p_f(s), s)], [(-p_f(t), t)])
+        graphs = (self._fwd, self._bwd)
+        signs = (1.0, -1.0)
+
+        best = math.inf
+        meet = -1
+        while heaps[0] and heaps[1]:
+            # Sum of the two frontier keys bounds every undiscovered s-t path from below
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            _, u = heapq.heappop(heaps[side])
+            if u in settled[side]:
+                continue
+            settled[side].add(u)
+
+            ptr, adj, w = graphs[side]
+            d_side, d_other = dist[side], dist[1 - side]
+            par = parent[side]
+            du = d_side[u]
+            sign = signs[side]
+            for k in range(ptr[u], ptr[u + 1]):
+                v = adj[k]
+                nd = du + w[k]
+                if nd < d_side.get(v, math.inf):
+                    d_side[v] = nd
+                    par[v] = u
+                    heapq.heappush(heaps[side], (nd + sign * p_f(v), v))
+                    if v in d_other and nd + d_other[v] < best:
+                        best = nd + d_other[v]
+                        meet = v
+
+        if meet < 0:
+            return None
+
+        path = []
+        v = meet
+        while v != -1:
+            path.append(v)
+            v = parent[0][v]
+        path.reverse()
+        v = parent[1][meet]
+        while v != -1:
+            path.append(v)
+            v = parent[1][v]
+        return best, path
+
+
+class LocalRoutingEngine:
+    """In-process drop-in for the ORS client, routing over a local RoadGraph"""
+
+    def __init__(self, graph: RoadGraph, max_snap_m: float = 1000.0, simplify_tolerance_m: float = 0.0):
+        self.graph = graph
+        self.max_snap_m = max_snap_m
+        self.simplify_tolerance_m = simplify_tolerance_m
+
+    def route(self, start: Location, end: Location) -> Optional[Route]:
+        s, s_snap = self.graph.nearest_node(start.lat, start.lng)
+        t, t_snap = self.graph.nearest_node(end.lat, end.lng)
+        if s_snap > self.max_snap_m or t_snap > self.max_snap_m:
+            return None
+
+        result = self.graph.shortest_path(s, t)
+        if result is None:
+            return None
+        seconds, nodes = result
+
+        lat, lng = self.graph.lat, self.graph.lng
+        path = [[start.lat, start.lng]]
+        path.extend([float(lat[n]), float(lng[n])] for n in nodes)
+        path.append([end.lat, end.lng])
+        if path[1] == path[0]:
+            del path[1]
+        if path[-2] == path[-1]:
+            del path[-2]
+        return Route.from_path(path, seconds + (s_snap + t_snap) / SNAP_SPEED_MPS, self.simplify_tolerance_m)
+
+    def travel_time_matrix(self, origins: List[Location], destinations: List[Location]) -> np.ndarray:
+        """Origins x destinations ETA matrix in seconds, including the snap legs"""
+        o_nodes, o_snap = self.graph.nearest_nodes([o.lat for o in origins], [o.lng for o in origins])
+        d_nodes, d_snap = self.graph.nearest_nodes([d.lat for d in destinations], [d.lng for d in destinations])
+        seconds = self.graph.travel_times(o_nodes, d_nodes)
+        return seconds + (o_snap[:, None] + d_snap[None, :]) / SNAP_SPEED_MPS
+
+    async def fetch_matrix(self, sources: List[Location], destinations: List[Location]) -> np.ndarray:
+        """Same contract as ORSRoutingClient.fetch_matrix"""
+        return await asyncio.to_thread(self.travel_time_matrix, sources, destinations)
+
+    def eta(self, start: Location, end: Location) -> Optional[float]:
+        route = self.route(start, end)
+        return route.duration if route is not None else None
+
+    async def fetch_route(self, start: Location, end: Location) -> Optional[Route]:
+        """Same contract as ORSRoutingClient.fetch_route; the search runs off the event loop"""
+        return await asyncio.to_thread(self.route, start, end)
+
+
+def load_road_graph(path: str) -> RoadGraph:
+    """Load an OSM extract, reusing a compiled .graph.npz next to it when up to date"""
+    if path.endswith('.npz'):
+        return RoadGraph.load(path)
+
+    compiled = path + '.graph.npz'
+    if os.path.exists(compiled) and os.path.getmtime(compiled) >= os.path.getmtime(path):
+        graph = RoadGraph.load(compiled)
+    else:
+        graph = RoadGraph.from_osm(path)
+        graph.save(compiled)
+    logger.info(f"Road graph ready: {graph.num_nodes} nodes, {graph.num_edges} edges, "
+                f"{len(graph.landmarks)} landmarks")
+    return graph
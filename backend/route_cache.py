@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import h3
+
+from geometry import decode_polyline, encode_polyline
+from models import Location, Route
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+Row = Tuple[str, str, int, str, float, float]  # A route_polylines row
+
+
+class RouteCache:
+    """Two-tier (in-memory LRU + SQLite) route cache keyed by H3 origin/destination cells
+
+    Only lookup() and put() run on the event loop, and they touch memory alone. get() reads the
+    disk tier in a worker thread; put() queues the row and flush() commits the queue as one
+    transaction in a worker thread. The disk tier is used once open() has been called.
+    """
+
+    def __init__(self, db_path: Optional[str], resolution: int = 9,
+                 max_entries: int = 5000, ttl_seconds: float = 7 * 24 * 3600):
+        self.resolution = resolution
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path  # None keeps the cache in memory only
+
+        self._memory: "OrderedDict[CacheKey, Tuple[float, Route]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.batches_written = 0
+        self.rows_written = 0
+
+        self._pending: Dict[CacheKey, Row] = {}  # Put but not yet committed, newest per key
+        self._lock = threading.Lock()  # One connection, used from worker threads
+        self._db: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        """Open the disk tier at db_path and purge expired routes"""
+        if not self.db_path or self._db is not None:
+            return
+        with self._lock:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS route_polylines (
+                       origin TEXT NOT NULL,
+                       destination TEXT NOT NULL,
+                       resolution INTEGER NOT NULL,
+                       polyline TEXT NOT NULL,
+                       duration REAL NOT NULL,
+                       created_at REAL NOT NULL,
+                       PRIMARY KEY (origin, destination, resolution)
+                   )"""
+            )
+            purged = self._db.execute(
+                "DELETE FROM route_polylines WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self._db.commit()
+            stored = self._db.execute(
+                "SELECT COUNT(*) FROM route_polylines WHERE resolution = ?", (self.resolution,)
+            ).fetchone()[0]
+            logger.info(f"Route cache opened at {self.db_path}: {stored} routes stored, {purged} expired purged")
+
+    def key(self, start: Location, end: Location) -> CacheKey:
+        return (h3.latlng_to_cell(start.lat, start.lng, self.resolution),
+                h3.latlng_to_cell(end.lat, end.lng, self.resolution))
+
+    def lookup(self, start: Location, end: Location) -> Optional[Route]:
+        """Memory tier only, for callers that cannot await; a miss is not counted, get() follows"""
+        route = self._memory_get(self.key(start, end), time.time())
+        if route is None:
+            return None
+        self.hits += 1
+        return self._snap(route, start, end)
+
+    async def get(self, start: Location, end: Location) -> Optional[Route]:
+        """Look up a route between the cells of start and end, snapping its endpoints to them"""
+        key = self.key(start, end)
+        now = time.time()
+
+        route = self._memory_get(key, now)
+        if route is not None:
+            self.hits += 1
+            return self._snap(route, start, end)
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._read, key)
+            if row is not None and now - row[2] <= self.ttl_seconds:
+                route = Route(polyline=row[0], duration=row[1])
+                self._remember(key, route, row[2])
+                self.hits += 1
+                self.disk_hits += 1
+                return self._snap(route, start, end)
+
+        self.misses += 1
+        return None
+
+    def put(self, start: Location, end: Location, route: Route):
+        """Remember a route; the disk tier gets it with the next flush()"""
+        key = self.key(start, end)
+        created_at = time.time()
+        self._remember(key, route, created_at)
+        if self._db is not None:
+            self._pending[key] = (key[0], key[1], self.resolution, route.polyline, route.duration, created_at)
+
+    async def flush(self):
+        """Commit the queued routes in one transaction, off the event loop"""
+        if not self._pending or self._db is None:
+            return
+        batch, self._pending = self._pending, {}
+        if not await asyncio.to_thread(self._write, list(batch.values())):
+            # Back on the loop; routes put meanwhile are newer and win
+            self._pending = {**batch, **self._pending}
+
+    def _memory_get(self, key: CacheKey, now: float) -> Optional[Route]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created_at, route = entry
+        if now - created_at > self.ttl_seconds:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return route
+
+    def _read(self, key: CacheKey) -> Optional[Tuple[str, float, float]]:
+        with self._lock:
+            if self._db is None:
+                return None
+            return self._db.execute(
+                "SELECT polyline, duration, created_at FROM route_polylines "
+                "WHERE origin = ? AND destination = ? AND resolution = ?",
+                (key[0], key[1], self.resolution)
+            ).fetchone()
+
+    def _write(self, rows: List[Row]) -> bool:
+        with self._lock:
+            if self._db is None:
+                return False
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO route_polylines VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._db.commit()
+            except sqlite3.Error as e:
+                self._db.rollback()
+                logger.error(f"Route cache write of {len(rows)} routes failed: {e}")
+                return False
+        self.batches_written += 1
+        self.rows_written += len(rows)
+        return True
+
+    def _remember(self, key: CacheKey, route: Route, created_at: float):
+        self._memory[key] = (created_at, route)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _snap(self, route: Route, start: Location, end: Location) -> Route:
+        """Replace the cached endpoints with the exact requested ones"""
+        inner = decode_polyline(route.polyline)[1:-1]
+        return Route(polyline=encode_polyline([[start.lat, start.lng]] + inner + [[end.lat, end.lng]]),
+                     duration=route.duration)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'pending_writes': len(self._pending),
+            'batches_written': self.batches_written,
+            'rows_written': self.rows_written,
+            'resolution': self.resolution
+        }
+
+    def close(self):
+        """Write the queued routes and close the database"""
+        if self._db is None:
+            return
+        if self._pending:
+            self._write(list(self._pending.values()))
+            self._pending = {}
+        with self._lock:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import httpx
+
+from key_scheduler import APIKeyScheduler
+from models import Location, Route
+
+logger = logging.getLogger(__name__)
+
+ORS_DIRECTIONS_URL = "https://api.openrouteservice.org/v2/directions/driving-car/geojson"
+ORS_MATRIX_URL = "https://api.openrouteservice.org/v2/matrix/driving-car"
+
+
+class ORSRoutingClient:
+    """Async OpenRouteService client sharing one pooled keep-alive HTTP connection"""
+
+    def __init__(self, api_keys: List[str], max_concurrency: int = 8,
+                 pool_size: int = 16, timeout: float = 15.0,
+                 max_retries: int = 4, base_delay: float = 2.0,
+                 requests_per_minute: float = 40, max_queue_wait: float = 30.0,
+                 simplify_tolerance_m: float = 0.0):
+        self.api_keys = api_keys
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_queue_wait = max_queue_wait
+        self.simplify_tolerance_m = simplify_tolerance_m
+
+        # ORS rate-limits directions and matrix requests separately per key
+        self.directions_keys = APIKeyScheduler(api_keys, requests_per_minute, name="directions")
+        self.matrix_keys = APIKeyScheduler(api_keys, requests_per_minute, name="matrix")
+
+        # Caps in-flight requests across a whole assignment batch
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the shared client inside the running event loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers={"Content-Type": "application/json"},
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=30.0
+                )
+            )
+        return self._client
+
+    async def fetch_route(self, start: Location, end: Location) -> Optional[Route]:
+        """Request a driving route, returning None once all retries are exhausted"""
+        body = {"coordinates": [[start.lng, start.lat], [end.lng, end.lat]]}
+
+        for attempt in range(self.max_retries):
+            try:
+                used_api_key = await asyncio.wait_for(self.directions_keys.acquire(), self.max_queue_wait)
+            except asyncio.TimeoutError:
+                logger.warning(f"No routing API key freed up within {self.max_queue_wait}s")
+                return None
+
+            try:
+                async with self._semaphore:
+                    response = await self._get_client().post(
+                        ORS_DIRECTIONS_URL,
+                        json=body,
+                        params={"api_key": used_api_key}
+                    )
+                self.directions_keys.report(used_api_key, response.status_code, response.headers)
+
+                if response.status_code == 200:
+                    data = response.json()
+                    if "features" in data and data["features"]:
+                        coords = data["features"][0]["geometry"]["coordinates"]
+                        path = [[lat, lng] for lng, lat in coords]
+                        duration = data["features"][0]["properties"]["summary"]["duration"]
+                        logger.info(f"Route constructed successfully on attempt {attempt + 1}")
+                        return Route.from_path(path, duration, self.simplify_tolerance_m)
+
+                # Rate limited keys are parked by the scheduler; the retry queues for another one
+                if response.status_code == 429:
+                    logger.warning(f"Rate limited, rescheduling retry {attempt + 1}")
+                    continue
+                # Unroutable or rejected requests fail the same way every time; don't spend key tokens on them
+                if 400 <= response.status_code < 500:
+                    logger.warning(f"ORS rejected the route with status {response.status_code}, not retrying")
+                    return None
+                if response.status_code >= 500:
+                    delay = self.base_delay * (2 ** attempt)
+                    logger.warning(f"ORS API attempt {attempt + 1} returned {response.status_code}, "
+                                   f"retrying in {delay}s")
+                    await asyncio.sleep(delay)
+
+            except Exception as e:
+                delay = self.base_delay * (2 ** attempt)
+                logger.warning(f"ORS API attempt {attempt + 1} failed: {e}, retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+        return None
+
+    async def fetch_matrix(self, sources: List[Location],
+                           destinations: List[Location]) -> Optional[List[List[Optional[float]]]]:
+        """Request a sources x destinations duration matrix (seconds) in a single call"""
+        locations = [[loc.lng, loc.lat] for loc in sources + destinations]
+        body = {
+            "locations": locations,
+            "sources": list(range(len(sources))),
+            "destinations": list(range(len(sources), len(locations))),
+            "metrics": ["duration"]
+        }
+        used_api_key = await self.matrix_keys.acquire()
+        try:
+            async with self._semaphore:
+                response = await self._get_client().post(
+                    ORS_MATRIX_URL,
+                    json=body,
+                    headers={"Authorization": used_api_key}
+                )
+            self.matrix_keys.report(used_api_key, response.status_code, response.headers)
+            if response.status_code == 200:
+                return response.json().get("durations")
+            logger.warning(f"ORS matrix request failed with status {response.status_code}")
+        except Exception as e:
+            logger.warning(f"ORS matrix request failed: {e}")
+        return None
+
+    def key_stats(self) -> Dict[str, object]:
+        return {
+            'directions': self.directions_keys.stats(),
+            'matrix': self.matrix_keys.stats()
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
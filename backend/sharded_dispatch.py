@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import h3
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from cost_kernels import haversine_matrix_km, hybrid_cost_matrix
+from sparse_matching import nearest_candidates, solve_sparse_assignment
+
+logger = logging.getLogger(__name__)
+
+_BORDER_RESOLUTION = 9  # ~174m cells used to find entities near a region border
+
+
+def strategy_costs(strategy: str, distances: np.ndarray, order_values: Optional[np.ndarray]) -> np.ndarray:
+    """Pickup distances turned into a dispatch strategy's costs; order_values align with the last axis
+
+    'proximity' uses the distances as is, 'hybrid' expects hybrid demand weights and 'demand'
+    expects per-order demand costs.
+    """
+    if strategy == 'hybrid':
+        return hybrid_cost_matrix(distances, order_values)
+    if strategy == 'demand':
+        return np.broadcast_to(order_values, distances.shape).copy()
+    return distances
+
+
+def solve_region(taxi_lat: np.ndarray, taxi_lng: np.ndarray, order_lat: np.ndarray, order_lng: np.ndarray,
+                 order_values: Optional[np.ndarray], strategy: str, sparse_min_pairs: int,
+                 k: int, max_radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Min-cost matching of one region, run in a worker process; returns local (taxi_idx, order_idx)"""
+    if len(taxi_lat) * len(order_lat) > sparse_min_pairs:
+        order_idx, taxi_idx, distances = nearest_candidates(taxi_lat, taxi_lng, order_lat, order_lng, k, max_radius_km)
+        values = order_values[order_idx] if order_values is not None else None
+        matched_orders, matched_taxis = solve_sparse_assignment(order_idx, taxi_idx,
+                                                                strategy_costs(strategy, distances, values),
+                                                                len(order_lat), len(taxi_lat))
+        return matched_taxis, matched_orders
+
+    costs = strategy_costs(strategy, haversine_matrix_km(taxi_lat, taxi_lng, order_lat, order_lng), order_values)
+    return linear_sum_assignment(costs)
+
+
+@lru_cache(maxsize=65536)
+def _cell_region(cell: str, parent_resolution: int, border_rings: int) -> Tuple[str, bool]:
+    """(parent region, whether a cell within border_rings belongs to another region)"""
+    parent = h3.cell_to_parent(cell, parent_resolution)
+    border = any(h3.cell_to_parent(c, parent_resolution) != parent for c in h3.grid_disk(cell, border_rings))
+    return parent, border
+
+
+class ShardedDispatcher:
+    """Splits a dispatch round into H3 parent regions solved in parallel worker processes
+
+    Taxis and orders are sharded by the H3 parent cell at parent_resolution of their location.
+    Each region with both taxis and orders is matched independently in the pool, large regions
+    through k-nearest sparse matching. Regions are blind to each other, so a reconciliation
+    pass re-matches in one solve every pair with an end within border_km of another region,
+    together with all unmatched taxis and orders, letting them pair across borders.
+    """
+
+    def __init__(self, parent_resolution: int, workers: Optional[int] = None, border_km: float = 0.5,
+                 sparse_min_pairs: int = 250_000, k: int = 8, max_radius_km: float = 5.0):
+        self.parent_resolution = parent_resolution
+        self.workers = workers
+        # The border band is measured on a grid fine enough to resolve it
+        self.border_resolution = max(parent_resolution + 1, _BORDER_RESOLUTION)
+        spacing_km = math.sqrt(3) * h3.average_hexagon_edge_length(self.border_resolution, unit='km')
+        self.border_rings = max(1, math.ceil(border_km / spacing_km))
+        self.sparse_min_pairs = sparse_min_pairs
+        self.k = k
+        self.max_radius_km = max_radius_km
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        self.rounds = 0
+        self.last_regions = 0
+        self.last_residual = (0, 0)  # (taxis, orders) in the reconciliation pass
+        self.last_region_time = 0.0
+        self.last_reconcile_time = 0.0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers do not inherit the server's event loop, sockets or SQLite handles
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _regions(self, lat: np.ndarray, lng: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        regions, border = [], np.zeros(len(lat), dtype=bool)
+        for i, (a, b) in enumerate(zip(lat.tolist(), lng.tolist())):
+            region, border[i] = _cell_region(h3.latlng_to_cell(a, b, self.border_resolution),
+                                             self.parent_resolution, self.border_rings)
+            regions.append(region)
+        return regions, border
+
+    async def _solve(self, taxi_idx: np.ndarray, order_idx: np.ndarray, taxi_lat, taxi_lng, order_lat, order_lng,
+                     order_values, strategy: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Solve the sub-problem over the given global indices in the pool; returns global indices"""
+        loop = asyncio.get_running_loop()
+        values = order_values[order_idx] if order_values is not None else None
+        rows, cols = await loop.run_in_executor(
+            self._executor(), solve_region, taxi_lat[taxi_idx], taxi_lng[taxi_idx], order_lat[order_idx],
+            order_lng[order_idx], values, strategy, self.sparse_min_pairs, self.k, self.max_radius_km)
+        return taxi_idx[rows], order_idx[cols]
+
+    async def match(self, taxi_lat: Sequence[float], taxi_lng: Sequence[float], order_lat: Sequence[float],
+                    order_lng: Sequence[float], order_values: Optional[np.ndarray] = None,
+                    strategy: str = 'proximity') -> Tuple[np.ndarray, np.ndarray]:
+        """Matched (taxi_idx, order_idx) over the whole city"""
+        taxi_lat, taxi_lng = np.asarray(taxi_lat, dtype=np.float64), np.asarray(taxi_lng, dtype=np.float64)
+        order_lat, order_lng = np.asarray(order_lat, dtype=np.float64), np.asarray(order_lng, dtype=np.float64)
+        args = (taxi_lat, taxi_lng, order_lat, order_lng, order_values, strategy)
+
+        start = time.perf_counter()
+        taxi_regions, taxi_border = self._regions(taxi_lat, taxi_lng)
+        order_regions, order_border = self._regions(order_lat, order_lng)
+        taxis_by_region: Dict[str, List[int]] = defaultdict(list)
+        orders_by_region: Dict[str, List[int]] = defaultdict(list)
+        for i, region in enumerate(taxi_regions):
+            taxis_by_region[region].append(i)
+        for j, region in enumerate(order_regions):
+            orders_by_region[region].append(j)
+
+        shared = [r for r in orders_by_region if r in taxis_by_region]
+        results = await asyncio.gather(*(
+            self._solve(np.array(taxis_by_region[r]), np.array(orders_by_region[r]), *args) for r in shared))
+        rows = np.concatenate([np.zeros(0, dtype=np.int64)] + [r for r, _ in results]).astype(np.int64)
+        cols = np.concatenate([np.zeros(0, dtype=np.int64)] + [c for _, c in results]).astype(np.int64)
+        region_time = time.perf_counter() - start
+
+        # Reconciliation: pairs touching a border are reopened alongside everything left unmatched
+        start = time.perf_counter()
+        settled = ~(taxi_border[rows] | order_border[cols])
+        taxi_open = np.ones(len(taxi_lat), dtype=bool)
+        order_open = np.ones(len(order_lat), dtype=bool)
+        taxi_open[rows[settled]] = False
+        order_open[cols[settled]] = False
+        residual_taxis, residual_orders = np.nonzero(taxi_open)[0], np.nonzero(order_open)[0]
+        rows, cols = rows[settled], cols[settled]
+        if len(residual_taxis) and len(residual_orders):
+            extra_rows, extra_cols = await self._solve(residual_taxis, residual_orders, *args)
+            rows, cols = np.concatenate((rows, extra_rows)), np.concatenate((cols, extra_cols))
+
+        self.rounds += 1
+        self.last_regions = len(shared)
+        self.last_residual = (len(residual_taxis), len(residual_orders))
+        self.last_region_time = region_time
+        self.last_reconcile_time = time.perf_counter() - start
+        logger.info(f"Sharded dispatch: {len(shared)} regions in {region_time * 1000:.0f} ms, reconciled "
+                    f"{len(residual_taxis)} taxis x {len(residual_orders)} orders in "
+                    f"{self.last_reconcile_time * 1000:.0f} ms, {len(rows)} matched")
+        return rows, cols
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'rounds': self.rounds,
+            'regions': self.last_regions,
+            'residual_taxis': self.last_residual[0],
+            'residual_orders': self.last_residual[1],
+            'region_ms': self.last_region_time * 1000,
+            'reconcile_ms': self.last_reconcile_time * 1000
+        }
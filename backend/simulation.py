@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+import logging
+import math
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cost_kernels import haversine_km
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = {
+    'hybrid': (True, True),
+    'proximity': (True, False),
+    'demand': (False, True)
+}
+
+
+class VirtualClock:
+    """Simulated seconds, advanced only by the simulation's event loop"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _distribution(values: List[float], scale: float = 1.0) -> Dict[str, float]:
+    if not values:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+    data = np.asarray(values) * scale
+    p50, p90, p99 = np.percentile(data, [50, 90, 99])
+    return {'count': len(values), 'mean': float(data.mean()), 'p50': float(p50), 'p90': float(p90),
+            'p99': float(p99), 'max': float(data.max())}
+
+
+class HeadlessSimulation:
+    """Discrete-event run of a TaxiDispatchSystem on a virtual clock, as fast as the CPU allows
+
+    Orders arrive as a seeded Poisson process and the dispatch scheduler is consulted on
+    every event instead of sleeping. A taxi reaches its pickup and drop-off after the
+    great-circle distance at speed_kmh, when the assignment is completed the way the frontend
+    does at the end of its animation. Given the same seed and system configuration a run
+    replays exactly. Tick latencies are wall-clock time spent in dispatch rounds and demand
+    updates.
+    """
+
+    def __init__(self, system_factory: Callable[[VirtualClock, random.Random], Any], seed: int = 0,
+                 order_interval: float = 3.0, speed_kmh: float = 30.0, demand_interval: float = 2.0,
+                 strategy: str = 'hybrid'):
+        self.clock = VirtualClock()
+        self.rng = random.Random(seed)
+        self.system = system_factory(self.clock, self.rng)
+        self.system.update_algorithm_config(*STRATEGIES[strategy])
+        self.seed = seed
+        self.strategy = strategy
+        self.order_interval = order_interval
+        self.speed_kmh = speed_kmh
+        self.demand_interval = demand_interval
+
+        self._events: List[Tuple[float, int, str, Optional[str]]] = []  # (time, tie-break, kind, order id)
+        self._counter = 0
+        self._arrivals: Dict[str, float] = {}  # Order id -> arrival time, until picked up
+        self._in_flight: set = set()  # Order ids with a scheduled drop-off
+        self._check_at: Optional[float] = None  # Pending scheduler timer
+        self._end = 0.0
+
+        self.orders_created = 0
+        self.orders_rejected = 0
+        self.orders_completed = 0
+        self.pickup_waits: List[float] = []  # Arrival to taxi at the pickup (simulated seconds)
+        self.dispatch_waits: List[float] = []  # Arrival to assignment
+        self.round_latencies: List[float] = []  # Wall seconds per dispatch round
+        self.demand_latencies: List[float] = []  # Wall seconds per demand update
+        self.busy_seconds = 0.0  # Taxi time spent on trips within the run
+
+    def _schedule(self, at: float, kind: str, order_id: Optional[str] = None):
+        self._counter += 1
+        heapq.heappush(self._events, (at, self._counter, kind, order_id))
+
+    def _travel_seconds(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+        return float(haversine_km(lat1, lng1, lat2, lng2)) / self.speed_kmh * 3600.0
+
+    def _create_order(self, now: float):
+        order = self.system.create_order()
+        if order is None:
+            self.orders_rejected += 1
+        else:
+            self.orders_created += 1
+            self._arrivals[order.id] = now
+        self._schedule(now + self.rng.expovariate(1.0 / self.order_interval), 'order')
+
+    def _start_trips(self, now: float):
+        """Schedule pickup and drop-off of the assignments made by the last round"""
+        for order_id, assignment in self.system.assignments.items():
+            if order_id in self._in_flight:
+                continue
+            self._in_flight.add(order_id)
+            taxi = self.system.taxis[assignment.taxi_id]
+            order = self.system.orders[order_id]
+            to_pickup = self._travel_seconds(taxi.location.lat, taxi.location.lng, order.pickup.lat, order.pickup.lng)
+            to_dropoff = self._travel_seconds(order.pickup.lat, order.pickup.lng, order.dropoff.lat, order.dropoff.lng)
+            arrival = self._arrivals.pop(order_id, now)
+            self.dispatch_waits.append(now - arrival)
+            self.pickup_waits.append(now + to_pickup - arrival)
+            self.busy_seconds += min(now + to_pickup + to_dropoff, self._end) - now
+            self._schedule(now + to_pickup + to_dropoff, 'dropoff', order_id)
+        # Headless runs never materialize real routes
+        while not self.system.route_queue.empty():
+            self.system.route_queue.get_nowait()
+            self.system.route_queue.task_done()
+
+    async def _poll_scheduler(self, now: float):
+        """What DispatchScheduler.run() would do at now"""
+        scheduler = self.system.scheduler
+        trigger, delay = scheduler.decide(now)
+        if trigger is None:
+            if delay is not None:
+                # The deadline can round to now on the float clock; always move forward
+                self._set_check(max(now + delay, math.nextafter(now, math.inf)))
+            return
+        start = time.perf_counter()
+        assigned = await scheduler.dispatch(trigger, now)
+        self.round_latencies.append(time.perf_counter() - start)
+        self._start_trips(now)
+        # A round that assigned nothing backs off for max_window, as the live loop does
+        self._set_check(now + (scheduler.max_window if assigned == 0 else 0.0))
+
+    def _set_check(self, at: float):
+        if self._check_at is None or at < self._check_at:
+            self._check_at = at
+            self._schedule(at, 'check')
+
+    async def run(self, duration: float) -> Dict[str, Any]:
+        """Simulate duration seconds and return the run report"""
+        wall_start = time.perf_counter()
+        self._schedule(self.clock.now, 'order')
+        self._schedule(self.clock.now + self.demand_interval, 'demand')
+        end = self._end = self.clock.now + duration
+
+        while self._events and self._events[0][0] <= end:
+            at, _, kind, order_id = heapq.heappop(self._events)
+            self.clock.now = at
+            if kind == 'order':
+                self._create_order(at)
+            elif kind == 'dropoff':
+                self._in_flight.discard(order_id)
+                self.system.complete_assignment(order_id)
+                self.orders_completed += 1
+            elif kind == 'demand':
+                start = time.perf_counter()
+                self.system.update_demand_hexagons()
+                self.demand_latencies.append(time.perf_counter() - start)
+                self._schedule(at + self.demand_interval, 'demand')
+                continue
+            elif kind == 'check':
+                if self._check_at != at:
+                    continue  # Superseded by an earlier check
+                self._check_at = None
+            await self._poll_scheduler(at)
+
+        self.clock.now = end
+        wall_seconds = time.perf_counter() - wall_start
+        logger.info(f"Simulated {duration / 3600:.1f}h of {self.strategy} dispatch in {wall_seconds:.1f}s: "
+                    f"{self.orders_created} orders, {len(self.dispatch_waits)} assigned")
+        return self.report(duration, wall_seconds)
+
+    def report(self, duration: float, wall_seconds: float) -> Dict[str, Any]:
+        assigned = len(self.dispatch_waits)
+        return {
+            'strategy': self.strategy,
+            'seed': self.seed,
+            'simulated_hours': duration / 3600.0,
+            'wall_seconds': wall_seconds,
+            'speedup': duration / wall_seconds if wall_seconds else 0.0,
+            'orders_created': self.orders_created,
+            'orders_rejected': self.orders_rejected,
+            'orders_assigned': assigned,
+            'orders_completed': self.orders_completed,
+            'orders_per_second': assigned / wall_seconds if wall_seconds else 0.0,
+            'fleet_utilization': self.busy_seconds / (duration * len(self.system.taxis)),
+            'pickup_wait_s': _distribution(self.pickup_waits),
+            'dispatch_wait_s': _distribution(self.dispatch_waits),
+            'dispatch_round_ms': _distribution(self.round_latencies, 1000.0),
+            'demand_tick_ms': _distribution(self.demand_latencies, 1000.0),
+            'scheduler': {key: value for key, value in self.system.scheduler.stats().items()
+                          if key in ('rounds', 'triggers', 'avg_batch_size', 'sla_misses', 'dispatched')}
+        }
+
+
+def run_simulation(system_factory: Callable[[VirtualClock, random.Random], Any], duration: float,
+                   **kwargs) -> Dict[str, Any]:
+    return asyncio.run(HeadlessSimulation(system_factory, **kwargs).run(duration))
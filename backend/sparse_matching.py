@@ -0,0 +1,62 @@
+from typing import Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+from scipy.spatial import cKDTree
+
+from cost_kernels import EARTH_RADIUS_KM, haversine_km
+
+KM_PER_DEGREE = np.pi / 180 * EARTH_RADIUS_KM
+
+
+def nearest_candidates(taxi_lat: np.ndarray, taxi_lng: np.ndarray,
+                       order_lat: np.ndarray, order_lng: np.ndarray,
+                       k: int = 8, max_radius_km: float = 5.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Up to k nearest taxis per order within max_radius_km as (order_idx, taxi_idx, distance_km) edges"""
+    taxi_lat, taxi_lng = np.asarray(taxi_lat, dtype=np.float64), np.asarray(taxi_lng, dtype=np.float64)
+    order_lat, order_lng = np.asarray(order_lat, dtype=np.float64), np.asarray(order_lng, dtype=np.float64)
+    k = min(k, len(taxi_lat))
+    if k == 0 or len(order_lat) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+
+    # Local equirectangular projection in km; only used to pick candidates, costs use haversine
+    cos_lat0 = np.cos(np.radians(np.concatenate((taxi_lat, order_lat)).mean()))
+    tree = cKDTree(np.column_stack((taxi_lng * cos_lat0, taxi_lat)) * KM_PER_DEGREE)
+    _, neighbors = tree.query(np.column_stack((order_lng * cos_lat0, order_lat)) * KM_PER_DEGREE,
+                              k=k, distance_upper_bound=max_radius_km)
+    neighbors = neighbors.reshape(len(order_lat), k)
+
+    found = neighbors < len(taxi_lat)  # missing neighbors are reported as index n
+    order_idx = np.nonzero(found)[0]
+    taxi_idx = neighbors[found]
+    distances = haversine_km(taxi_lat[taxi_idx], taxi_lng[taxi_idx], order_lat[order_idx], order_lng[order_idx])
+    return order_idx, taxi_idx, distances
+
+
+def solve_sparse_assignment(order_idx: np.ndarray, taxi_idx: np.ndarray, costs: np.ndarray,
+                            num_orders: int, num_taxis: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Minimum-cost matching over candidate edges, maximizing the number of matched orders first
+
+    Every order also gets a private "stay pending" edge whose cost exceeds any full set of
+    real edges, so a full matching always exists and orders without candidates are simply
+    left out. Returns matched (order_idx, taxi_idx) arrays.
+    """
+    if len(costs) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    # LAPJVsp treats zero weights as missing edges; shifting every edge by the same
+    # amount keeps the optimum because each order takes exactly one edge
+    weights = costs - min(float(costs.min()), 0.0) + 1.0
+    stay_pending = float(weights.max()) * num_orders + 1.0
+
+    rows = np.concatenate((order_idx, np.arange(num_orders)))
+    cols = np.concatenate((taxi_idx, num_taxis + np.arange(num_orders)))
+    data = np.concatenate((weights, np.full(num_orders, stay_pending)))
+    graph = csr_matrix((data, (rows, cols)), shape=(num_orders, num_taxis + num_orders))
+
+    matched_orders, matched_cols = min_weight_full_bipartite_matching(graph)
+    real = matched_cols < num_taxis
+    return matched_orders[real], matched_cols[real]
@@ -0,0 +1,137 @@
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from models import Assignment, Order, Taxi
+
+try:
+    import orjson
+except ImportError:  # Standard library fallback, same output
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Clients asking for MessagePack get JSON
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('json', 'msgpack')
+
+
+def dumps_json(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def negotiate_format(requested: str) -> str:
+    """Wire format for a client asking for requested, JSON when it is unknown or unavailable"""
+    if requested == 'msgpack' and msgpack is None:
+        logger.warning("Client asked for msgpack but it is not installed, using JSON")
+        return 'json'
+    return requested if requested in FORMATS else 'json'
+
+
+def taxi_dict(taxi: Taxi) -> dict:
+    return {'id': taxi.id, 'location': {'lat': taxi.location.lat, 'lng': taxi.location.lng},
+            'status': taxi.status.value}
+
+
+def order_dict(order: Order) -> dict:
+    return {'id': order.id, 'pickup': {'lat': order.pickup.lat, 'lng': order.pickup.lng},
+            'dropoff': {'lat': order.dropoff.lat, 'lng': order.dropoff.lng}, 'status': order.status.value}
+
+
+def assignment_dict(assignment: Assignment) -> dict:
+    return {
+        'taxi_id': assignment.taxi_id,
+        'order_id': assignment.order_id,
+        'to_pickup_route': {'polyline': assignment.to_pickup_route.polyline,
+                            'duration': assignment.to_pickup_route.duration},
+        'to_dropoff_route': {'polyline': assignment.to_dropoff_route.polyline,
+                             'duration': assignment.to_dropoff_route.duration},
+        'algorithm_used': assignment.algorithm_used,
+        'routes_ready': assignment.routes_ready
+    }
+
+
+class StateEncoder:
+    """Builds state_update frames from per-entity encoded fragments
+
+    Each taxi, order and assignment is encoded once per wire format and reused until its
+    change token differs: the entity store version for taxis and orders, the assignment
+    object and its routes_ready flag for assignments (routes are only replaced together
+    with that flag). A frame is the cached fragments joined inside a fixed envelope, so a
+    broadcast re-encodes only what changed instead of every route. A broadcast may build
+    several frames (one per format or viewport); fragments not used by a whole broadcast
+    are dropped at the start of the next one.
+    """
+
+    def __init__(self):
+        # (format, kind) -> id -> (token, bytes), for this broadcast and the previous one
+        self._fragments: Dict[Tuple[str, str], Dict[str, Tuple[Any, bytes]]] = {}
+        self._previous: Dict[Tuple[str, str], Dict[str, Tuple[Any, bytes]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.frames = 0
+        self.bytes_encoded = 0
+
+    def _encode(self, fmt: str, obj: dict) -> bytes:
+        data = msgpack.packb(obj) if fmt == 'msgpack' else dumps_json(obj)
+        self.bytes_encoded += len(data)
+        return data
+
+    def begin_broadcast(self):
+        self._previous, self._fragments = self._fragments, {}
+
+    def _section(self, fmt: str, kind: str, entities: Iterable[Tuple[str, Any, Any]],
+                 to_dict: Callable[[Any], dict]) -> List[bytes]:
+        """Fragments of (id, token, entity) in order"""
+        current = self._fragments.setdefault((fmt, kind), {})
+        previous = self._previous.get((fmt, kind), {})
+        fragments = []
+        for entity_id, token, entity in entities:
+            hit = current.get(entity_id) or previous.get(entity_id)
+            if hit is not None and hit[0] == token:
+                self.hits += 1
+            else:
+                hit = (token, self._encode(fmt, to_dict(entity)))
+                self.misses += 1
+            current[entity_id] = hit
+            fragments.append(hit[1])
+        return fragments
+
+    def state_update(self, fmt: str, taxis: Iterable[Tuple[Taxi, int]], orders: Iterable[Tuple[Order, int]],
+                     assignments: Iterable[Assignment]) -> bytes:
+        """Encode {"type": "state_update", "taxis": [...], "orders": [...], "assignments": [...]}"""
+        sections = (
+            ('taxis', self._section(fmt, 'taxis', ((t.id, v, t) for t, v in taxis), taxi_dict)),
+            ('orders', self._section(fmt, 'orders', ((o.id, v, o) for o, v in orders), order_dict)),
+            ('assignments', self._section(fmt, 'assignments',
+                                          ((a.order_id, (a, a.routes_ready), a) for a in assignments),
+                                          assignment_dict))
+        )
+        self.frames += 1
+        if fmt == 'msgpack':
+            packer = msgpack.Packer()
+            parts = [packer.pack_map_header(4), packer.pack('type'), packer.pack('state_update')]
+            for name, fragments in sections:
+                parts += [packer.pack(name), packer.pack_array_header(len(fragments))]
+                parts += fragments
+            return b''.join(parts)
+        return b''.join([b'{"type":"state_update"'] +
+                        [b',"%s":[%s]' % (name.encode(), b','.join(fragments)) for name, fragments in sections] +
+                        [b'}'])
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'frames': self.frames,
+            'fragment_hits': self.hits,
+            'fragment_misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes_encoded': self.bytes_encoded,
+            'json_library': 'orjson' if orjson is not None else 'json',
+            'msgpack': msgpack is not None
+        }
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import h3
+import numpy as np
+
+from cost_kernels import haversine_matrix_km
+from models import Location
+
+logger = logging.getLogger(__name__)
+
+
+class TravelTimeMatrixProvider:
+    """Origins x destinations ETA matrix from one batched routing call, cached per H3 cell pair
+
+    The router is anything with an async fetch_matrix(sources, destinations) returning a
+    seconds matrix (ORSRoutingClient or LocalRoutingEngine). Cell pairs that are not cached
+    are requested in a single call between cell centers; when that call would exceed
+    max_elements, takes longer than time_budget or fails, the missing entries fall back to
+    straight-line distance at fallback_speed_kmh.
+    """
+
+    def __init__(self, router, resolution: int = 9, ttl_seconds: float = 15 * 60,
+                 max_entries: int = 200_000, max_elements: int = 3500,
+                 time_budget: float = 3.0, fallback_speed_kmh: float = 25.0):
+        self.router = router
+        self.resolution = resolution
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_elements = max_elements
+        self.time_budget = time_budget
+        self.fallback_speed_kmh = fallback_speed_kmh
+
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.batched_calls = 0
+        self.fallbacks = 0
+
+    def straight_line_seconds(self, o_lat: np.ndarray, o_lng: np.ndarray,
+                              d_lat: np.ndarray, d_lng: np.ndarray) -> np.ndarray:
+        return haversine_matrix_km(o_lat, o_lng, d_lat, d_lng) / self.fallback_speed_kmh * 3600
+
+    async def matrix(self, o_lat: np.ndarray, o_lng: np.ndarray, d_lat: np.ndarray, d_lng: np.ndarray) -> np.ndarray:
+        """ETA matrix in seconds with one row per origin and one column per destination"""
+        fallback = self.straight_line_seconds(o_lat, o_lng, d_lat, d_lng)
+        if self.router is None or not len(o_lat) or not len(d_lat):
+            return fallback
+
+        # Work on unique cells so the cost scales with the grid, not with entity counts
+        o_cells = [h3.latlng_to_cell(lat, lng, self.resolution) for lat, lng in zip(o_lat, o_lng)]
+        d_cells = [h3.latlng_to_cell(lat, lng, self.resolution) for lat, lng in zip(d_lat, d_lng)]
+        o_unique, o_inverse = np.unique(o_cells, return_inverse=True)
+        d_unique, d_inverse = np.unique(d_cells, return_inverse=True)
+        cell_matrix = np.full((len(o_unique), len(d_unique)), np.nan)
+
+        now = time.time()
+        missing_rows: Dict[int, None] = {}
+        missing_cols: Dict[int, None] = {}
+        for i, oc in enumerate(o_unique):
+            for j, dc in enumerate(d_unique):
+                if oc == dc:
+                    continue  # Center-to-center is meaningless inside one cell; straight line is better
+                entry = self._cache.get((oc, dc))
+                if entry is not None and now - entry[1] <= self.ttl_seconds:
+                    self._cache.move_to_end((oc, dc))
+                    cell_matrix[i, j] = entry[0]
+                    self.hits += 1
+                else:
+                    missing_rows[i] = None
+                    missing_cols[j] = None
+                    self.misses += 1
+
+        if missing_rows:
+            await self._fill_missing(cell_matrix, o_unique, d_unique, list(missing_rows), list(missing_cols))
+
+        result = cell_matrix[o_inverse][:, d_inverse]
+        unresolved = np.isnan(result)
+        result[unresolved] = fallback[unresolved]
+        return result
+
+    async def _fill_missing(self, cell_matrix: np.ndarray, o_unique: np.ndarray, d_unique: np.ndarray,
+                            rows: List[int], cols: List[int]):
+        if len(rows) * len(cols) > self.max_elements:
+            self.fallbacks += 1
+            logger.warning(f"Travel-time matrix {len(rows)}x{len(cols)} exceeds budget of "
+                           f"{self.max_elements} elements, using straight-line ETAs")
+            return
+
+        sources = [Location(*h3.cell_to_latlng(o_unique[i])) for i in rows]
+        targets = [Location(*h3.cell_to_latlng(d_unique[j])) for j in cols]
+        try:
+            durations = await asyncio.wait_for(self.router.fetch_matrix(sources, targets),
+                                               timeout=self.time_budget)
+        except asyncio.TimeoutError:
+            durations = None
+            logger.warning(f"Travel-time matrix exceeded {self.time_budget}s budget, using straight-line ETAs")
+        if durations is None:
+            self.fallbacks += 1
+            return
+
+        self.batched_calls += 1
+        block = np.array(durations, dtype=np.float64).reshape(len(rows), len(cols))
+        block[~np.isfinite(block)] = np.nan
+        now = time.time()
+        for a, i in enumerate(rows):
+            for b, j in enumerate(cols):
+                seconds = block[a, b]
+                if np.isnan(seconds) or o_unique[i] == d_unique[j]:
+                    continue
+                cell_matrix[i, j] = seconds
+                self._cache[(o_unique[i], d_unique[j])] = (float(seconds), now)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'batched_calls': self.batched_calls,
+            'fallbacks': self.fallbacks,
+            'entries': len(self._cache)
+        }
@@ -0,0 +1,59 @@
+import math
+from typing import FrozenSet, Iterable, Optional
+
+import h3
+
+from demand_index import BoundingBox
+
+
+class Viewport:
+    """The H3 cells (at the demand grid resolution) covering what one client's map shows
+
+    Taxis, orders and demand hexagons are matched to a viewport by cell, using the cells the
+    entity stores already keep, so filtering costs set lookups instead of geometry tests.
+    Viewports over max_cells cells are not built (None): such clients get the full stream.
+    """
+
+    def __init__(self, cell_ids: FrozenSet[str]):
+        self.cell_ids = cell_ids
+        self.cells: FrozenSet[int] = frozenset(h3.str_to_int(cell) for cell in cell_ids)
+
+    def __contains__(self, cell_id: str) -> bool:
+        return cell_id in self.cell_ids
+
+    def __len__(self) -> int:
+        return len(self.cell_ids)
+
+    @classmethod
+    def from_bbox(cls, bbox: BoundingBox, resolution: int, max_cells: int) -> Optional['Viewport']:
+        """Every cell overlapping the rectangle, None if that would be more than max_cells"""
+        lat_min, lng_min, lat_max, lng_max = bbox
+        if not (-90 <= lat_min < lat_max <= 90 and -180 <= lng_min < lng_max <= 180):
+            raise ValueError(f"invalid bbox {bbox}")
+        km_lat = (lat_max - lat_min) * 111.32
+        km_lng = (lng_max - lng_min) * 111.32 * math.cos(math.radians((lat_min + lat_max) / 2))
+        if km_lat * km_lng > max_cells * h3.average_hexagon_area(resolution, 'km^2'):
+            return None
+        polygon = h3.LatLngPoly([(lat_min, lng_min), (lat_min, lng_max), (lat_max, lng_max), (lat_max, lng_min)])
+        cells = h3.polygon_to_cells_experimental(polygon, resolution, contain='overlap')
+        return cls(frozenset(cells)) if len(cells) <= max_cells else None
+
+    @classmethod
+    def from_cells(cls, cells: Iterable[str], resolution: int, max_cells: int) -> Optional['Viewport']:
+        """Cells at any resolution: coarser ones expand to their children, finer ones map to their parent"""
+        cell_ids = set()
+        for cell in cells:
+            if not h3.is_valid_cell(cell):
+                raise ValueError(f"invalid H3 cell {cell!r}")
+            cell_resolution = h3.get_resolution(cell)
+            if cell_resolution > resolution:
+                cell_ids.add(h3.cell_to_parent(cell, resolution))
+            elif cell_resolution == resolution:
+                cell_ids.add(cell)
+            elif len(cell_ids) + h3.cell_to_children_size(cell, resolution) > max_cells:
+                return None
+            else:
+                cell_ids.update(h3.cell_to_children(cell, resolution))
+            if len(cell_ids) > max_cells:
+                return None
+        return cls(frozenset(cell_ids))
@@ -1,7 +1,8 @@
-import React, { useEffect, useState, useCallback, useMemo } from 'react';
+import React, { useEffect, useState, useCallback, useMemo, useRef } from 'react';
 import { MapContainer, TileLayer, Marker, useMap, Polygon, Tooltip } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
+import { decodePolyline, densifyPath } from '../utils/polyline';
 
 const ASTANA_CENTER: [number, number] = [51.111339, 71.415581];
 const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8000/ws';
@@ -56,12 +57,18 @@ interface Order {
   status: 'pending' | 'assigned' | 'completed';
 }
 
+interface RouteGeometry {
+  polyline: string; // Google encoded polyline of [lat, lng] points
+  duration: number;
+}
+
 interface Assignment {
   order_id: string;
   taxi_id: string;
   algorithm_used: string;
-  to_pickup_route: { path: [number, number][] };
-  to_dropoff_route: { path: [number, number][] };
+  to_pickup_route: RouteGeometry;
+  to_dropoff_route: RouteGeometry;
+  routes_ready?: boolean; // false while the backend is still routing (straight-line placeholders)
 }
 
 interface DemandHexagon {
@@ -72,6 +79,8 @@ interface DemandHexagon {
   orders_count: number;
   taxis_count: number;
   demand_ratio: number;
+  arrivals_per_min?: number[]; // Rolling rates per window (1, 5, 15 min)
+  mean_wait_s?: number[];
 }
 
 interface SimulationData {
@@ -177,8 +186,8 @@ const TaxiAnimation = React.memo<{ assignment: Assignment; onComplete: (orderId:
   };
   
   useEffect(() => {
-    // Only start animation once per assignment
-    if (hasStarted || !assignment?.to_pickup_route?.path || !assignment?.to_dropoff_route?.path) return;
+    // Only start animation once per assignment, after its real routes have arrived
+    if (hasStarted || assignment?.routes_ready === false || !assignment?.to_pickup_route?.polyline || !assignment?.to_dropoff_route?.polyline) return;
     
     setHasStarted(true);
     let taxiMarker: L.Marker | null = null;
@@ -193,13 +202,12 @@ const TaxiAnimation = React.memo<{ assignment: Assignment; onComplete: (orderId:
       if (currentPolyline && map.hasLayer(currentPolyline)) map.removeLayer(currentPolyline);
     };
     
-    const animateRoute = (route: { path: [number, number][] }, color: string, onRouteComplete?: () => void) => {
-      if (isDestroyed || !route?.path?.length) {
+    const animateRoute = (points: [number, number][], color: string, onRouteComplete?: () => void) => {
+      if (isDestroyed || !points.length) {
         onRouteComplete?.();
         return;
       }
       
-      const points = route.path;
       // Get dash pattern based on algorithm (only pickup route varies)
       const getDashPattern = (_algorithmUsed: string, routeType: string) => {
         if (routeType === 'dropoff') {
@@ -245,8 +253,12 @@ const TaxiAnimation = React.memo<{ assignment: Assignment; onComplete: (orderId:
       animateStep();
     };
     
+    // Routes arrive simplified and encoded; densify so the taxi moves in even steps
+    const pickupPath = densifyPath(decodePolyline(assignment.to_pickup_route.polyline));
+    const dropoffPath = densifyPath(decodePolyline(assignment.to_dropoff_route.polyline));
+
     // Initialize taxi marker
-    const startPos = assignment.to_pickup_route.path[0];
+    const startPos = pickupPath[0];
     taxiMarker = L.marker([startPos[0], startPos[1]], { 
       icon: ICONS.busyTaxi,
       zIndexOffset: 1000
@@ -256,9 +268,9 @@ const TaxiAnimation = React.memo<{ assignment: Assignment; onComplete: (orderId:
     const colors = getRouteColors(assignment.algorithm_used);
     
     // Start animation sequence
-    animateRoute(assignment.to_pickup_route, colors.pickup, () => {
+    animateRoute(pickupPath, colors.pickup, () => {
       if (isDestroyed) return;
-      animateRoute(assignment.to_dropoff_route, colors.dropoff, () => {
+      animateRoute(dropoffPath, colors.dropoff, () => {
         if (isDestroyed) return;
         onComplete?.(assignment.order_id);
         
@@ -275,7 +287,7 @@ const TaxiAnimation = React.memo<{ assignment: Assignment; onComplete: (orderId:
     });
     
     return cleanup;
-  }, [assignment?.order_id, map]); // Only depend on order_id, not the entire assignment object
+  }, [assignment?.order_id, assignment?.routes_ready, map]); // Only depend on order_id and route readiness, not the entire assignment object
   
   return null;
 });
@@ -287,6 +299,12 @@ const useWebSocket = (url: string, onDemandUpdate: (hexagons: DemandHexagon[]) =
     assignments: []
   });
   const [isConnected, setIsConnected] = useState(false);
+  // Demand hexagons by id; geometry arrives once in demand_snapshot, later updates are deltas
+  const hexagonsRef = useRef(new Map<string, DemandHexagon>());
+  const demandSeqRef = useRef<number | null>(null);
+  // Routes delivered by route_ready, kept until a state_update carries them itself: a state_update
+  // built before the routes were ready must not put the straight-line placeholders back
+  const readyRoutesRef = useRef(new Map<string, Pick<Assignment, 'to_pickup_route' | 'to_dropoff_route'>>());
   
   const sendMessage = useCallback((message: any) => {
     if ((window as any).wsRef?.readyState === WebSocket.OPEN) {
@@ -301,6 +319,8 @@ const useWebSocket = (url: string, onDemandUpdate: (hexagons: DemandHexagon[]) =
         (window as any).wsRef = ws;
         
         ws.onopen = () => {
+          demandSeqRef.current = null;
+          readyRoutesRef.current.clear();
           setIsConnected(true);
           console.log('WebSocket connected successfully');
         };
@@ -312,14 +332,71 @@ const useWebSocket = (url: string, onDemandUpdate: (hexagons: DemandHexagon[]) =
             console.log('Parsed message:', message);
             if (message.type === 'state_update') {
               console.log('State update received - taxis:', message.taxis?.length, 'orders:', message.orders?.length);
+              const readyRoutes = readyRoutesRef.current;
+              const assignments: Assignment[] = message.assignments || [];
+              const current = new Set(assignments.map(assignment => assignment.order_id));
+              readyRoutes.forEach((_, orderId) => {
+                if (!current.has(orderId)) readyRoutes.delete(orderId); // Completed or out of view
+              });
               setData({
                 taxis: message.taxis || [],
                 orders: message.orders || [],
-                assignments: message.assignments || []
+                assignments: assignments.map(assignment => {
+                  const routes = readyRoutes.get(assignment.order_id);
+                  if (!routes) return assignment;
+                  if (assignment.routes_ready !== false) {
+                    readyRoutes.delete(assignment.order_id); // The server has caught up
+                    return assignment;
+                  }
+                  return { ...assignment, ...routes, routes_ready: true };
+                })
+              });
+            } else if (message.type === 'route_ready') {
+              // Routes are computed after the assignment is committed; swap in the real paths
+              readyRoutesRef.current.set(message.order_id, {
+                to_pickup_route: message.to_pickup_route,
+                to_dropoff_route: message.to_dropoff_route
               });
+              setData(prev => ({
+                ...prev,
+                assignments: prev.assignments.map(assignment =>
+                  assignment.order_id === message.order_id
+                    ? {
+                        ...assignment,
+                        to_pickup_route: message.to_pickup_route,
+                        to_dropoff_route: message.to_dropoff_route,
+                        routes_ready: true
+                      }
+                    : assignment
+                )
+              }));
+            } else if (message.type === 'demand_snapshot') {
+              console.log('Demand snapshot received - hexagons:', message.hexagons?.length, 'seq:', message.seq);
+              hexagonsRef.current = new Map(
+                (message.hexagons || []).map((hexagon: DemandHexagon) => [hexagon.hex_id, hexagon])
+              );
+              demandSeqRef.current = message.seq;
+              onDemandUpdate?.(Array.from(hexagonsRef.current.values()));
             } else if (message.type === 'demand_update') {
-              console.log('Demand update received - hexagons:', message.hexagons?.length);
-              onDemandUpdate?.(message.hexagons || []);
+              console.log('Demand update received - changed hexagons:', message.hexagons?.length, 'seq:', message.seq);
+              if (demandSeqRef.current === null) {
+                return; // Waiting for a snapshot
+              }
+              if (message.seq !== demandSeqRef.current + 1) {
+                // Missed an update; drop deltas until the full state arrives again
+                demandSeqRef.current = null;
+                ws.send(JSON.stringify({ type: 'demand_resync' }));
+                return;
+              }
+              demandSeqRef.current = message.seq;
+              const hexagons = hexagonsRef.current;
+              for (const change of message.hexagons || []) {
+                const hexagon = hexagons.get(change.hex_id);
+                if (hexagon) {
+                  hexagons.set(change.hex_id, { ...hexagon, ...change });
+                }
+              }
+              onDemandUpdate?.(Array.from(hexagons.values()));
             } else {
               console.log('Unknown message type:', message.type);
             }
@@ -571,6 +648,12 @@ export const TaxiSimulation: React.FC<TaxiSimulationProps> = ({
                 📍 Orders: {hexagon.orders_count}<br/>
                 🚗 Taxis: {hexagon.taxis_count}<br/>
                 📊 Ratio: {hexagon.demand_ratio === -1 ? '∞' : hexagon.demand_ratio.toFixed(2)}<br/>
+                {hexagon.arrivals_per_min && (
+                  <>📈 Orders/min (5m): {hexagon.arrivals_per_min[1].toFixed(2)}<br/></>
+                )}
+                {hexagon.mean_wait_s && hexagon.mean_wait_s[1] > 0 && (
+                  <>⏱ Avg wait (5m): {hexagon.mean_wait_s[1].toFixed(1)}s<br/></>
+                )}
                 <small style={{ color: '#666' }}>H3: {hexagon.hex_id.slice(0, 8)}...</small>
               </div>
             </Tooltip>
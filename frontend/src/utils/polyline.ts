@@ -0,0 +1,60 @@
+const EARTH_RADIUS_M = 6371000;
+
+/**
+ * Decode a Google encoded polyline (as sent by the backend for routes)
+ * @returns Array of [lat, lng] points
+ */
+export const decodePolyline = (encoded: string, precision = 5): [number, number][] => {
+  const factor = Math.pow(10, precision);
+  const points: [number, number][] = [];
+  let index = 0;
+  let lat = 0;
+  let lng = 0;
+
+  while (index < encoded.length) {
+    const deltas: number[] = [];
+    for (let k = 0; k < 2; k++) {
+      let result = 0;
+      let shift = 0;
+      let byte: number;
+      do {
+        byte = encoded.charCodeAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+    }
+    lat += deltas[0];
+    lng += deltas[1];
+    points.push([lat / factor, lng / factor]);
+  }
+  return points;
+};
+
+const distanceMeters = (a: [number, number], b: [number, number]): number => {
+  const toRad = Math.PI / 180;
+  const dLat = (b[0] - a[0]) * toRad;
+  const dLng = (b[1] - a[1]) * toRad;
+  const h =
+    Math.sin(dLat / 2) ** 2 +
+    Math.cos(a[0] * toRad) * Math.cos(b[0] * toRad) * Math.sin(dLng / 2) ** 2;
+  return 2 * EARTH_RADIUS_M * Math.asin(Math.sqrt(h));
+};
+
+/**
+ * Insert points so consecutive ones are at most stepMeters apart.
+ * Routes arrive simplified, so animating vertex-by-vertex would make taxis jump.
+ */
+export const densifyPath = (path: [number, number][], stepMeters = 30): [number, number][] => {
+  if (path.length < 2) return path;
+  const dense: [number, number][] = [path[0]];
+  for (let i = 1; i < path.length; i++) {
+    const [lat0, lng0] = path[i - 1];
+    const [lat1, lng1] = path[i];
+    const steps = Math.max(1, Math.ceil(distanceMeters(path[i - 1], path[i]) / stepMeters));
+    for (let s = 1; s <= steps; s++) {
+      dense.push([lat0 + ((lat1 - lat0) * s) / steps, lng0 + ((lng1 - lng0) * s) / steps]);
+    }
+  }
+  return dense;
+};